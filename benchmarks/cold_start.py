@@ -0,0 +1,39 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+SCRIPTS = {
+    "import": "import boto3_large_message_utils",
+    "inline message": (
+        "from boto3_large_message_utils import LargeMessageBuilder\n"
+        "LargeMessageBuilder(s3_bucket_for_cache='my-bucket', compress=True).build('a' * 300000)"
+    ),
+    "boto3 client": "import boto3\nboto3.client('s3', region_name='us-east-1')",
+}
+
+
+def time_script(script: str, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", script], check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start of a fresh interpreter using the library.")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_script("pass", args.repeat))
+    print(f"{'interpreter':<16}{baseline * 1000:>10.1f} ms")
+    for name, script in SCRIPTS.items():
+        median = statistics.median(time_script(script, args.repeat)) - baseline
+        print(f"{name:<16}{median * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
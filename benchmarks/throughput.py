@@ -0,0 +1,183 @@
+import argparse
+import base64
+import io
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from boto3_large_message_utils import LargeMessageBuilder, LargeMessageParser
+from boto3_large_message_utils.utils.compression import (
+    compress_and_encode_string,
+    compress_string,
+    decode_and_decompress_string,
+    decompress_string,
+    get_available_codecs,
+)
+from boto3_large_message_utils.constants import DEFAULT_MESSAGE_SIZE_THRESHOLD
+from boto3_large_message_utils.utils.size import get_message_attributes_size_in_bytes
+
+SIZES = {
+    "1KiB": 1024,
+    "64KiB": 65536,
+    "256KiB": 262144,
+    "1MiB": 1048576,
+    "10MiB": 10485760,
+    "100MiB": 104857600,
+}
+
+MESSAGE_ATTRIBUTES = {
+    "tenant": {"StringValue": "tenant-1234", "DataType": "String"},
+    "priority": {"StringValue": "5", "DataType": "Number"},
+    "signature": {"BinaryValue": os.urandom(64), "DataType": "Binary"},
+}
+
+
+class InMemoryS3:
+    def __init__(self, keep_objects=True):
+        # Builders in a timing loop store a new object every iteration, so their stub discards what it receives.
+        self.keep_objects = keep_objects
+        self.objects = {}
+        self.uploads = {}
+
+    def put_object(self, Bucket, Key, Body):
+        if self.keep_objects:
+            self.objects[(Bucket, Key)] = Body
+        return {"ETag": '"etag"'}
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def create_multipart_upload(self, Bucket, Key):
+        self.uploads[(Bucket, Key)] = {}
+        return {"UploadId": Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[(Bucket, Key)][PartNumber] = Body if self.keep_objects else b""
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop((Bucket, Key))
+        if self.keep_objects:
+            self.objects[(Bucket, Key)] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop((Bucket, Key), None)
+
+
+def compressible_payload(size: int) -> str:
+    record = json.dumps({"id": 0, "status": "active", "customer": {"name": "name", "email": "user@example.com"}})
+    return (record * (size // len(record) + 1))[:size]
+
+
+def random_payload(size: int) -> str:
+    return base64.b64encode(os.urandom(size))[:size].decode("ascii")
+
+
+PAYLOADS = {"compressible": compressible_payload, "random": random_payload}
+
+
+def measure(func, repeat: int, measure_memory: bool) -> dict:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    result = {"median": statistics.median(timings), "min": min(timings)}
+    if measure_memory:
+        tracemalloc.start()
+        func()
+        result["peak"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def build_cases(payload: str, codecs: list) -> dict:
+    s3 = InMemoryS3()
+    sink = InMemoryS3(keep_objects=False)
+    parser = LargeMessageParser(s3_client=s3)
+    cases = {
+        "get_message_attributes_size_in_bytes": lambda: get_message_attributes_size_in_bytes(
+            dict(MESSAGE_ATTRIBUTES, body={"StringValue": payload[:65536], "DataType": "String"}),
+            DEFAULT_MESSAGE_SIZE_THRESHOLD,
+        ),
+        "parse plain": lambda: parser.parse(payload),
+    }
+    for codec in codecs:
+        builder = LargeMessageBuilder(s3_bucket_for_cache="benchmark", compress=True, codec=codec, s3_client=sink)
+        message = LargeMessageBuilder(
+            s3_bucket_for_cache="benchmark", compress=True, codec=codec, s3_client=s3
+        ).build(payload)
+        compressed = compress_string(payload, codec=codec)
+        encoded = compress_and_encode_string(payload, codec=codec)
+        cases.update(
+            {
+                f"build {codec}": lambda builder=builder: builder.build(payload),
+                f"build {codec} with attributes": lambda builder=builder: builder.build(
+                    payload, dict(MESSAGE_ATTRIBUTES)
+                ),
+                f"parse {codec}": lambda message=message: parser.parse(message),
+                f"compress_string {codec}": lambda codec=codec: compress_string(payload, codec=codec),
+                f"decompress_string {codec}": lambda codec=codec, compressed=compressed: decompress_string(
+                    compressed, codec=codec
+                ),
+                f"compress_and_encode_string {codec}": lambda codec=codec: compress_and_encode_string(
+                    payload, codec=codec
+                ),
+                f"decode_and_decompress_string {codec}": lambda codec=codec, encoded=encoded: (
+                    decode_and_decompress_string(encoded, codec=codec)
+                ),
+            }
+        )
+    uncompressed = LargeMessageBuilder(s3_bucket_for_cache="benchmark", s3_client=sink)
+    cases["build uncompressed"] = lambda: uncompressed.build(payload)
+    envelope = {"compressedMessage": compress_and_encode_string(json.dumps({"payload": payload}))}
+    cases["parse_json"] = lambda: parser.parse_json(envelope)
+    return cases
+
+
+def run(sizes: list, data: list, codecs: list, repeat: int, measure_memory: bool, case_filter: str):
+    results = []
+    for size_name in sizes:
+        for data_name in data:
+            payload = PAYLOADS[data_name](SIZES[size_name])
+            for case_name, func in build_cases(payload, codecs).items():
+                if case_filter and case_filter not in case_name:
+                    continue
+                result = measure(func, repeat, measure_memory)
+                result.update({"case": case_name, "size": size_name, "data": data_name, "bytes": len(payload)})
+                results.append(result)
+                print_result(result)
+    return results
+
+
+def print_result(result: dict):
+    throughput = result["bytes"] / result["median"] / 1048576
+    peak = f"{result['peak'] / 1048576:>10.1f} MiB" if "peak" in result else ""
+    print(
+        f"{result['case']:<42}{result['size']:>8} {result['data']:<13}"
+        f"{result['median'] * 1000:>10.3f} ms{throughput:>10.1f} MiB/s{peak}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure build and parse throughput against an in-memory S3 stub.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--data", nargs="+", choices=list(PAYLOADS), default=list(PAYLOADS))
+    parser.add_argument("--codecs", nargs="+", choices=get_available_codecs(), default=get_available_codecs())
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--memory", action="store_true", help="also record the peak memory of each case")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--output", help="write the results as JSON to compare between runs")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.data, args.codecs, args.repeat, args.memory, args.filter)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
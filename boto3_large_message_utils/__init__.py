@@ -1,6 +1,36 @@
+import importlib
+
 from boto3_large_message_utils.builder import LargeMessageBuilder
 from boto3_large_message_utils.parser import LargeMessageParser
+from boto3_large_message_utils.utils.cache import PayloadCache
+from boto3_large_message_utils.utils.metrics import MetricsCallback, SpanAdapter, TimingHistogram
+from boto3_large_message_utils.utils.planner import CostModel
+from boto3_large_message_utils.utils.policy import AdaptiveCompressionPolicy, CompressionPolicy
 
-__all__ = ["LargeMessageBuilder", "LargeMessageParser"]
+__all__ = [
+    "LargeMessageBuilder",
+    "LargeMessageParser",
+    "AsyncLargeMessageBuilder",
+    "AsyncLargeMessageParser",
+    "PayloadCache",
+    "MetricsCallback",
+    "TimingHistogram",
+    "SpanAdapter",
+    "CompressionPolicy",
+    "AdaptiveCompressionPolicy",
+    "CostModel",
+]
 
 __version__ = "0.2.0"
+
+# The asyncio classes are imported on first use, so synchronous users do not pay for importing asyncio.
+_LAZY_ATTRIBUTES = {
+    "AsyncLargeMessageBuilder": "boto3_large_message_utils.async_builder",
+    "AsyncLargeMessageParser": "boto3_large_message_utils.async_parser",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
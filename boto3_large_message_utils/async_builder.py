@@ -0,0 +1,141 @@
+import asyncio
+
+from boto3_large_message_utils.builder import LargeMessageBuilder
+from boto3_large_message_utils.utils.aio import run_in_executor, upload_chunks_to_s3
+from boto3_large_message_utils.utils.metrics import S3_OFFLOADED, MessageMetrics
+from boto3_large_message_utils.utils.s3 import generate_s3_object_key, is_missing_object_error
+from boto3_large_message_utils.utils.size import append_message_size_attribute
+from boto3_large_message_utils.utils.stream import (
+    CountingIterator,
+    TextCheckingIterator,
+    decode_text,
+    iter_chunks,
+    prepend_chunk,
+    read_head,
+)
+
+
+class AsyncLargeMessageBuilder(LargeMessageBuilder):
+    def __init__(self, s3_bucket_for_cache, s3_client, executor=None, **kwargs):
+        super().__init__(s3_bucket_for_cache, s3_client=s3_client, **kwargs)
+        self.executor = executor
+
+    async def build(self, message, message_attributes: dict = None):
+        entry = await run_in_executor(
+            self.executor, self._plan_entry, None, (message, message_attributes or None)
+        )
+        with self._instrument_entries([entry]):
+            if entry.attributes_object:
+                await self._put_attributes_object(entry.attributes_object)
+            await self._store_entry_in_s3(entry)
+
+        if message_attributes:
+            return entry.body, entry.attributes
+        return entry.body
+
+    async def build_stream(self, stream, message_attributes: dict = None):
+        if message_attributes is not None and not isinstance(message_attributes, dict):
+            raise ValueError('"message_attributes" argument expects type "dict"')
+
+        head, chunks = await run_in_executor(
+            self.executor, read_head, iter_chunks(stream, self.multipart_chunksize), self.message_size_threshold
+        )
+        if chunks is None:
+            return await self.build(decode_text(head), message_attributes)
+
+        if message_attributes:
+            message_attributes, attributes_object = self._plan_stream_attributes(message_attributes)
+            if attributes_object:
+                await self._put_attributes_object(attributes_object)
+
+        message_chunks = CountingIterator(prepend_chunk(head, chunks))
+        stream_metrics = MessageMetrics("build")
+        stream_metrics.path = S3_OFFLOADED
+        with self._instrument([stream_metrics]), stream_metrics.measure("s3"):
+            cached_message_body = await self._store_chunks_in_s3(message_chunks)
+            stream_metrics.message_size = message_chunks.size
+
+        if message_attributes:
+            return cached_message_body, append_message_size_attribute(message_attributes, message_chunks.size)
+        return cached_message_body
+
+    async def build_batch(self, entries, service: str = "sqs") -> list:
+        body_key = self._get_batch_body_key(entries, service)
+        batch = await run_in_executor(self.executor, self._plan_batch, entries)
+        with self._instrument_entries(batch):
+            await self._store_batch_in_s3(batch)
+
+        return [entry.to_request_entry(body_key) for entry in batch]
+
+    async def build_fanout(self, message, destinations) -> list:
+        fanout = await run_in_executor(self.executor, self._plan_fanout, message, destinations)
+        with self._instrument_entries(fanout):
+            await self._store_batch_in_s3(fanout)
+
+        return [(entry.body, entry.attributes) for entry in fanout]
+
+    async def _store_batch_in_s3(self, batch: list):
+        offloaded_entries = {entry.s3_object_key: entry for entry in batch if entry.s3_object_key}
+        await asyncio.gather(
+            *(self._store_entry_in_s3(entry) for entry in offloaded_entries.values()),
+            *(self._put_attributes_object(entry.attributes_object) for entry in batch if entry.attributes_object),
+        )
+
+    async def _put_attributes_object(self, attributes_object: tuple):
+        s3_object_key, body = attributes_object
+        await self.s3.put_object(Bucket=self.s3_bucket_for_cache, Body=body, Key=s3_object_key)
+
+    async def _store_entry_in_s3(self, entry):
+        if not entry.s3_object_key or await self._is_stored_in_s3(entry.s3_object_key):
+            return
+
+        body = await run_in_executor(self.executor, self._get_entry_s3_object_body, entry)
+        with entry.metrics.measure("s3"):
+            if len(body) < self.multipart_threshold:
+                await self.s3.put_object(
+                    Bucket=self.s3_bucket_for_cache, Body=body, Key=entry.s3_object_key
+                )
+            else:
+                await self._upload_chunks(iter_chunks(body, self.multipart_chunksize), entry.s3_object_key)
+        if self.deduplicate:
+            self.known_s3_object_keys.add(entry.s3_object_key)
+
+    async def _store_chunks_in_s3(self, chunks) -> str:
+        s3_object_key = generate_s3_object_key(prefix=self.s3_object_prefix)
+        text_chunks = TextCheckingIterator(chunks)
+        message_chunks = CountingIterator(text_chunks)
+        await self._upload_chunks(self._encode_chunks(message_chunks), s3_object_key)
+
+        return self._get_cached_message_body_for_key(
+            s3_object_key,
+            binary=not text_chunks.is_text,
+            message_size=message_chunks.size if self.frame_size is not None else None,
+        )
+
+    async def _upload_chunks(self, chunks, s3_object_key: str):
+        await upload_chunks_to_s3(
+            self.s3,
+            self.s3_bucket_for_cache,
+            s3_object_key,
+            chunks,
+            self.multipart_threshold,
+            self.multipart_chunksize,
+            self.max_workers,
+            self.executor,
+        )
+
+    async def _is_stored_in_s3(self, s3_object_key: str) -> bool:
+        if not self.deduplicate:
+            return False
+        if s3_object_key in self.known_s3_object_keys:
+            return True
+        if not self.check_existing_objects:
+            return False
+        try:
+            await self.s3.head_object(Bucket=self.s3_bucket_for_cache, Key=s3_object_key)
+        except Exception as e:
+            if is_missing_object_error(e):
+                return False
+            raise
+        self.known_s3_object_keys.add(s3_object_key)
+        return True
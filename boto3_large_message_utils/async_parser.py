@@ -0,0 +1,187 @@
+import asyncio
+
+from boto3_large_message_utils.constants import (
+    DEFAULT_COMPRESSION_CODEC,
+    DEFAULT_PREFETCH_DEPTH,
+    DEFAULT_PREFETCH_MEMORY,
+)
+from boto3_large_message_utils.parser import (
+    _FRAMES_RANGE,
+    _MESSAGE_RANGE,
+    _OBJECT_RANGE,
+    LargeMessageParser,
+    _S3Pointer,
+    _as_payload_type,
+    _decode_s3_object,
+    _get_byte_range,
+    _get_frame_index_range,
+    _get_prefetch_size,
+    _log_retrieval_errors,
+    _restore_message_attributes,
+    _validate_prefetch_arguments,
+    load_envelope,
+)
+from boto3_large_message_utils.utils.aio import prefetch, run_in_executor
+from boto3_large_message_utils.utils.attributes import read_offloaded_attributes_reference
+from boto3_large_message_utils.utils.frames import get_frame_span, read_frame_index
+from boto3_large_message_utils.utils.metrics import MessageMetrics
+from boto3_large_message_utils.utils.s3 import is_invalid_range_error
+
+
+class AsyncLargeMessageParser(LargeMessageParser):
+    def __init__(self, s3_client, executor=None, **kwargs):
+        super().__init__(s3_client=s3_client, **kwargs)
+        self.executor = executor
+
+    async def parse_json(self, json_message):
+        message_metrics = MessageMetrics("parse")
+        with self._report_errors(message_metrics):
+            if isinstance(json_message, (str, bytes)):
+                message = await self._parse_message(json_message, message_metrics, binary=True)
+            else:
+                message = await self._parse_contents(json_message, message_metrics, binary=True)
+            parsed_message = self._load_json(message)
+        self._report(message_metrics, message)
+        return parsed_message
+
+    async def _parse_contents(self, json_message, message_metrics: MessageMetrics = None, binary: bool = False):
+        message_metrics = message_metrics or MessageMetrics("parse")
+        binary = binary or json_message.get("binary", False)
+        # Decoding the envelope only decompresses inline compressed messages, so only they need the executor.
+        if json_message.get("compressedMessage"):
+            contents = await run_in_executor(
+                self.executor, self._decode_envelope, json_message, message_metrics, binary
+            )
+        else:
+            contents = self._decode_envelope(json_message, message_metrics, binary)
+        if isinstance(contents, _S3Pointer):
+            return await self._retrieve_message_from_s3(
+                **contents._asdict(), message_metrics=message_metrics, binary=binary
+            )
+        return contents
+
+    async def parse(self, message):
+        if not isinstance(message, (str, bytes)):
+            raise ValueError('"message" argument expects type "str" or "bytes"')
+        message_metrics = MessageMetrics("parse")
+        with self._report_errors(message_metrics):
+            parsed_message = await self._parse_message(message, message_metrics)
+        self._report(message_metrics, parsed_message)
+        return parsed_message
+
+    async def _parse_message(self, message, message_metrics: MessageMetrics, binary: bool = False):
+        json_message = load_envelope(message, self.json_backend.loads)
+        if json_message is None:
+            return message
+        parsed_message = await self._parse_contents(json_message, message_metrics, binary)
+        return message if parsed_message is json_message else parsed_message
+
+    async def parse_attributes(self, message_attributes: dict) -> dict:
+        if not isinstance(message_attributes, dict):
+            raise ValueError('"message_attributes" argument expects type "dict"')
+        location = read_offloaded_attributes_reference(message_attributes)
+        if location is None:
+            return message_attributes
+        bucket, key = location
+        response = await self.s3.get_object(Bucket=bucket, Key=key)
+        return _restore_message_attributes(message_attributes, await response["Body"].read())
+
+    def open(self, message):
+        # The synchronous reader would block on the async client, so message bodies are read with parse or parse_range.
+        raise TypeError('"open" is not supported by AsyncLargeMessageParser, use "parse" or "parse_range" instead')
+
+    async def parse_range(self, message, start: int = 0, end: int = None) -> bytes:
+        source, json_message = self._get_range_source(message, start, end)
+        if source == _FRAMES_RANGE:
+            return await self._parse_frames_in_s3(json_message, start, end)
+        if source == _OBJECT_RANGE:
+            byte_range = _get_byte_range(start, end)
+            return await self._get_s3_object_range(json_message["bucket"], json_message["key"], byte_range)
+        if source == _MESSAGE_RANGE:
+            return _as_payload_type(await self.parse(message), True)[start:end]
+        return b""
+
+    async def _parse_frames_in_s3(self, json_message: dict, start: int, end: int = None) -> bytes:
+        bucket, key, frames = json_message["bucket"], json_message["key"], json_message["frames"]
+        first_frame, stop_frame = get_frame_span(json_message["frameSize"], frames, start, end)
+        if first_frame == stop_frame:
+            return b""
+        offsets = (await self._get_frame_offsets(bucket, key, frames))[first_frame:stop_frame + 1]
+        body = await self._get_s3_object_range(bucket, key, _get_byte_range(offsets[0], offsets[-1]))
+        return await run_in_executor(
+            self.executor, self._decode_frame_range, json_message, body, offsets, first_frame, start, end
+        )
+
+    async def _get_frame_offsets(self, bucket: str, key: str, frames: int) -> list:
+        if not frames:
+            return [0]
+        return read_frame_index(await self._get_s3_object_range(bucket, key, _get_frame_index_range(frames)))
+
+    async def _get_s3_object_range(self, bucket: str, key: str, byte_range: str) -> bytes:
+        try:
+            response = await self.s3.get_object(Bucket=bucket, Key=key, Range=byte_range)
+            return await response["Body"].read()
+        except Exception as e:
+            if is_invalid_range_error(e):
+                return b""
+            raise
+
+    async def parse_batch(self, messages: list) -> list:
+        if not isinstance(messages, (list, tuple)):
+            raise ValueError('"messages" argument expects type "list"')
+        if not all(isinstance(message, dict) for message in messages):
+            raise ValueError('"messages" argument expects a list of type "dict"')
+
+        return list(
+            await asyncio.gather(*(self._parse_batch_message(message) for message in messages))
+        )
+
+    def iter_parse(self, messages, prefetch_depth=DEFAULT_PREFETCH_DEPTH, prefetch_memory=DEFAULT_PREFETCH_MEMORY):
+        _validate_prefetch_arguments(prefetch_depth, prefetch_memory)
+        return prefetch(self._parse_prefetched_message, messages, prefetch_depth, prefetch_memory, _get_prefetch_size)
+
+    async def _parse_prefetched_message(self, message):
+        if isinstance(message, dict):
+            return await self._parse_batch_message(message)
+        return await self.parse(message)
+
+    async def _parse_batch_message(self, message: dict) -> dict:
+        parsed_message = dict(message)
+        try:
+            parsed_message["Body"] = await self.parse(message["Body"])
+            if message.get("MessageAttributes"):
+                parsed_message["MessageAttributes"] = await self.parse_attributes(message["MessageAttributes"])
+        except Exception as e:
+            parsed_message["Error"] = e
+        return parsed_message
+
+    async def _retrieve_message_from_s3(
+        self,
+        bucket,
+        key,
+        compressed=False,
+        codec=DEFAULT_COMPRESSION_CODEC,
+        dictionary=None,
+        message_metrics=None,
+        binary=False,
+        frames=None,
+    ):
+        message_metrics = message_metrics or MessageMetrics("parse")
+        message = self._get_cached_message(bucket, key, message_metrics)
+        if message is None:
+            message = await self._download_message_from_s3(
+                bucket, key, compressed, codec, dictionary, message_metrics, binary, frames
+            )
+            self._cache_message(bucket, key, message)
+        return _as_payload_type(message, binary)
+
+    async def _download_message_from_s3(
+        self, bucket, key, compressed, codec, dictionary, message_metrics, binary=False, frames=None
+    ):
+        with _log_retrieval_errors(bucket, key):
+            with message_metrics.measure("s3"):
+                response = await self.s3.get_object(Bucket=bucket, Key=key)
+                body = await response["Body"].read()
+            return await run_in_executor(
+                self.executor, _decode_s3_object, body, compressed, codec, dictionary, message_metrics, binary, frames
+            )
@@ -1,18 +1,158 @@
-import json
-import boto3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 from boto3_large_message_utils.utils.compression import (
-    compress_and_encode_string,
+    compress_chunks,
     compress_string,
+    encode_bytes,
+    get_codec,
+    get_compression_dictionary_id,
     get_size_of_string_in_bytes,
     generate_s3_object_key,
 )
+from boto3_large_message_utils.utils.attributes import encode_message_attributes, get_offloaded_attributes_reference
+from boto3_large_message_utils.utils.client import get_s3_client
+from boto3_large_message_utils.utils.frames import MAX_FRAME_SIZE, get_frame_count, pack_frames
+from boto3_large_message_utils.utils.metrics import INLINE_COMPRESSED, S3_OFFLOADED, MessageMetrics
+from boto3_large_message_utils.utils.planner import DeliveryPlan, get_delivery_plans
+from boto3_large_message_utils.utils.policy import CompressionDecision
+from boto3_large_message_utils.utils.serialization import get_json_backend
+from boto3_large_message_utils.utils.s3 import (
+    S3ObjectKeyCache,
+    generate_content_s3_object_key,
+    s3_object_exists,
+    upload_chunks_to_s3,
+)
+from boto3_large_message_utils.utils.stream import (
+    CountingIterator,
+    TextCheckingIterator,
+    decode_text,
+    iter_chunks,
+    iter_parts,
+    prepend_chunk,
+    read_head,
+)
 from boto3_large_message_utils.utils.size import (
-    get_message_attributes_size_in_bytes,
+    AttributeSchema,
     append_message_size_attribute,
+    validate_message_size_attribute,
 )
 from boto3_large_message_utils.exceptions import CompressionError
-from boto3_large_message_utils.constants import DEFAULT_MESSAGE_SIZE_THRESHOLD
+from boto3_large_message_utils.constants import (
+    DEFAULT_MESSAGE_SIZE_THRESHOLD,
+    DEFAULT_BATCH_SIZE_THRESHOLD,
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_KNOWN_S3_OBJECT_KEYS,
+    MAX_ALLOWED_ATTRIBUTES,
+    MAX_BATCH_ENTRIES,
+    OFFLOADED_ATTRIBUTES_NAME,
+    RESERVED_ATTRIBUTE_NAME,
+    BATCH_MESSAGE_BODY_KEYS,
+    DEFAULT_COMPRESSION_CODEC,
+    COMPRESSION_RATIO_SMOOTHING,
+    COMPRESSION_PREDICTION_MARGIN,
+    DEFAULT_INLINE_ENCODING,
+    INLINE_ENCODING_EXPANSION_RATIOS,
+    DEFAULT_MULTIPART_THRESHOLD,
+    DEFAULT_MULTIPART_CHUNKSIZE,
+)
+
+
+def _encode_message(message) -> bytes:
+    return message.encode("utf-8") if isinstance(message, str) else message
+
+
+def _get_codec_options(codec: str, dictionary_id: int = None) -> dict:
+    codec_options = {}
+    if codec != DEFAULT_COMPRESSION_CODEC:
+        codec_options["codec"] = codec
+    if dictionary_id is not None:
+        codec_options["dictionary"] = dictionary_id
+    return codec_options
+
+
+class _MessageEntry:
+    def __init__(self, entry_id, message, message_attributes, message_size_threshold, attribute_schema=None):
+        self.entry_id = entry_id
+        self.message = message
+        self.message_attributes = message_attributes
+        self.body = message
+        self.attributes = message_attributes
+        self.s3_object_key = None
+        self.message_size_threshold = message_size_threshold
+        self.compressed_bytes = None
+        self.compressed_frames = None
+        self.compression = None
+        self.attributes_object = None
+        self.metrics = MessageMetrics("build")
+        self.attribute_schema = attribute_schema or AttributeSchema()
+        self._message_bytes = None
+        self._attributes_size = None
+        self._body_size = None
+
+    @property
+    def binary(self) -> bool:
+        return isinstance(self.message, bytes)
+
+    @property
+    def message_bytes(self) -> bytes:
+        if self.binary:
+            return self.message
+        if self._message_bytes is None:
+            self._message_bytes = self.message.encode("utf-8")
+        return self._message_bytes
+
+    def reuse_payload(self, entry):
+        self._message_bytes = entry._message_bytes
+        self.compressed_bytes = entry.compressed_bytes
+        self.compressed_frames = entry.compressed_frames
+        self.compression = entry.compression
+
+    @property
+    def message_size(self) -> int:
+        if self.binary or self.message.isascii():
+            return len(self.message)
+        return len(self.message_bytes)
+
+    def is_smaller_than(self, size: int) -> bool:
+        # A binary message can only be sent in an envelope, so it is never sent as it is.
+        if self.binary:
+            return False
+        # A code point is between 1 and 4 bytes in UTF-8, so the character count bounds the encoded size.
+        if len(self.message) >= size:
+            return False
+        if self.message.isascii() or len(self.message) * 4 < size:
+            return True
+        return len(self.message_bytes) < size
+
+    @property
+    def attributes_size(self):
+        if not self.attributes:
+            return 0
+        # The attributes are replaced rather than changed when the size attribute is added, so the size is kept with
+        # the attributes it was measured for.
+        if self._attributes_size is None or self._attributes_size[0] is not self.attributes:
+            size = self.attribute_schema.get_size(self.attributes, self.message_size_threshold)
+            self._attributes_size = (self.attributes, size)
+        return self._attributes_size[1]
+
+    @property
+    def body_size(self) -> int:
+        if self.body is self.message:
+            return self.message_size
+        if self._body_size is None or self._body_size[0] is not self.body:
+            self._body_size = (self.body, get_size_of_string_in_bytes(self.body))
+        return self._body_size[1]
+
+    @property
+    def size(self):
+        return self.body_size + self.attributes_size
+
+    def to_request_entry(self, body_key):
+        request_entry = {"Id": self.entry_id, body_key: self.body}
+        if self.attributes:
+            request_entry["MessageAttributes"] = self.attributes
+        return request_entry
 
 
 class LargeMessageBuilder:
@@ -23,89 +163,416 @@ class LargeMessageBuilder:
         compress=False,
         message_size_threshold=DEFAULT_MESSAGE_SIZE_THRESHOLD,
         session=None,
+        batch_size_threshold=DEFAULT_BATCH_SIZE_THRESHOLD,
+        max_workers=DEFAULT_MAX_WORKERS,
+        s3_client=None,
+        codec=DEFAULT_COMPRESSION_CODEC,
+        compression_level=None,
+        compression_dictionary=None,
+        predict_compression=False,
+        multipart_threshold=DEFAULT_MULTIPART_THRESHOLD,
+        multipart_chunksize=DEFAULT_MULTIPART_CHUNKSIZE,
+        deduplicate=False,
+        check_existing_objects=False,
+        s3_client_options=None,
+        metrics=None,
+        compression_policy=None,
+        inline_encoding=DEFAULT_INLINE_ENCODING,
+        json_backend=None,
+        attributes_size_threshold=None,
+        inline_attributes=None,
+        cost_model=None,
+        frame_size=None,
     ):
+        if frame_size is not None and (not isinstance(frame_size, int) or not 0 < frame_size < MAX_FRAME_SIZE):
+            raise ValueError(f'"frame_size" argument expects a positive "int" smaller than {MAX_FRAME_SIZE}')
+        if inline_encoding not in INLINE_ENCODING_EXPANSION_RATIOS:
+            raise ValueError(f'"inline_encoding" argument expects one of {sorted(INLINE_ENCODING_EXPANSION_RATIOS)}')
+
         self.s3_bucket_for_cache = s3_bucket_for_cache
         self.s3_object_prefix = s3_object_prefix
         self.compress = compress
+        self.codec = get_codec(codec).name
+        self.compression_level = compression_level
+        self.compression_dictionary = compression_dictionary
+        self.compression_dictionary_id = None
+        if compression_dictionary is not None:
+            self.compression_dictionary_id = get_compression_dictionary_id(compression_dictionary, self.codec)
+        self.predict_compression = predict_compression
+        self.compression_ratio = None
+        self.compression_policy = compression_policy
+        self.inline_encoding = inline_encoding
+        self.json_backend = get_json_backend(json_backend)
+        self.attributes_size_threshold = attributes_size_threshold
+        self.inline_attributes = frozenset(inline_attributes or ())
+        self.cost_model = cost_model
+        self.frame_size = frame_size
         self.message_size_threshold = message_size_threshold
+        self.batch_size_threshold = batch_size_threshold
+        self.max_workers = max_workers
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = multipart_chunksize
+        self.deduplicate = deduplicate
+        self.check_existing_objects = check_existing_objects
+        self.known_s3_object_keys = S3ObjectKeyCache(DEFAULT_KNOWN_S3_OBJECT_KEYS)
+        self.attribute_schema = AttributeSchema()
+        self.metrics = metrics
 
-        if session:
-            self.s3 = session.client("s3")
-        else:
-            self.s3 = boto3.client("s3")
+        self.session = session
+        self.s3_client_options = s3_client_options
+        self._s3 = s3_client
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            self._s3 = get_s3_client(self.session, **(self.s3_client_options or {}))
+        return self._s3
+
+    @s3.setter
+    def s3(self, s3_client):
+        self._s3 = s3_client
 
     def build(self, message, message_attributes: dict = None):
+        if self.cost_model is not None:
+            return self._handle_planned_message(message, message_attributes)
         if message_attributes:
             return self._handle_message_with_message_attributes(
                 message, message_attributes
             )
         return self._handle_message(message)
 
-    def _handle_message(self, message: str) -> str:
-        if not isinstance(message, str):
-            raise ValueError('"message" argument expects type "str"')
-
-        message_size = get_size_of_string_in_bytes(message)
+    def build_stream(self, stream, message_attributes: dict = None):
+        if message_attributes is not None and not isinstance(message_attributes, dict):
+            raise ValueError('"message_attributes" argument expects type "dict"')
 
-        if message_size < self.message_size_threshold:
-            return message
+        head, chunks = read_head(iter_chunks(stream, self.multipart_chunksize), self.message_size_threshold)
+        if chunks is None:
+            return self.build(decode_text(head), message_attributes)
 
-        if self.compress:
-            compressed_message = self._get_compressed_message_body(message)
-            compressed_message_size = get_size_of_string_in_bytes(compressed_message)
+        if message_attributes:
+            message_attributes, attributes_object = self._plan_stream_attributes(message_attributes)
+            if attributes_object:
+                self._put_attributes_object(attributes_object)
 
-            if compressed_message_size < self.message_size_threshold:
-                return compressed_message
+        message_chunks = CountingIterator(prepend_chunk(head, chunks))
+        stream_metrics = MessageMetrics("build")
+        stream_metrics.path = S3_OFFLOADED
+        with self._instrument([stream_metrics]), stream_metrics.measure("s3"):
+            cached_message_body = self._store_chunks_in_s3(message_chunks)
+            stream_metrics.message_size = message_chunks.size
 
-        cached_message_body = self._store_message_in_s3(message)
+        if message_attributes:
+            return cached_message_body, append_message_size_attribute(message_attributes, message_chunks.size)
         return cached_message_body
 
+    def _plan_stream_attributes(self, message_attributes: dict) -> (dict, tuple):
+        message_attributes, attributes_object = self._offload_message_attributes(message_attributes)
+        self.attribute_schema.get_size(message_attributes, self.message_size_threshold)
+        return message_attributes, attributes_object
+
+    def build_batch(self, entries, service: str = "sqs") -> list:
+        body_key = self._get_batch_body_key(entries, service)
+        batch = self._plan_batch(entries)
+        with self._instrument_entries(batch):
+            self._store_batch_in_s3(batch)
+
+        return [entry.to_request_entry(body_key) for entry in batch]
+
+    def build_fanout(self, message, destinations) -> list:
+        fanout = self._plan_fanout(message, destinations)
+        with self._instrument_entries(fanout):
+            self._store_batch_in_s3(fanout)
+
+        return [(entry.body, entry.attributes) for entry in fanout]
+
+    @contextmanager
+    def _instrument(self, message_metrics: list):
+        try:
+            yield
+        except Exception as e:
+            self._report(message_metrics, e)
+            raise
+        self._report(message_metrics)
+
+    def _instrument_entries(self, entries: list):
+        if self.metrics is not None:
+            for entry in entries:
+                entry.metrics.message_size = entry.message_size
+        return self._instrument([entry.metrics for entry in entries])
+
+    def _report(self, message_metrics: list, error: Exception = None):
+        if self.metrics is None:
+            return
+        for metrics in message_metrics:
+            metrics.finish(error)
+            self.metrics.message_finished(metrics)
+
+    @staticmethod
+    def _get_batch_body_key(entries, service: str) -> str:
+        if not isinstance(entries, (list, tuple)):
+            raise ValueError('"entries" argument expects type "list"')
+        if len(entries) > MAX_BATCH_ENTRIES:
+            raise ValueError(
+                f"Number of batch entries ({len(entries)}) exceeds the maximum allowed ({MAX_BATCH_ENTRIES}). "
+            )
+        if service not in BATCH_MESSAGE_BODY_KEYS:
+            raise ValueError(f'"service" argument expects one of {sorted(BATCH_MESSAGE_BODY_KEYS)}')
+        return BATCH_MESSAGE_BODY_KEYS[service]
+
+    def _handle_message(self, message) -> str:
+        if not isinstance(message, (str, bytes)):
+            raise ValueError('"message" argument expects type "str" or "bytes"')
+
+        entry = _MessageEntry(None, message, None, self.message_size_threshold, self.attribute_schema)
+
+        with self._instrument_entries([entry]):
+            if entry.is_smaller_than(self.message_size_threshold):
+                return message
+
+            inline_message = self._get_inline_message_body_within_threshold(entry)
+            if inline_message:
+                return inline_message
+
+            return self._store_entry_message_in_s3(entry)
+
     def _handle_message_with_message_attributes(
-        self, message: str, message_attributes: dict
+        self, message, message_attributes: dict
     ) -> (str, dict):
-        if not isinstance(message, str):
-            raise ValueError('"message" argument expects type "str"')
+        if not isinstance(message, (str, bytes)):
+            raise ValueError('"message" argument expects type "str" or "bytes"')
         if not isinstance(message_attributes, dict):
             raise ValueError('"message_attributes" argument expects type "dict"')
 
-        message_size = get_size_of_string_in_bytes(message)
-        message_attributes_size = get_message_attributes_size_in_bytes(
-            message_attributes, self.message_size_threshold
-        )
+        entry = _MessageEntry(None, message, None, self.message_size_threshold, self.attribute_schema)
+        message_attributes, attributes_object = self._offload_message_attributes(message_attributes)
+        message_attributes_size = self.attribute_schema.get_size(message_attributes, self.message_size_threshold)
+
+        with self._instrument_entries([entry]):
+            if attributes_object:
+                self._put_attributes_object(attributes_object)
+            if entry.is_smaller_than(self.message_size_threshold - message_attributes_size):
+                return message, message_attributes
+
+            updated_message_attributes = append_message_size_attribute(
+                message_attributes, entry.message_size
+            )
 
-        if message_size + message_attributes_size < self.message_size_threshold:
-            return message, message_attributes
+            inline_message_body = self._get_inline_message_body_within_threshold(entry, message_attributes_size)
+            if inline_message_body:
+                return inline_message_body, updated_message_attributes
 
-        updated_message_attributes = append_message_size_attribute(
-            message_attributes, message_size
+            return self._store_entry_message_in_s3(entry), updated_message_attributes
+
+    def _handle_planned_message(self, message, message_attributes: dict = None):
+        entry = self._plan_entry(None, (message, message_attributes or None))
+        with self._instrument_entries([entry]):
+            if entry.attributes_object:
+                self._put_attributes_object(entry.attributes_object)
+            if entry.s3_object_key:
+                self._store_entry_in_s3(entry)
+
+        if message_attributes:
+            return entry.body, entry.attributes
+        return entry.body
+
+    def _offload_message_attributes(self, message_attributes: dict, threshold: int = None) -> (dict, tuple):
+        threshold = self.attributes_size_threshold if threshold is None else threshold
+        if threshold is None or not message_attributes:
+            return message_attributes, None
+        if OFFLOADED_ATTRIBUTES_NAME in message_attributes:
+            raise ValueError(f"Message Attribute name {OFFLOADED_ATTRIBUTES_NAME} is reserved for use by "
+                             f"MessageDispatchHelper.")
+
+        attribute_sizes = {
+            name: self.attribute_schema.get_attribute_size(name, value) for name, value in message_attributes.items()
+        }
+        if sum(attribute_sizes.values()) <= threshold:
+            return message_attributes, None
+
+        s3_object_key = generate_s3_object_key(prefix=self.s3_object_prefix)
+        reference = get_offloaded_attributes_reference(self.s3_bucket_for_cache, s3_object_key)
+        offloaded_names = self._select_offloaded_attributes(
+            attribute_sizes, self.attribute_schema.get_attribute_size(OFFLOADED_ATTRIBUTES_NAME, reference), threshold
         )
+        if not offloaded_names:
+            return message_attributes, None
 
-        if self.compress:
-            compressed_message_body = self._get_compressed_message_body(message)
-            compressed_message_size = get_size_of_string_in_bytes(
-                compressed_message_body
+        updated_message_attributes = {
+            name: value for name, value in message_attributes.items() if name not in offloaded_names
+        }
+        updated_message_attributes[OFFLOADED_ATTRIBUTES_NAME] = reference
+        attributes_object_body = encode_message_attributes({name: message_attributes[name] for name in offloaded_names})
+        return updated_message_attributes, (s3_object_key, attributes_object_body)
+
+    def _select_offloaded_attributes(self, attribute_sizes: dict, reference_size: int, threshold: int) -> list:
+        # The largest attributes are moved first, so as many of the small, filterable ones as possible stay inline.
+        attributes_size = sum(attribute_sizes.values()) + reference_size
+        offloaded_names = []
+        for name in sorted(attribute_sizes, key=attribute_sizes.get, reverse=True):
+            if attributes_size <= threshold:
+                break
+            if name not in self.inline_attributes:
+                offloaded_names.append(name)
+                attributes_size -= attribute_sizes[name]
+        return offloaded_names
+
+    def _plan_attributes(self, entry: _MessageEntry):
+        entry.message_attributes, entry.attributes_object = self._offload_message_attributes(entry.message_attributes)
+        entry.attributes = entry.message_attributes
+
+    def _put_attributes_object(self, attributes_object: tuple):
+        s3_object_key, body = attributes_object
+        self.s3.put_object(Bucket=self.s3_bucket_for_cache, Body=body, Key=s3_object_key)
+
+    def _get_inline_message_body_within_threshold(self, entry: _MessageEntry, reserved_size: int = 0) -> str:
+        if entry.binary:
+            binary_message_body = self._get_binary_message_body_within_threshold(entry, reserved_size)
+            if binary_message_body:
+                return binary_message_body
+        return self._get_compressed_message_body_within_threshold(entry, reserved_size)
+
+    def _get_binary_message_body_within_threshold(self, entry: _MessageEntry, reserved_size: int) -> str:
+        predicted_size = entry.message_size * INLINE_ENCODING_EXPANSION_RATIOS[self.inline_encoding]
+        if predicted_size + reserved_size >= self.message_size_threshold:
+            return None
+
+        binary_message_body = self._get_binary_message_body(entry.message_bytes)
+        if get_size_of_string_in_bytes(binary_message_body) + reserved_size < self.message_size_threshold:
+            return binary_message_body
+        return None
+
+    def _get_binary_message_body(self, message: bytes) -> str:
+        binary_message_body = {"binaryMessage": encode_bytes(message, self.inline_encoding)}
+        if self.inline_encoding != DEFAULT_INLINE_ENCODING:
+            binary_message_body["encoding"] = self.inline_encoding
+        return self.json_backend.dumps(binary_message_body)
+
+    def _get_compressed_message_body_within_threshold(
+        self, entry: _MessageEntry, reserved_size: int = 0
+    ) -> str:
+        if not self.compress:
+            return None
+        compression = self._get_compression(entry)
+        if not compression.compress or self._is_compressed_message_body_too_large(entry, reserved_size):
+            return None
+
+        compressed_message = self._get_compressed_entry(entry)
+        with entry.metrics.measure("encoding"):
+            compressed_message_body = self._get_compressed_message_body(
+                compressed_message, compression.codec, entry.binary
             )
+        compressed_message_size = get_size_of_string_in_bytes(compressed_message_body)
 
-            if (
-                compressed_message_size + message_attributes_size
-                < self.message_size_threshold
-            ):
-                return compressed_message_body, updated_message_attributes
+        if compressed_message_size + reserved_size < self.message_size_threshold:
+            entry.metrics.path = INLINE_COMPRESSED
+            return compressed_message_body
+        return None
 
-        cached_message_body = self._store_message_in_s3(message)
-        return cached_message_body, updated_message_attributes
+    def _is_compressed_message_body_too_large(self, entry: _MessageEntry, reserved_size: int) -> bool:
+        if self._spans_frames(entry):
+            # The frames are needed anyway if the message is stored in S3, so their size decides whether it fits.
+            compressed_size = sum(len(frame) for frame in self._get_compressed_frames(entry))
+            predicted_size = compressed_size * INLINE_ENCODING_EXPANSION_RATIOS[self.inline_encoding]
+            return predicted_size + reserved_size >= self.message_size_threshold
+        # A ratio estimated by the compression policy from the message itself is preferred to the running ratio.
+        compression_ratio = entry.compression.ratio if entry.compression else None
+        if compression_ratio is None and self.predict_compression:
+            compression_ratio = self.compression_ratio
+        if compression_ratio is None:
+            return False
+        predicted_size = entry.message_size * compression_ratio * INLINE_ENCODING_EXPANSION_RATIOS[self.inline_encoding]
+        return predicted_size + reserved_size > self.message_size_threshold * COMPRESSION_PREDICTION_MARGIN
 
-    @staticmethod
-    def _get_compressed_message_body(message: str) -> str:
+    def _get_compression(self, entry: _MessageEntry) -> CompressionDecision:
+        if entry.compression is None:
+            if self.compress and self.compression_policy is not None:
+                entry.compression = self.compression_policy.decide(
+                    entry.message_bytes, self.codec, self.compression_level
+                )
+            else:
+                entry.compression = self._get_default_compression()
+        return entry.compression
+
+    def _get_default_compression(self) -> CompressionDecision:
+        return CompressionDecision(self.compress, self.codec, self.compression_level)
+
+    def _get_compressed_entry(self, entry: _MessageEntry) -> bytes:
+        if entry.compressed_bytes is None:
+            compression = self._get_compression(entry)
+            with entry.metrics.measure("compression"):
+                entry.compressed_bytes = self._compress_message(
+                    entry.message_bytes, compression.codec, compression.level
+                )
+            self._observe_compressed_entry(entry, len(entry.compressed_bytes))
+        entry.metrics.compressed_size = len(entry.compressed_bytes)
+        return entry.compressed_bytes
+
+    def _get_compressed_frames(self, entry: _MessageEntry) -> list:
+        if entry.compressed_frames is None:
+            if not self._spans_frames(entry):
+                # A message that fills a single frame is compressed exactly like the whole message.
+                entry.compressed_frames = [self._get_compressed_entry(entry)] if entry.message_bytes else []
+            else:
+                compression = self._get_compression(entry)
+                with entry.metrics.measure("compression"):
+                    entry.compressed_frames = list(self._compress_frames([entry.message_bytes], compression))
+                self._observe_compressed_entry(entry, sum(len(frame) for frame in entry.compressed_frames))
+        entry.metrics.compressed_size = sum(len(frame) for frame in entry.compressed_frames)
+        return entry.compressed_frames
+
+    def _spans_frames(self, entry: _MessageEntry) -> bool:
+        return self.frame_size is not None and entry.message_size > self.frame_size
+
+    def _observe_compressed_entry(self, entry: _MessageEntry, compressed_size: int):
+        if self.compression_policy is not None:
+            self.compression_policy.observe(entry.compression, len(entry.message_bytes), compressed_size)
+
+    def _compress_message(self, message: bytes, codec: str = None, level: int = None) -> bytes:
+        codec = codec or self.codec
         try:
-            compressed_message_contents = compress_and_encode_string(message)
-            return json.dumps({"compressedMessage": compressed_message_contents})
+            compressed_message = compress_string(
+                message,
+                codec=codec,
+                level=self.compression_level if level is None else level,
+                dictionary=self.compression_dictionary if codec == self.codec else None,
+            )
         except (ValueError, CompressionError):
             raise CompressionError('"message" could not be compressed')
+        self._observe_compression_ratio(len(message), len(compressed_message))
+        return compressed_message
+
+    def _observe_compression_ratio(self, message_size: int, compressed_message_size: int):
+        compression_ratio = compressed_message_size / max(message_size, 1)
+        if self.compression_ratio is None:
+            self.compression_ratio = compression_ratio
+        else:
+            self.compression_ratio += COMPRESSION_RATIO_SMOOTHING * (compression_ratio - self.compression_ratio)
+
+    def _get_compressed_message_body(self, compressed_message: bytes, codec: str = None, binary: bool = False) -> str:
+        codec = codec or self.codec
+        try:
+            compressed_message_body = {"compressedMessage": encode_bytes(compressed_message, self.inline_encoding)}
+        except ValueError:
+            raise CompressionError('"message" could not be compressed')
+        if codec != DEFAULT_COMPRESSION_CODEC:
+            compressed_message_body["codec"] = codec
+        if codec == self.codec and self.compression_dictionary_id is not None:
+            compressed_message_body["dictionary"] = self.compression_dictionary_id
+        if self.inline_encoding != DEFAULT_INLINE_ENCODING:
+            compressed_message_body["encoding"] = self.inline_encoding
+        if binary:
+            compressed_message_body["binary"] = True
+        return self.json_backend.dumps(compressed_message_body)
 
-    @staticmethod
     def _get_cached_message_body(
-        bucket: str, key: str, compressed: bool = False
+        self,
+        bucket: str,
+        key: str,
+        compressed: bool = False,
+        codec: str = DEFAULT_COMPRESSION_CODEC,
+        dictionary_id: int = None,
+        binary: bool = False,
+        frames: int = None,
     ) -> str:
         if not isinstance(bucket, str):
             raise ValueError('"bucket" argument expects type "str"')
@@ -113,22 +580,393 @@ class LargeMessageBuilder:
             raise ValueError('"key" argument expects type "str"')
         if compressed and not isinstance(compressed, bool):
             raise ValueError('"compressed" argument expects type "bool"')
-        return json.dumps({"bucket": bucket, "key": key, "compressed": compressed})
+        cached_message_body = {"bucket": bucket, "key": key, "compressed": compressed}
+        if compressed:
+            cached_message_body.update(_get_codec_options(codec, dictionary_id))
+        if binary:
+            cached_message_body["binary"] = True
+        if frames is not None:
+            cached_message_body["frameSize"] = self.frame_size
+            cached_message_body["frames"] = frames
+        return self.json_backend.dumps(cached_message_body)
 
-    def _store_message_in_s3(self, message: str) -> str:
-        try:
-            s3_object_key = generate_s3_object_key(prefix=self.s3_object_prefix)
-            cached_message_body = self._get_cached_message_body(
-                self.s3_bucket_for_cache, s3_object_key, compressed=self.compress
+    def _get_cached_message_body_for_key(
+        self,
+        s3_object_key: str,
+        compression: CompressionDecision = None,
+        binary: bool = False,
+        message_size: int = None,
+    ) -> str:
+        compression = compression or self._get_default_compression()
+        return self._get_cached_message_body(
+            self.s3_bucket_for_cache,
+            s3_object_key,
+            compressed=compression.compress,
+            codec=compression.codec,
+            dictionary_id=self._get_compression_dictionary_id(compression.codec),
+            binary=binary,
+            frames=self._get_frame_count(message_size),
+        )
+
+    def _get_frame_count(self, message_size: int = None) -> int:
+        if self.frame_size is None or message_size is None:
+            return None
+        return get_frame_count(message_size, self.frame_size)
+
+    def _get_compression_dictionary_id(self, codec: str) -> int:
+        return self.compression_dictionary_id if codec == self.codec else None
+
+    def _generate_s3_object_key(self, message: bytes, compression: CompressionDecision = None) -> str:
+        if not self.deduplicate:
+            return generate_s3_object_key(prefix=self.s3_object_prefix)
+        compression = compression or self._get_default_compression()
+        # The key must also identify how the body is stored, so a pointer never refers to an incompatible encoding.
+        namespace = ""
+        if compression.compress:
+            namespace = f"{compression.codec}:{self._get_compression_dictionary_id(compression.codec)}"
+        if self.frame_size is not None:
+            namespace += f":frames:{self.frame_size}"
+        return generate_content_s3_object_key(message, self.s3_object_prefix, namespace)
+
+    def _is_stored_in_s3(self, s3_object_key: str) -> bool:
+        if not self.deduplicate:
+            return False
+        if s3_object_key in self.known_s3_object_keys:
+            return True
+        if self.check_existing_objects and s3_object_exists(self.s3, self.s3_bucket_for_cache, s3_object_key):
+            self.known_s3_object_keys.add(s3_object_key)
+            return True
+        return False
+
+    def _store_entry_message_in_s3(self, entry: _MessageEntry) -> str:
+        entry.metrics.path = S3_OFFLOADED
+        compression = self._get_compression(entry)
+        compressed_message = self._get_compressed_object_body(entry) if compression.compress else None
+        with entry.metrics.measure("s3"):
+            return self._store_message_in_s3(entry.message_bytes, compressed_message, compression, entry.binary)
+
+    def _store_message_in_s3(
+        self,
+        message: bytes,
+        compressed_message: bytes = None,
+        compression: CompressionDecision = None,
+        binary: bool = False,
+    ) -> str:
+        s3_object_key = self._generate_s3_object_key(message, compression)
+        cached_message_body = self._get_cached_message_body_for_key(s3_object_key, compression, binary, len(message))
+        if not self._is_stored_in_s3(s3_object_key):
+            self._put_message_in_s3(message, s3_object_key, compressed_message, compression)
+
+        return cached_message_body
+
+    def _put_message_in_s3(
+        self,
+        message: bytes,
+        s3_object_key: str,
+        compressed_message: bytes = None,
+        compression: CompressionDecision = None,
+    ):
+        body = self._get_s3_object_body(message, compressed_message, compression)
+        if len(body) < self.multipart_threshold:
+            self.s3.put_object(Bucket=self.s3_bucket_for_cache, Body=body, Key=s3_object_key)
+        else:
+            self._upload_chunks(iter_chunks(body, self.multipart_chunksize), s3_object_key)
+        if self.deduplicate:
+            self.known_s3_object_keys.add(s3_object_key)
+
+    def _store_chunks_in_s3(self, chunks) -> str:
+        s3_object_key = generate_s3_object_key(prefix=self.s3_object_prefix)
+        # Whether the stream is text and how many frames it fills are only known once all of it has been read.
+        text_chunks = TextCheckingIterator(chunks)
+        message_chunks = CountingIterator(text_chunks)
+        self._upload_chunks(self._encode_chunks(message_chunks), s3_object_key)
+
+        return self._get_cached_message_body_for_key(
+            s3_object_key,
+            binary=not text_chunks.is_text,
+            message_size=message_chunks.size if self.frame_size is not None else None,
+        )
+
+    def _encode_chunks(self, chunks):
+        if self.frame_size is not None:
+            return self._encode_frames(chunks)
+        if self.compress:
+            return compress_chunks(
+                chunks,
+                codec=self.codec,
+                level=self.compression_level,
+                dictionary=self.compression_dictionary,
             )
-            if self.compress:
-                message = compress_string(message)
-            else:
-                message = message.encode("utf-8")
-            self.s3.put_object(
-                Bucket=self.s3_bucket_for_cache, Body=message, Key=s3_object_key
+        return chunks
+
+    def _encode_frames(self, chunks, compression: CompressionDecision = None):
+        compression = compression or self._get_default_compression()
+        if not compression.compress:
+            return pack_frames(iter_parts(chunks, self.frame_size))
+        return pack_frames(self._compress_frames(chunks, compression))
+
+    def _compress_frames(self, chunks, compression: CompressionDecision):
+        for frame in iter_parts(chunks, self.frame_size):
+            yield self._compress_message(frame, compression.codec, compression.level)
+
+    def _upload_chunks(self, chunks, s3_object_key: str):
+        upload_chunks_to_s3(
+            self.s3,
+            self.s3_bucket_for_cache,
+            s3_object_key,
+            chunks,
+            self.multipart_threshold,
+            self.multipart_chunksize,
+            self.max_workers,
+        )
+
+    def _get_s3_object_body(
+        self, message: bytes, compressed_message: bytes = None, compression: CompressionDecision = None
+    ) -> bytes:
+        compression = compression or self._get_default_compression()
+        if compression.compress and compressed_message is not None:
+            return compressed_message
+        if self.frame_size is not None:
+            return b"".join(self._encode_frames([_encode_message(message)], compression))
+        if compression.compress:
+            return self._compress_message(message, compression.codec, compression.level)
+        return _encode_message(message)
+
+    def _get_compressed_object_body(self, entry: _MessageEntry) -> bytes:
+        if self.frame_size is None:
+            return self._get_compressed_entry(entry)
+        return b"".join(pack_frames(self._get_compressed_frames(entry)))
+
+    def _get_entry_s3_object_body(self, entry: _MessageEntry) -> bytes:
+        compressed_message = self._get_compressed_object_body(entry) if entry.compression.compress else None
+        return self._get_s3_object_body(entry.message_bytes, compressed_message, entry.compression)
+
+    def _plan_batch(self, entries) -> list:
+        batch = [
+            self._plan_entry(str(index), entry)
+            for index, entry in enumerate(entries)
+        ]
+        self._fit_batch_within_threshold(batch)
+        return batch
+
+    def _plan_fanout(self, message, destinations) -> list:
+        if not isinstance(message, (str, bytes)):
+            raise ValueError('"message" argument expects type "str" or "bytes"')
+        if not isinstance(destinations, (list, tuple)):
+            raise ValueError('"destinations" argument expects type "list"')
+        if not all(attributes is None or isinstance(attributes, dict) for attributes in destinations):
+            raise ValueError('"destinations" argument expects a list of type "dict"')
+
+        fanout = []
+        s3_object_key = None
+        for message_attributes in destinations:
+            entry = _MessageEntry(
+                None, message, message_attributes or None, self.message_size_threshold, self.attribute_schema
             )
+            self._plan_attributes(entry)
+            if fanout:
+                # Every destination shares the encoded and compressed message, and the object it is stored in.
+                entry.reuse_payload(fanout[-1])
+            fanout.append(self._plan_message_entry(entry, s3_object_key))
+            s3_object_key = s3_object_key or entry.s3_object_key
+        for entry in fanout:
+            entry.reuse_payload(fanout[-1])
+        return fanout
 
-            return cached_message_body
-        except CompressionError:
-            raise CompressionError('"message" could not be compressed')
+    def _plan_entry(self, entry_id: str, entry) -> _MessageEntry:
+        message, message_attributes = entry if isinstance(entry, tuple) else (entry, None)
+        if not isinstance(message, (str, bytes)):
+            raise ValueError('"message" argument expects type "str" or "bytes"')
+        if message_attributes is not None and not isinstance(message_attributes, dict):
+            raise ValueError('"message_attributes" argument expects type "dict"')
+
+        batch_entry = _MessageEntry(
+            entry_id, message, message_attributes, self.message_size_threshold, self.attribute_schema
+        )
+        self._plan_attributes(batch_entry)
+        return self._plan_message_entry(batch_entry)
+
+    def _plan_message_entry(self, batch_entry: _MessageEntry, s3_object_key: str = None) -> _MessageEntry:
+        if self.cost_model is not None:
+            # The planner may offload the attributes, so they are only held to the threshold by the plan it picks.
+            attributes_size = self._get_attributes_size(batch_entry.attributes)
+            if not batch_entry.is_smaller_than(self.message_size_threshold - attributes_size):
+                self._plan_entry_delivery(batch_entry, s3_object_key)
+            return batch_entry
+
+        attributes_size = batch_entry.attributes_size
+        if batch_entry.is_smaller_than(self.message_size_threshold - attributes_size):
+            return batch_entry
+        # Every other message is sent with its original size, so the attributes must leave room for it.
+        if batch_entry.message_attributes:
+            validate_message_size_attribute(batch_entry.message_attributes)
+
+        inline_message_body = self._get_inline_message_body_within_threshold(batch_entry, attributes_size)
+        if inline_message_body:
+            batch_entry.body = inline_message_body
+            batch_entry.attributes = self._get_entry_size_attributes(batch_entry)
+        else:
+            self._offload_entry(batch_entry, s3_object_key)
+        return batch_entry
+
+    def _plan_entry_delivery(self, entry: _MessageEntry, s3_object_key: str = None):
+        compression = self._get_compression(entry)
+        plans = get_delivery_plans(
+            self.cost_model,
+            entry.message_size,
+            self._get_attributes_object_size(entry),
+            compress=compression.compress,
+            compression_ratio=compression.ratio or self.compression_ratio,
+            attributes_fit=self._get_attributes_size(entry.message_attributes) <= self.message_size_threshold,
+        )
+        for plan in plans:
+            if plan.offload_body:
+                self._apply_offload_plan(entry, plan, s3_object_key)
+                return
+            if self._apply_inline_plan(entry, plan):
+                return
+
+    def _apply_offload_plan(self, entry: _MessageEntry, plan: DeliveryPlan, s3_object_key: str = None):
+        self._offload_entry_body(entry, s3_object_key)
+        if plan.offload_attributes:
+            attributes_budget = (
+                self.message_size_threshold
+                - get_size_of_string_in_bytes(entry.body)
+                - self._get_size_attribute_size(entry)
+                - 1
+            )
+            entry.message_attributes, entry.attributes_object = self._offload_message_attributes(
+                entry.message_attributes, max(attributes_budget, 0)
+            )
+        entry.attributes = self._get_entry_size_attributes(entry)
+        # Storing the body in S3 is the last plan, so attributes that are still too large cannot be sent.
+        if entry.attributes:
+            self.attribute_schema.get_size(entry.attributes, self.message_size_threshold)
+
+    def _get_attributes_object_size(self, entry: _MessageEntry) -> int:
+        # Attributes already offloaded by "attributes_size_threshold" are not offloaded a second time.
+        if not entry.message_attributes or entry.attributes_object:
+            return None
+        attributes_object_size = self._get_attributes_size(
+            {name: value for name, value in entry.message_attributes.items() if name not in self.inline_attributes}
+        )
+        return attributes_object_size or None
+
+    def _get_attributes_size(self, message_attributes: dict) -> int:
+        if not message_attributes:
+            return 0
+        return sum(self.attribute_schema.get_attribute_size(name, value) for name, value in message_attributes.items())
+
+    def _apply_inline_plan(self, entry: _MessageEntry, plan: DeliveryPlan) -> bool:
+        if plan.compress and self._is_compressed_message_body_too_large(entry, 0):
+            return False
+        body = self._get_planned_message_body(entry, plan.compress)
+        # Every body other than the message itself is sent with the original size, so that attribute is reserved.
+        reserved_size = get_size_of_string_in_bytes(body)
+        if body is not entry.message:
+            reserved_size += self._get_size_attribute_size(entry)
+        attributes_budget = self.message_size_threshold - reserved_size - 1
+
+        message_attributes, attributes_object = entry.message_attributes, entry.attributes_object
+        if plan.offload_attributes:
+            message_attributes, attributes_object = self._offload_message_attributes(
+                message_attributes, max(attributes_budget, 0)
+            )
+        if not self._are_attributes_within_budget(message_attributes, attributes_budget, body is not entry.message):
+            return False
+
+        entry.body = body
+        entry.message_attributes = entry.attributes = message_attributes
+        entry.attributes_object = attributes_object
+        if body is not entry.message:
+            entry.attributes = self._get_entry_size_attributes(entry)
+        if plan.compress:
+            entry.metrics.path = INLINE_COMPRESSED
+        return True
+
+    def _are_attributes_within_budget(
+        self, message_attributes: dict, attributes_budget: int, size_attribute: bool
+    ) -> bool:
+        # The size attribute is only added to a body other than the message itself, so only then must it have room.
+        if size_attribute and message_attributes and len(message_attributes) > MAX_ALLOWED_ATTRIBUTES:
+            return False
+        return attributes_budget >= 0 and self._get_attributes_size(message_attributes) <= attributes_budget
+
+    def _get_planned_message_body(self, entry: _MessageEntry, compress: bool) -> str:
+        if compress:
+            compressed_message = self._get_compressed_entry(entry)
+            with entry.metrics.measure("encoding"):
+                return self._get_compressed_message_body(compressed_message, entry.compression.codec, entry.binary)
+        if entry.binary:
+            return self._get_binary_message_body(entry.message_bytes)
+        return entry.message
+
+    def _get_size_attribute_size(self, entry: _MessageEntry) -> int:
+        if not entry.message_attributes:
+            return 0
+        return self.attribute_schema.get_attribute_size(
+            RESERVED_ATTRIBUTE_NAME, {"StringValue": str(entry.message_size), "DataType": "Number"}
+        )
+
+    def _fit_batch_within_threshold(self, batch: list):
+        batch_size = sum(entry.size for entry in batch)
+        inline_entries = sorted(
+            (entry for entry in batch if entry.s3_object_key is None),
+            key=lambda entry: entry.size,
+            reverse=True,
+        )
+
+        for entry in inline_entries:
+            if batch_size < self.batch_size_threshold:
+                break
+            batch_size -= entry.size
+            self._offload_entry(entry)
+            batch_size += entry.size
+
+        if batch_size >= self.batch_size_threshold:
+            raise ValueError(
+                f"Total size of the batch is {batch_size} bytes which is larger than the threshold of "
+                f"{self.batch_size_threshold} bytes even with every Message Body stored in S3. "
+            )
+
+    def _offload_entry(self, entry: _MessageEntry, s3_object_key: str = None):
+        self._offload_entry_body(entry, s3_object_key)
+        entry.attributes = self._get_entry_size_attributes(entry)
+
+    def _offload_entry_body(self, entry: _MessageEntry, s3_object_key: str = None):
+        compression = self._get_compression(entry)
+        entry.s3_object_key = s3_object_key or self._generate_s3_object_key(entry.message_bytes, compression)
+        entry.metrics.path = S3_OFFLOADED
+        entry.body = self._get_cached_message_body_for_key(
+            entry.s3_object_key, compression, entry.binary, len(entry.message_bytes)
+        )
+
+    @staticmethod
+    def _get_entry_size_attributes(entry: _MessageEntry) -> dict:
+        if not entry.message_attributes:
+            return entry.message_attributes
+        return append_message_size_attribute(dict(entry.message_attributes), entry.message_size)
+
+    def _store_batch_in_s3(self, batch: list):
+        # Identical messages in a deduplicated batch share a key and only need to be uploaded once.
+        offloaded_entries = list({entry.s3_object_key: entry for entry in batch if entry.s3_object_key}.values())
+        attributes_objects = [entry.attributes_object for entry in batch if entry.attributes_object]
+        if not offloaded_entries and not attributes_objects:
+            return
+
+        max_workers = min(self.max_workers, len(offloaded_entries) + len(attributes_objects))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            attributes_futures = [
+                executor.submit(self._put_attributes_object, attributes_object)
+                for attributes_object in attributes_objects
+            ]
+            list(executor.map(self._store_entry_in_s3, offloaded_entries))
+            for attributes_future in attributes_futures:
+                attributes_future.result()
+
+    def _store_entry_in_s3(self, entry: _MessageEntry):
+        if self._is_stored_in_s3(entry.s3_object_key):
+            return
+        compressed_message = self._get_compressed_object_body(entry) if entry.compression.compress else None
+        with entry.metrics.measure("s3"):
+            self._put_message_in_s3(entry.message_bytes, entry.s3_object_key, compressed_message, entry.compression)
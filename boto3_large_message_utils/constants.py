@@ -1,5 +1,39 @@
 SIZE_256K = 262144
 SIZE_400K = 409600
+SIZE_8M = 8388608
 DEFAULT_MESSAGE_SIZE_THRESHOLD = SIZE_256K
 RESERVED_ATTRIBUTE_NAME = "ORIGINAL_MESSAGE_SIZE"
+OFFLOADED_ATTRIBUTES_NAME = "OFFLOADED_MESSAGE_ATTRIBUTES"
 MAX_ALLOWED_ATTRIBUTES = 9  # 10 is the maximum for SNS and SQS, the library requires 1.
+MAX_BATCH_ENTRIES = 10  # 10 is the maximum for SQS SendMessageBatch and SNS PublishBatch.
+DEFAULT_BATCH_SIZE_THRESHOLD = SIZE_256K
+DEFAULT_MAX_WORKERS = 10
+BATCH_MESSAGE_BODY_KEYS = {"sqs": "MessageBody", "sns": "Message"}
+DEFAULT_COMPRESSION_CODEC = "gzip"
+DEFAULT_COMPRESSION_DICTIONARY_SIZE = 112640  # 110 KiB, the zstd default for trained dictionaries.
+COMPRESSION_RATIO_SMOOTHING = 0.2  # Weight of the latest message in the running compression ratio.
+COMPRESSION_PREDICTION_MARGIN = 1.5  # Only skip inline compression when the prediction is well over the threshold.
+BASE64_EXPANSION_RATIO = 4 / 3
+DEFAULT_INLINE_ENCODING = "base64"
+INLINE_ENCODING_EXPANSION_RATIOS = {"base64": BASE64_EXPANSION_RATIO, "base85": 5 / 4}
+DEFAULT_COMPRESSION_SAMPLE_SIZE = 16384
+DEFAULT_COMPRESSION_SAMPLE_COUNT = 4
+DEFAULT_MAX_COMPRESSION_RATIO = 0.9  # Compressing to more than 90% of the original size is not worth the time.
+DEFAULT_FAST_COMPRESSION_RATIO = 0.2  # Highly compressible messages are small enough with the fastest level.
+DEFAULT_FAST_COMPRESSION_LEVEL = 1
+DEFAULT_S3_REQUEST_COST = 1048576  # An S3 round trip takes about as long as uploading 1 MiB.
+DEFAULT_COMPRESSION_BYTE_COST = 2  # Compressing a byte takes about twice as long as uploading it.
+DEFAULT_MULTIPART_THRESHOLD = SIZE_8M
+DEFAULT_MULTIPART_CHUNKSIZE = SIZE_8M  # S3 requires every part except the last to be at least 5 MiB.
+DEFAULT_READ_CHUNKSIZE = 65536
+DEFAULT_CACHE_SIZE = 67108864  # 64 MiB
+DEFAULT_DISK_CACHE_SIZE = 1073741824  # 1 GiB
+DEFAULT_PREFETCH_DEPTH = 4  # Messages retrieved in the background while the current one is processed.
+DEFAULT_PREFETCH_MEMORY = 67108864  # 64 MiB
+DEFAULT_KNOWN_S3_OBJECT_KEYS = 10000
+DEFAULT_ATTRIBUTE_SCHEMA_SIZE = 1000  # Distinct attribute names and data types whose sizes are remembered.
+DEFAULT_MAX_POOL_CONNECTIONS = 50  # botocore defaults to 10, fewer than concurrent batch and multipart uploads.
+MAX_SHARED_S3_CLIENTS = 16  # Shared clients kept per session, each for a different set of client options.
+DEFAULT_TIMING_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+DEFAULT_JSON_BACKEND = "json"
+AUTO_JSON_BACKENDS = ("orjson", "ujson", "json")  # In order of preference when the backend is "auto".
@@ -1,40 +1,266 @@
+import io
 import json
+import logging
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from json import JSONDecodeError
 
-import boto3
-
+from boto3_large_message_utils.constants import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_COMPRESSION_CODEC,
+    DEFAULT_INLINE_ENCODING,
+    DEFAULT_PREFETCH_DEPTH,
+    DEFAULT_PREFETCH_MEMORY,
+    OFFLOADED_ATTRIBUTES_NAME,
+    RESERVED_ATTRIBUTE_NAME,
+)
 from boto3_large_message_utils.exceptions import DecompressionError
+from boto3_large_message_utils.utils.attributes import decode_message_attributes, read_offloaded_attributes_reference
 from boto3_large_message_utils.utils.compression import (
-    decode_and_decompress_string,
+    decode_string,
+    decompress_bytes,
     decompress_string,
+    get_compression_dictionary_id,
+    get_size_of_string_in_bytes,
+    open_decompressing_stream,
+)
+from boto3_large_message_utils.utils.client import get_s3_client
+from boto3_large_message_utils.utils.frames import (
+    FramedReader,
+    decode_frames,
+    get_frame_index_size,
+    get_frame_span,
+    read_frame_index,
+    split_frame_index,
+)
+from boto3_large_message_utils.utils.metrics import (
+    CACHE_RETRIEVED,
+    INLINE_COMPRESSED,
+    S3_RETRIEVED,
+    MessageMetrics,
+)
+from boto3_large_message_utils.utils.prefetch import prefetch
+from boto3_large_message_utils.utils.serialization import get_json_backend
+from boto3_large_message_utils.utils.s3 import is_invalid_range_error
+from boto3_large_message_utils.utils.stream import open_stream
+
+logger = logging.getLogger(__name__)
+
+# Envelopes are JSON objects that start with one of their own keys, so any other message is recognised from its first
+# few characters and returned without being parsed.
+_ENVELOPE_PATTERN = re.compile(
+    r'\s*\{\s*"(?:compressedMessage|binaryMessage|bucket|key|compressed|codec|dictionary|encoding|binary)"\s*:'
 )
+_BINARY_ENVELOPE_PATTERN = re.compile(_ENVELOPE_PATTERN.pattern.encode("utf-8"))
+
+_S3Pointer = namedtuple("_S3Pointer", ["bucket", "key", "compressed", "codec", "dictionary", "frames"])
+
+# Where parse_range reads a range from.
+_EMPTY_RANGE = "empty"
+_FRAMES_RANGE = "frames"
+_OBJECT_RANGE = "object"
+_MESSAGE_RANGE = "message"
+
+
+def is_envelope(message) -> bool:
+    if isinstance(message, bytes):
+        return _BINARY_ENVELOPE_PATTERN.match(message) is not None
+    return _ENVELOPE_PATTERN.match(message) is not None
+
+
+def load_envelope(message, loads=json.loads) -> dict:
+    if not is_envelope(message):
+        return None
+    try:
+        json_message = loads(message)
+    except ValueError:
+        return None
+    return json_message if isinstance(json_message, dict) else None
+
+
+def _as_payload_type(message, binary: bool):
+    if binary and isinstance(message, str):
+        return message.encode("utf-8")
+    if not binary and isinstance(message, bytes):
+        return message.decode("utf-8")
+    return message
+
+
+def _get_prefetch_size(message) -> int:
+    # A message stored in S3 is sent with its original size, which is what holding it once retrieved costs.
+    if isinstance(message, dict):
+        message_size = (message.get("MessageAttributes") or {}).get(RESERVED_ATTRIBUTE_NAME, {}).get("StringValue")
+        if message_size and message_size.isdigit():
+            return int(message_size)
+        message = message.get("Body", "")
+    return len(message) if isinstance(message, (str, bytes)) else 0
+
+
+def _validate_prefetch_arguments(prefetch_depth: int, prefetch_memory: int):
+    if not isinstance(prefetch_depth, int) or prefetch_depth < 0:
+        raise ValueError('"prefetch_depth" argument expects a non-negative "int"')
+    if prefetch_memory is not None and (not isinstance(prefetch_memory, int) or prefetch_memory < 0):
+        raise ValueError('"prefetch_memory" argument expects a non-negative "int"')
+
+
+@contextmanager
+def _log_retrieval_errors(bucket: str, key: str):
+    try:
+        yield
+    except Exception:
+        logger.error("Error retrieving message %s from S3 bucket %s", key, bucket)
+        raise
+
+
+def _get_byte_range(start: int, end: int = None) -> str:
+    return f"bytes={start}-" if end is None else f"bytes={start}-{end - 1}"
+
+
+def _validate_range(start: int, end: int = None):
+    if not isinstance(start, int) or start < 0:
+        raise ValueError('"start" argument expects a non-negative "int"')
+    if end is not None and (not isinstance(end, int) or end < start):
+        raise ValueError('"end" argument expects an "int" no smaller than "start"')
+
+
+def _decode_framed_object(body: bytes, frames: int, codec: str, dictionary: bytes, message_metrics: MessageMetrics):
+    body, offsets = split_frame_index(body, frames)
+    if codec is None:
+        return decode_frames(body, offsets)
+    message_metrics.compressed_size = len(body)
+    with message_metrics.measure("decompression"):
+        return decode_frames(body, offsets, codec, dictionary)
+
+
+def _get_frame_index_range(frames: int) -> str:
+    return f"bytes=-{get_frame_index_size(frames)}"
+
+
+def _decode_s3_object(body: bytes, compressed, codec, dictionary, message_metrics, binary=False, frames=None):
+    try:
+        if frames is not None:
+            body = _decode_framed_object(body, frames, codec if compressed else None, dictionary, message_metrics)
+        elif compressed:
+            message_metrics.compressed_size = len(body)
+            decompress = decompress_bytes if binary else decompress_string
+            with message_metrics.measure("decompression"):
+                return decompress(body, codec, dictionary)
+    except DecompressionError:
+        raise DecompressionError('"message" could not be decompressed')
+
+    message_metrics.message_size = len(body)
+    return body if binary else body.decode("utf-8")
+
+
+def _slice_frames(message: bytes, frame_size: int, first_frame: int, start: int, end: int = None) -> bytes:
+    base = first_frame * frame_size
+    return message[start - base:None if end is None else end - base]
+
+
+def _restore_message_attributes(message_attributes: dict, offloaded_attributes: bytes) -> dict:
+    restored_attributes = {
+        name: value for name, value in message_attributes.items() if name != OFFLOADED_ATTRIBUTES_NAME
+    }
+    restored_attributes.update(decode_message_attributes(offloaded_attributes))
+    return restored_attributes
 
 
 class LargeMessageParser:
-    def __init__(self, session=None):
-        if session:
-            self.s3 = session.client("s3")
-        else:
-            self.s3 = boto3.client("s3")
+    def __init__(
+        self,
+        session=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        s3_client=None,
+        compression_dictionaries=None,
+        cache=None,
+        s3_client_options=None,
+        metrics=None,
+        json_backend=None,
+    ):
+        self.max_workers = max_workers
+        self.json_backend = get_json_backend(json_backend)
+        self.cache = cache
+        self.metrics = metrics
+        self.compression_dictionaries = {
+            get_compression_dictionary_id(dictionary): dictionary
+            for dictionary in compression_dictionaries or []
+        }
+
+        self.session = session
+        self.s3_client_options = s3_client_options
+        self._s3 = s3_client
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            self._s3 = get_s3_client(self.session, **(self.s3_client_options or {}))
+        return self._s3
+
+    @s3.setter
+    def s3(self, s3_client):
+        self._s3 = s3_client
 
     def parse_json(self, json_message):
-        message = self._parse_contents(json_message)
-        if isinstance(message, str):
-            return json.loads(message)
-        else:
-            return message
+        message_metrics = MessageMetrics("parse")
+        with self._report_errors(message_metrics):
+            # The payload is kept as bytes, which every JSON backend parses without decoding it to a string first.
+            if isinstance(json_message, (str, bytes)):
+                message = self._parse_message(json_message, message_metrics, binary=True)
+            else:
+                message = self._parse_contents(json_message, message_metrics, binary=True)
+            parsed_message = self._load_json(message)
+        self._report(message_metrics, message)
+        return parsed_message
+
+    def _load_json(self, message):
+        return self.json_backend.loads(message) if isinstance(message, (str, bytes)) else message
+
+    @contextmanager
+    def _report_errors(self, message_metrics: MessageMetrics):
+        try:
+            yield
+        except Exception as e:
+            self._report(message_metrics, error=e)
+            raise
+
+    def _report(self, message_metrics: MessageMetrics, message=None, error: Exception = None):
+        if self.metrics is None:
+            return
+        if message_metrics.message_size is None and isinstance(message, str):
+            message_metrics.message_size = get_size_of_string_in_bytes(message)
+        elif message_metrics.message_size is None and isinstance(message, bytes):
+            message_metrics.message_size = len(message)
+        message_metrics.finish(error)
+        self.metrics.message_finished(message_metrics)
+
+    def _parse_contents(self, json_message, message_metrics: MessageMetrics = None, binary: bool = False):
+        message_metrics = message_metrics or MessageMetrics("parse")
+        binary = binary or json_message.get("binary", False)
+        contents = self._decode_envelope(json_message, message_metrics, binary)
+        if isinstance(contents, _S3Pointer):
+            return self._retrieve_message_from_s3(**contents._asdict(), message_metrics=message_metrics, binary=binary)
+        return contents
 
-    def _parse_contents(self, json_message):
+    def _decode_envelope(self, json_message: dict, message_metrics: MessageMetrics, binary: bool = False):
+        # Inline envelopes are decoded, while the pointer of a message stored in S3 is returned for it to be retrieved.
         try:
             if json_message.get("compressedMessage"):
-                return decode_and_decompress_string(
-                    json_message.get("compressedMessage")
+                message_metrics.path = INLINE_COMPRESSED
+                return self._decode_inline_message(json_message, message_metrics, binary)
+            if json_message.get("binaryMessage"):
+                return decode_string(
+                    json_message["binaryMessage"], json_message.get("encoding", DEFAULT_INLINE_ENCODING)
                 )
             if json_message.get("bucket"):
-                return self._retrieve_message_from_s3(
+                return _S3Pointer(
                     bucket=json_message["bucket"],
                     key=json_message["key"],
                     compressed=json_message["compressed"],
+                    codec=json_message.get("codec", DEFAULT_COMPRESSION_CODEC),
+                    dictionary=self._get_compression_dictionary(json_message.get("dictionary")),
+                    frames=json_message.get("frames"),
                 )
             return json_message
         except (KeyError, JSONDecodeError):
@@ -42,25 +268,213 @@ class LargeMessageParser:
         except DecompressionError:
             raise DecompressionError('"message" could not be decompressed')
 
+    def _decode_inline_message(self, json_message: dict, message_metrics: MessageMetrics, binary: bool = False):
+        compressed_message = decode_string(
+            json_message["compressedMessage"], json_message.get("encoding", DEFAULT_INLINE_ENCODING)
+        )
+        message_metrics.compressed_size = len(compressed_message)
+        decompress = decompress_bytes if binary else decompress_string
+        with message_metrics.measure("decompression"):
+            return decompress(
+                compressed_message,
+                json_message.get("codec", DEFAULT_COMPRESSION_CODEC),
+                self._get_compression_dictionary(json_message.get("dictionary")),
+            )
+
+    def _get_compression_dictionary(self, dictionary_id: int = None) -> bytes:
+        if dictionary_id is None:
+            return None
+        if dictionary_id not in self.compression_dictionaries:
+            raise DecompressionError(f"Compression dictionary {dictionary_id} is not available")
+        return self.compression_dictionaries[dictionary_id]
+
     def parse(self, message):
-        if not isinstance(message, str):
-            raise ValueError('"message" argument expects type "str"')
-        try:
-            json_message = json.loads(message)
-            return self._parse_contents(json_message)
-        except (KeyError, JSONDecodeError):
+        if not isinstance(message, (str, bytes)):
+            raise ValueError('"message" argument expects type "str" or "bytes"')
+        message_metrics = MessageMetrics("parse")
+        with self._report_errors(message_metrics):
+            parsed_message = self._parse_message(message, message_metrics)
+        self._report(message_metrics, parsed_message)
+        return parsed_message
+
+    def _parse_message(self, message, message_metrics: MessageMetrics, binary: bool = False):
+        json_message = load_envelope(message, self.json_backend.loads)
+        if json_message is None:
             return message
-        except DecompressionError:
-            raise DecompressionError('"message" could not be decompressed')
+        parsed_message = self._parse_contents(json_message, message_metrics, binary)
+        # A JSON object that only looked like an envelope is returned as it was received.
+        return message if parsed_message is json_message else parsed_message
+
+    def parse_attributes(self, message_attributes: dict) -> dict:
+        if not isinstance(message_attributes, dict):
+            raise ValueError('"message_attributes" argument expects type "dict"')
+        location = read_offloaded_attributes_reference(message_attributes)
+        if location is None:
+            return message_attributes
+        bucket, key = location
+        response = self.s3.get_object(Bucket=bucket, Key=key)
+        return _restore_message_attributes(message_attributes, response["Body"].read())
+
+    def open(self, message) -> io.BufferedIOBase:
+        if not isinstance(message, (str, bytes)):
+            raise ValueError('"message" argument expects type "str" or "bytes"')
+        json_message = load_envelope(message, self.json_backend.loads) or {}
+        contents = self._decode_envelope(json_message, MessageMetrics("parse"), binary=True)
+        if isinstance(contents, _S3Pointer):
+            return self._open_message_in_s3(**contents._asdict())
+        if contents is not json_message:
+            message = contents
+        return io.BytesIO(message if isinstance(message, bytes) else message.encode("utf-8"))
 
-    def _retrieve_message_from_s3(self, bucket, key, compressed=False):
+    def _open_message_in_s3(
+        self, bucket, key, compressed=False, codec=DEFAULT_COMPRESSION_CODEC, dictionary=None, frames=None
+    ):
+        if frames is not None:
+            return self._open_frames_in_s3(bucket, key, frames, codec if compressed else None, dictionary)
+        response = self.s3.get_object(Bucket=bucket, Key=key)
+        if compressed:
+            return open_decompressing_stream(response["Body"], codec, dictionary)
+        return open_stream(response["Body"])
+
+    def _open_frames_in_s3(self, bucket: str, key: str, frames: int, codec: str = None, dictionary: bytes = None):
+        offsets = self._get_frame_offsets(bucket, key, frames)
+        if offsets[-1] == 0:
+            return io.BytesIO()
+        # The index gives the frame boundaries, then every frame is streamed from one request that stops before it.
+        response = self.s3.get_object(Bucket=bucket, Key=key, Range=_get_byte_range(0, offsets[-1]))
+        return io.BufferedReader(FramedReader(response["Body"], offsets, codec, dictionary))
+
+    def parse_range(self, message, start: int = 0, end: int = None) -> bytes:
+        source, json_message = self._get_range_source(message, start, end)
+        if source == _FRAMES_RANGE:
+            return self._parse_frames_in_s3(json_message, start, end)
+        if source == _OBJECT_RANGE:
+            return self._get_s3_object_range(json_message["bucket"], json_message["key"], _get_byte_range(start, end))
+        if source == _MESSAGE_RANGE:
+            return _as_payload_type(self.parse(message), True)[start:end]
+        return b""
+
+    def _get_range_source(self, message, start: int, end: int = None) -> (str, dict):
+        if not isinstance(message, (str, bytes)):
+            raise ValueError('"message" argument expects type "str" or "bytes"')
+        _validate_range(start, end)
+        if end == start:
+            return _EMPTY_RANGE, None
+        json_message = load_envelope(message, self.json_backend.loads) or {}
+        if json_message.get("bucket") and "key" in json_message:
+            if json_message.get("frames") is not None:
+                return _FRAMES_RANGE, json_message
+            # An uncompressed object is read directly, while a compressed one has to be retrieved in full.
+            if not json_message.get("compressed"):
+                return _OBJECT_RANGE, json_message
+        return _MESSAGE_RANGE, None
+
+    def _parse_frames_in_s3(self, json_message: dict, start: int, end: int = None) -> bytes:
+        bucket, key, frames = json_message["bucket"], json_message["key"], json_message["frames"]
+        first_frame, stop_frame = get_frame_span(json_message["frameSize"], frames, start, end)
+        if first_frame == stop_frame:
+            return b""
+        offsets = self._get_frame_offsets(bucket, key, frames)[first_frame:stop_frame + 1]
+        body = self._get_s3_object_range(bucket, key, _get_byte_range(offsets[0], offsets[-1]))
+        return self._decode_frame_range(json_message, body, offsets, first_frame, start, end)
+
+    def _decode_frame_range(
+        self, json_message: dict, body: bytes, offsets: list, first_frame: int, start: int, end: int = None
+    ) -> bytes:
+        message = decode_frames(
+            body,
+            offsets,
+            json_message.get("codec", DEFAULT_COMPRESSION_CODEC) if json_message.get("compressed") else None,
+            self._get_compression_dictionary(json_message.get("dictionary")),
+        )
+        return _slice_frames(message, json_message["frameSize"], first_frame, start, end)
+
+    def _get_frame_offsets(self, bucket: str, key: str, frames: int) -> list:
+        if not frames:
+            return [0]
+        return read_frame_index(self._get_s3_object_range(bucket, key, _get_frame_index_range(frames)))
+
+    def _get_s3_object_range(self, bucket: str, key: str, byte_range: str) -> bytes:
         try:
-            response = self.s3.get_object(Bucket=bucket, Key=key)
-            body = response["Body"].read()
-            if compressed:
-                return decompress_string(body)
+            return self.s3.get_object(Bucket=bucket, Key=key, Range=byte_range)["Body"].read()
+        except Exception as e:
+            # S3 rejects a range that starts past the end of the object, which is empty like the same slice would be.
+            if is_invalid_range_error(e):
+                return b""
+            raise
+
+    def parse_batch(self, messages: list) -> list:
+        if not isinstance(messages, (list, tuple)):
+            raise ValueError('"messages" argument expects type "list"')
+        if not all(isinstance(message, dict) for message in messages):
+            raise ValueError('"messages" argument expects a list of type "dict"')
+        if not messages:
+            return []
 
-            return body.decode("utf-8")
+        max_workers = min(self.max_workers, len(messages))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self._parse_batch_message, messages))
+
+    def iter_parse(self, messages, prefetch_depth=DEFAULT_PREFETCH_DEPTH, prefetch_memory=DEFAULT_PREFETCH_MEMORY):
+        _validate_prefetch_arguments(prefetch_depth, prefetch_memory)
+        return self._iter_parse(messages, prefetch_depth, prefetch_memory)
+
+    def _iter_parse(self, messages, prefetch_depth: int, prefetch_memory: int):
+        with ThreadPoolExecutor(max_workers=max(min(self.max_workers, prefetch_depth), 1)) as executor:
+            yield from prefetch(
+                self._parse_prefetched_message, messages, executor, prefetch_depth, prefetch_memory, _get_prefetch_size
+            )
+
+    def _parse_prefetched_message(self, message):
+        if isinstance(message, dict):
+            return self._parse_batch_message(message)
+        return self.parse(message)
+
+    def _parse_batch_message(self, message: dict) -> dict:
+        parsed_message = dict(message)
+        try:
+            parsed_message["Body"] = self.parse(message["Body"])
+            if message.get("MessageAttributes"):
+                parsed_message["MessageAttributes"] = self.parse_attributes(message["MessageAttributes"])
         except Exception as e:
-            print("Error retrieving message from S3")
-            raise e
+            parsed_message["Error"] = e
+        return parsed_message
+
+    def _retrieve_message_from_s3(
+        self,
+        bucket,
+        key,
+        compressed=False,
+        codec=DEFAULT_COMPRESSION_CODEC,
+        dictionary=None,
+        message_metrics=None,
+        binary=False,
+        frames=None,
+    ):
+        message_metrics = message_metrics or MessageMetrics("parse")
+        message = self._get_cached_message(bucket, key, message_metrics)
+        if message is None:
+            message = self._download_message_from_s3(
+                bucket, key, compressed, codec, dictionary, message_metrics, binary, frames
+            )
+            self._cache_message(bucket, key, message)
+        return _as_payload_type(message, binary)
+
+    def _get_cached_message(self, bucket: str, key: str, message_metrics: MessageMetrics):
+        message_metrics.path = CACHE_RETRIEVED
+        message = self.cache.get(bucket, key) if self.cache is not None else None
+        if message is None:
+            message_metrics.path = S3_RETRIEVED
+        return message
+
+    def _cache_message(self, bucket: str, key: str, message):
+        if self.cache is not None:
+            self.cache.put(bucket, key, message)
+
+    def _download_message_from_s3(
+        self, bucket, key, compressed, codec, dictionary, message_metrics, binary=False, frames=None
+    ):
+        with _log_retrieval_errors(bucket, key):
+            with message_metrics.measure("s3"):
+                body = self.s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+            return _decode_s3_object(body, compressed, codec, dictionary, message_metrics, binary, frames)
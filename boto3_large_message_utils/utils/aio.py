@@ -0,0 +1,80 @@
+import asyncio
+from collections import deque
+
+from boto3_large_message_utils.utils.prefetch import END, get_item_size, has_prefetch_capacity
+from boto3_large_message_utils.utils.stream import iter_parts, prepend_chunk, read_head
+
+
+async def run_in_executor(executor, func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+
+async def prefetch(function, items, depth: int, memory_budget: int = None, get_size=None):
+    items = iter(items)
+    pending = deque()
+    pending_size = 0
+    try:
+        item = next(items, END)
+        item_size = get_item_size(item, get_size)
+        while pending or item is not END:
+            while item is not END and has_prefetch_capacity(pending, pending_size + item_size, depth, memory_budget):
+                pending.append((item_size, asyncio.ensure_future(function(item))))
+                pending_size += item_size
+                item = next(items, END)
+                item_size = get_item_size(item, get_size)
+            size, task = pending.popleft()
+            pending_size -= size
+            yield await task
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+async def upload_chunks_to_s3(
+    s3, bucket: str, key: str, chunks, multipart_threshold: int, part_size: int, max_workers: int, executor=None
+):
+    # Chunks may be read from a file or compressed as they are produced, so they are pulled in the executor.
+    head, chunks = await run_in_executor(executor, read_head, chunks, multipart_threshold)
+    if chunks is None:
+        await s3.put_object(Bucket=bucket, Body=head, Key=key)
+        return
+
+    upload_id = (await s3.create_multipart_upload(Bucket=bucket, Key=key))["UploadId"]
+    try:
+        parts = await _upload_parts(
+            s3, bucket, key, upload_id, iter_parts(prepend_chunk(head, chunks), part_size), max_workers, executor
+        )
+        await s3.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+    except Exception:
+        await s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+
+async def _upload_parts(s3, bucket: str, key: str, upload_id: str, parts, max_workers: int, executor=None) -> list:
+    async def upload_part(part_number, body):
+        response = await s3.upload_part(
+            Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body
+        )
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    uploaded_parts = []
+    pending_parts = deque()
+    part_number = 1
+    try:
+        body = await run_in_executor(executor, next, parts, END)
+        while body is not END:
+            # Wait for the oldest part before reading another, so at most max_workers parts are held in memory.
+            if len(pending_parts) >= max_workers:
+                uploaded_parts.append(await pending_parts.popleft())
+            pending_parts.append(asyncio.ensure_future(upload_part(part_number, body)))
+            part_number += 1
+            body = await run_in_executor(executor, next, parts, END)
+        while pending_parts:
+            uploaded_parts.append(await pending_parts.popleft())
+    finally:
+        for pending_part in pending_parts:
+            pending_part.cancel()
+    return uploaded_parts
@@ -0,0 +1,40 @@
+import base64
+import json
+
+from boto3_large_message_utils.constants import OFFLOADED_ATTRIBUTES_NAME
+
+
+def encode_message_attributes(message_attributes: dict) -> bytes:
+    if not isinstance(message_attributes, dict):
+        raise ValueError('"message_attributes" argument expects type "dict"')
+    encoded_attributes = {}
+    for name, value in message_attributes.items():
+        encoded_value = dict(value)
+        binary_value = encoded_value.get("BinaryValue")
+        if binary_value is not None:
+            # SQS and SNS deliver binary values as bytes, so they are stored as base64 and restored as bytes.
+            if isinstance(binary_value, str):
+                binary_value = binary_value.encode("utf-8")
+            encoded_value["BinaryValue"] = base64.b64encode(binary_value).decode("ascii")
+        encoded_attributes[name] = encoded_value
+    return json.dumps(encoded_attributes).encode("utf-8")
+
+
+def decode_message_attributes(encoded_attributes: bytes) -> dict:
+    message_attributes = json.loads(encoded_attributes)
+    for value in message_attributes.values():
+        if value.get("BinaryValue") is not None:
+            value["BinaryValue"] = base64.b64decode(value["BinaryValue"])
+    return message_attributes
+
+
+def get_offloaded_attributes_reference(bucket: str, key: str) -> dict:
+    return {"StringValue": json.dumps({"bucket": bucket, "key": key}), "DataType": "String"}
+
+
+def read_offloaded_attributes_reference(message_attributes: dict) -> (str, str):
+    reference = message_attributes.get(OFFLOADED_ATTRIBUTES_NAME)
+    if not reference:
+        return None
+    location = json.loads(reference["StringValue"])
+    return location["bucket"], location["key"]
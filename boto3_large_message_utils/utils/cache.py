@@ -0,0 +1,141 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from boto3_large_message_utils.constants import DEFAULT_CACHE_SIZE, DEFAULT_DISK_CACHE_SIZE
+
+
+class PayloadCache:
+    def __init__(
+        self, max_size: int = DEFAULT_CACHE_SIZE, directory: str = None, max_disk_size: int = DEFAULT_DISK_CACHE_SIZE
+    ):
+        if not isinstance(max_size, int) or max_size < 0:
+            raise ValueError('"max_size" argument expects a non-negative "int"')
+        if directory is not None and not isinstance(directory, str):
+            raise ValueError('"directory" argument expects type "str"')
+
+        self.max_size = max_size
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self.size = 0
+        self.disk_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._disk_entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._disk_entries)
+
+    def get(self, bucket: str, key: str):
+        cache_key = (bucket, key)
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return self._entries[cache_key]
+            if cache_key in self._disk_entries:
+                payload = self._read_from_disk(cache_key)
+                if payload is not None:
+                    self.hits += 1
+                    return payload
+            self.misses += 1
+            return None
+
+    def put(self, bucket: str, key: str, payload):
+        cache_key = (bucket, key)
+        payload_size = _get_payload_size(payload)
+        with self._lock:
+            self._discard(cache_key)
+            if payload_size <= self.max_size:
+                self._entries[cache_key] = payload
+                self.size += payload_size
+                self._evict()
+            else:
+                self._spill(cache_key, payload)
+
+    def clear(self):
+        with self._lock:
+            for cache_key in list(self._disk_entries):
+                self._remove_from_disk(cache_key)
+            self._entries.clear()
+            self.size = 0
+
+    def _discard(self, cache_key):
+        if cache_key in self._entries:
+            self.size -= _get_payload_size(self._entries.pop(cache_key))
+        if cache_key in self._disk_entries:
+            self._remove_from_disk(cache_key)
+
+    def _evict(self):
+        while self.size > self.max_size:
+            cache_key, payload = self._entries.popitem(last=False)
+            self.size -= _get_payload_size(payload)
+            self._spill(cache_key, payload)
+
+    def _spill(self, cache_key, payload):
+        if self.directory is None:
+            self.evictions += 1
+            return
+        binary = isinstance(payload, bytes)
+        data = payload if binary else payload.encode("utf-8")
+        if self.max_disk_size is not None and len(data) > self.max_disk_size:
+            self.evictions += 1
+            return
+        # A full or unwritable disk loses the payload like any other eviction, rather than failing the put.
+        if not _write_to_disk(self._get_path(cache_key), data):
+            self.evictions += 1
+            return
+        self._disk_entries[cache_key] = (len(data), binary)
+        self.disk_size += len(data)
+        while self.max_disk_size is not None and self.disk_size > self.max_disk_size:
+            self._remove_from_disk(next(iter(self._disk_entries)))
+            self.evictions += 1
+
+    def _read_from_disk(self, cache_key):
+        try:
+            with open(self._get_path(cache_key), "rb") as f:
+                data = f.read()
+        except OSError:
+            self.disk_size -= self._disk_entries.pop(cache_key)[0]
+            return None
+        self._disk_entries.move_to_end(cache_key)
+        # Binary payloads are returned as they were put, everything else was a string.
+        return data if self._disk_entries[cache_key][1] else data.decode("utf-8")
+
+    def _remove_from_disk(self, cache_key):
+        self.disk_size -= self._disk_entries.pop(cache_key)[0]
+        try:
+            os.remove(self._get_path(cache_key))
+        except OSError:
+            pass
+
+    def _get_path(self, cache_key) -> str:
+        name = hashlib.sha256("/".join(cache_key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name)
+
+
+def _write_to_disk(path: str, data: bytes) -> bool:
+    try:
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        try:
+            os.remove(path + ".tmp")
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def _get_payload_size(payload) -> int:
+    if isinstance(payload, bytes):
+        return len(payload)
+    return len(payload.encode("utf-8"))
@@ -0,0 +1,78 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+from boto3_large_message_utils.constants import DEFAULT_MAX_POOL_CONNECTIONS, MAX_SHARED_S3_CLIENTS
+
+S3_CLIENT_OPTIONS = (
+    "max_pool_connections",
+    "retry_mode",
+    "max_attempts",
+    "connect_timeout",
+    "read_timeout",
+    "tcp_keepalive",
+)
+
+# Clients are held weakly by session, so they are released with the session that created them.
+_S3_CLIENTS = weakref.WeakKeyDictionary()
+_DEFAULT_SESSION_S3_CLIENTS = OrderedDict()
+_S3_CLIENTS_LOCK = threading.Lock()
+
+
+def create_s3_client_config(
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    retry_mode: str = None,
+    max_attempts: int = None,
+    connect_timeout: float = None,
+    read_timeout: float = None,
+    tcp_keepalive: bool = None,
+):
+    # boto3 and botocore take hundreds of milliseconds to import, so they are only imported once a client is needed.
+    from botocore.config import Config
+
+    if not isinstance(max_pool_connections, int) or max_pool_connections < 1:
+        raise ValueError('"max_pool_connections" argument expects a positive "int"')
+
+    config = {"max_pool_connections": max_pool_connections}
+    retries = {"mode": retry_mode, "max_attempts": max_attempts}
+    if any(value is not None for value in retries.values()):
+        config["retries"] = {name: value for name, value in retries.items() if value is not None}
+    # Only pass the options that were set, so older botocore releases that do not know them keep working.
+    options = {"connect_timeout": connect_timeout, "read_timeout": read_timeout, "tcp_keepalive": tcp_keepalive}
+    config.update({name: value for name, value in options.items() if value is not None})
+    return Config(**config)
+
+
+def get_s3_client(session=None, **client_options):
+    unknown_options = set(client_options) - set(S3_CLIENT_OPTIONS)
+    if unknown_options:
+        raise ValueError(f"Unknown S3 client options {sorted(unknown_options)}, expected one of {S3_CLIENT_OPTIONS}")
+
+    client_key = tuple(sorted(client_options.items()))
+    with _S3_CLIENTS_LOCK:
+        clients = _get_session_s3_clients(session)
+        if client_key in clients:
+            clients.move_to_end(client_key)
+            return clients[client_key]
+
+        import boto3
+
+        config = create_s3_client_config(**client_options)
+        client = clients[client_key] = (session or boto3).client("s3", config=config)
+        while len(clients) > MAX_SHARED_S3_CLIENTS:
+            clients.popitem(last=False)
+        return client
+
+
+def _get_session_s3_clients(session) -> OrderedDict:
+    if session is None:
+        return _DEFAULT_SESSION_S3_CLIENTS
+    if session not in _S3_CLIENTS:
+        _S3_CLIENTS[session] = OrderedDict()
+    return _S3_CLIENTS[session]
+
+
+def clear_s3_clients():
+    with _S3_CLIENTS_LOCK:
+        _S3_CLIENTS.clear()
+        _DEFAULT_SESSION_S3_CLIENTS.clear()
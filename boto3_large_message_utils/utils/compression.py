@@ -1,48 +1,459 @@
 import base64
-import binascii
+import functools
 import gzip
+import io
 import uuid
+import zlib
+from boto3_large_message_utils.constants import (
+    DEFAULT_COMPRESSION_CODEC,
+    DEFAULT_COMPRESSION_DICTIONARY_SIZE,
+    DEFAULT_INLINE_ENCODING,
+    DEFAULT_READ_CHUNKSIZE,
+)
 from boto3_large_message_utils.exceptions import CompressionError, DecompressionError
+from boto3_large_message_utils.utils.lazy import OptionalLoaders
+from boto3_large_message_utils.utils.stream import StreamReader
 
+# The optional codec packages are imported when their codec is first requested.
+zstandard = None
+lz4 = None
+brotli = None
 
-def compress_string(string_to_compress: str) -> bytes:
-    if not isinstance(string_to_compress, str):
-        raise ValueError('"string_to_compress" argument expects type "str"')
+
+class Codec:
+    def __init__(
+        self, name, compress, decompress, errors=(), get_dictionary_id=None, compressobj=None, decompressobj=None
+    ):
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+        self.errors = (OSError, EOFError, ValueError, TypeError, RuntimeError, zlib.error) + tuple(errors)
+        self.get_dictionary_id = get_dictionary_id
+        self.compressobj = compressobj
+        self.decompressobj = decompressobj
+
+    @property
+    def supports_dictionary(self) -> bool:
+        return self.get_dictionary_id is not None
+
+    @property
+    def supports_streaming(self) -> bool:
+        return self.compressobj is not None
+
+    @property
+    def supports_streaming_decompression(self) -> bool:
+        return self.decompressobj is not None
+
+
+class _StreamCompressor:
+    def __init__(self, compress, flush, header=b""):
+        self._compress = compress
+        self._flush = flush
+        self._header = header
+
+    def compress(self, data: bytes) -> bytes:
+        header, self._header = self._header, b""
+        return header + self._compress(data)
+
+    def flush(self) -> bytes:
+        header, self._header = self._header, b""
+        return header + self._flush()
+
+
+class _StreamDecompressor:
+    def __init__(self, decompress, is_finished, flush=None):
+        self.decompress = decompress
+        self._is_finished = is_finished
+        self._flush = flush
+
+    @property
+    def eof(self) -> bool:
+        return self._is_finished()
+
+    def flush(self) -> bytes:
+        return self._flush() if self._flush else b""
+
+
+class _DecompressingReader(StreamReader):
+    def __init__(self, stream, decompressor, errors, chunk_size: int):
+        super().__init__(stream, chunk_size)
+        self._decompressor = decompressor
+        self._errors = errors
+
+    def _transform(self, chunk: bytes) -> bytes:
+        try:
+            return self._decompressor.decompress(chunk)
+        except self._errors:
+            raise DecompressionError("'stream' could not be successfully decompressed")
+
+    def _finish(self) -> bytes:
+        try:
+            remaining = self._decompressor.flush()
+        except self._errors:
+            raise DecompressionError("'stream' could not be successfully decompressed")
+        # A stream that was cut short decompresses without error, but never reaches the end-of-stream marker. Registered
+        # decompressors that do not report it are not checked.
+        if not getattr(self._decompressor, "eof", True):
+            raise DecompressionError("'stream' ended before the end of the compressed data")
+        return remaining
+
+
+_CODECS = {}
+
+
+def register_codec(
+    name: str, compress, decompress, errors=(), get_dictionary_id=None, compressobj=None, decompressobj=None
+) -> Codec:
+    if not isinstance(name, str):
+        raise ValueError('"name" argument expects type "str"')
+    codec = Codec(name, compress, decompress, errors, get_dictionary_id, compressobj, decompressobj)
+    _CODECS[name] = codec
+    return codec
+
+
+def get_codec(name: str) -> Codec:
+    if isinstance(name, str) and name not in _CODECS:
+        _OPTIONAL_CODECS.load(name)
+    try:
+        return _CODECS[name]
+    except (KeyError, TypeError):
+        raise ValueError(
+            f'Compression codec "{name}" is not available. Available codecs: {get_available_codecs()}'
+        )
+
+
+def get_available_codecs() -> list:
+    _OPTIONAL_CODECS.load_all()
+    return sorted(_CODECS)
+
+
+# base85 only uses characters that are valid in a JSON string without escaping, and is 6% denser than base64.
+_INLINE_ENCODINGS = {
+    "base64": (base64.b64encode, base64.b64decode),
+    "base85": (base64.b85encode, base64.b85decode),
+}
+
+
+def _get_inline_encoding(name: str):
     try:
-        return gzip.compress(string_to_compress.encode("utf-8"))
-    except OSError:
+        return _INLINE_ENCODINGS[name]
+    except (KeyError, TypeError):
+        raise ValueError(f'Inline encoding "{name}" is not available. Available encodings: {sorted(_INLINE_ENCODINGS)}')
+
+
+def _gzip_compress(data: bytes, level: int = None) -> bytes:
+    if level is None:
+        return gzip.compress(data)
+    return gzip.compress(data, compresslevel=level)
+
+
+def _gzip_compressobj(level: int = None):
+    # wbits=31 makes zlib write a gzip header and trailer, matching gzip.compress.
+    return zlib.compressobj(9 if level is None else level, zlib.DEFLATED, 31)
+
+
+def _gzip_decompressobj():
+    return zlib.decompressobj(31)
+
+
+def _zlib_compress(data: bytes, level: int = None) -> bytes:
+    return zlib.compress(data, -1 if level is None else level)
+
+
+def _zlib_compressobj(level: int = None):
+    return zlib.compressobj(-1 if level is None else level)
+
+
+@functools.lru_cache(maxsize=16)
+def _get_zstd_dictionary(dictionary: bytes, level: int = None):
+    zstd_dictionary = zstandard.ZstdCompressionDict(dictionary)
+    if level is not None:
+        zstd_dictionary.precompute_compress(level=level)
+    return zstd_dictionary
+
+
+def _get_zstd_compressor(level: int = None, dictionary: bytes = None):
+    level = 3 if level is None else level
+    if dictionary is None:
+        return zstandard.ZstdCompressor(level=level)
+    return zstandard.ZstdCompressor(dict_data=_get_zstd_dictionary(dictionary, level))
+
+
+def _zstd_compress(data: bytes, level: int = None, dictionary: bytes = None) -> bytes:
+    return _get_zstd_compressor(level, dictionary).compress(data)
+
+
+def _zstd_compressobj(level: int = None, dictionary: bytes = None):
+    return _get_zstd_compressor(level, dictionary).compressobj()
+
+
+def _zstd_decompressobj(dictionary: bytes = None):
+    if dictionary is None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zstandard.ZstdDecompressor(dict_data=_get_zstd_dictionary(dictionary)).decompressobj()
+
+
+def _zstd_decompress(data: bytes, dictionary: bytes = None) -> bytes:
+    # Streamed frames do not record their content size, which the one-shot decompress requires.
+    decompressor = _zstd_decompressobj(dictionary)
+    decompressed = decompressor.decompress(data)
+    if not decompressor.eof:
+        raise EOFError("Compressed data ended before the end-of-frame marker was reached")
+    return decompressed
+
+
+def _zstd_dictionary_id(dictionary: bytes) -> int:
+    return _get_zstd_dictionary(dictionary).dict_id()
+
+
+def _lz4_compress(data: bytes, level: int = None) -> bytes:
+    return lz4.frame.compress(data, compression_level=0 if level is None else level)
+
+
+def _lz4_compressobj(level: int = None):
+    compressor = lz4.frame.LZ4FrameCompressor(compression_level=0 if level is None else level)
+    return _StreamCompressor(compressor.compress, compressor.flush, header=compressor.begin())
+
+
+def _lz4_decompressobj():
+    decompressor = lz4.frame.LZ4FrameDecompressor()
+    return _StreamDecompressor(decompressor.decompress, lambda: decompressor.eof)
+
+
+def _brotli_compress(data: bytes, level: int = None) -> bytes:
+    if level is None:
+        return brotli.compress(data)
+    return brotli.compress(data, quality=level)
+
+
+def _brotli_compressobj(level: int = None):
+    compressor = brotli.Compressor() if level is None else brotli.Compressor(quality=level)
+    return _StreamCompressor(compressor.process, compressor.finish)
+
+
+def _brotli_decompressobj():
+    decompressor = brotli.Decompressor()
+    return _StreamDecompressor(decompressor.process, decompressor.is_finished)
+
+
+def _load_zstd():
+    global zstandard
+    import zstandard
+
+    register_codec(
+        "zstd",
+        _zstd_compress,
+        _zstd_decompress,
+        (zstandard.ZstdError,),
+        get_dictionary_id=_zstd_dictionary_id,
+        compressobj=_zstd_compressobj,
+        decompressobj=_zstd_decompressobj,
+    )
+
+
+def _load_lz4():
+    global lz4
+    import lz4.frame
+
+    register_codec(
+        "lz4", _lz4_compress, lz4.frame.decompress, compressobj=_lz4_compressobj, decompressobj=_lz4_decompressobj
+    )
+
+
+def _load_brotli():
+    global brotli
+    import brotli
+
+    register_codec(
+        "brotli",
+        _brotli_compress,
+        brotli.decompress,
+        (brotli.error,),
+        compressobj=_brotli_compressobj,
+        decompressobj=_brotli_decompressobj,
+    )
+
+
+_OPTIONAL_CODECS = OptionalLoaders({"zstd": _load_zstd, "lz4": _load_lz4, "brotli": _load_brotli}, _CODECS)
+
+
+register_codec(
+    "gzip", _gzip_compress, gzip.decompress, compressobj=_gzip_compressobj, decompressobj=_gzip_decompressobj
+)
+register_codec(
+    "zlib", _zlib_compress, zlib.decompress, compressobj=_zlib_compressobj, decompressobj=zlib.decompressobj
+)
+
+
+def get_compression_dictionary_id(dictionary: bytes, codec: str = "zstd") -> int:
+    if not isinstance(dictionary, bytes):
+        raise ValueError('"dictionary" argument expects type "bytes"')
+    compression_codec = get_codec(codec)
+    if not compression_codec.supports_dictionary:
+        raise ValueError(f'Compression codec "{codec}" does not support compression dictionaries')
+    try:
+        return compression_codec.get_dictionary_id(dictionary)
+    except compression_codec.errors:
+        raise ValueError('"dictionary" is not a valid compression dictionary')
+
+
+def train_compression_dictionary(samples, size: int = DEFAULT_COMPRESSION_DICTIONARY_SIZE) -> bytes:
+    _OPTIONAL_CODECS.load("zstd")
+    if not zstandard:
+        raise ValueError('Training a compression dictionary requires the "zstandard" package')
+    samples = [sample.encode("utf-8") if isinstance(sample, str) else sample for sample in samples]
+    try:
+        return zstandard.train_dictionary(size, samples).as_bytes()
+    except zstandard.ZstdError:
+        raise CompressionError("Compression dictionary could not be trained, provide more or larger samples")
+
+
+def _compress(compression_codec: Codec, data: bytes, level: int, dictionary: bytes) -> bytes:
+    if dictionary is None:
+        return compression_codec.compress(data, level)
+    return compression_codec.compress(data, level, dictionary=dictionary)
+
+
+def _decompress(compression_codec: Codec, data: bytes, dictionary: bytes) -> bytes:
+    if dictionary is None:
+        return compression_codec.decompress(data)
+    return compression_codec.decompress(data, dictionary=dictionary)
+
+
+def _encode_string(string, argument_name: str) -> bytes:
+    if isinstance(string, bytes):
+        return string
+    if isinstance(string, str):
+        return string.encode("utf-8")
+    raise ValueError(f'"{argument_name}" argument expects type "str" or "bytes"')
+
+
+def compress_chunks(
+    chunks, codec: str = DEFAULT_COMPRESSION_CODEC, level: int = None, dictionary: bytes = None
+):
+    compression_codec = get_codec(codec)
+    if not compression_codec.supports_streaming:
+        raise ValueError(f'Compression codec "{codec}" does not support streaming compression')
+    try:
+        if dictionary is None:
+            compressor = compression_codec.compressobj(level)
+        else:
+            compressor = compression_codec.compressobj(level, dictionary=dictionary)
+        for chunk in chunks:
+            compressed_chunk = compressor.compress(chunk)
+            if compressed_chunk:
+                yield compressed_chunk
+        yield compressor.flush()
+    except compression_codec.errors:
+        raise CompressionError("'chunks' could not be successfully compressed")
+
+
+def open_decompressing_stream(
+    stream,
+    codec: str = DEFAULT_COMPRESSION_CODEC,
+    dictionary: bytes = None,
+    chunk_size: int = DEFAULT_READ_CHUNKSIZE,
+) -> io.BufferedReader:
+    compression_codec = get_codec(codec)
+    if not compression_codec.supports_streaming_decompression:
+        raise ValueError(f'Compression codec "{codec}" does not support streaming decompression')
+    if dictionary is None:
+        decompressor = compression_codec.decompressobj()
+    else:
+        decompressor = compression_codec.decompressobj(dictionary=dictionary)
+    return io.BufferedReader(_DecompressingReader(stream, decompressor, compression_codec.errors, chunk_size))
+
+
+def compress_string(
+    string_to_compress: str, codec: str = DEFAULT_COMPRESSION_CODEC, level: int = None, dictionary: bytes = None
+) -> bytes:
+    data = _encode_string(string_to_compress, "string_to_compress")
+    compression_codec = get_codec(codec)
+    try:
+        return _compress(compression_codec, data, level, dictionary)
+    except compression_codec.errors:
         raise CompressionError("'string_to_compress' could not be successfully compressed")
 
 
-def decompress_string(string_to_decompress: bytes) -> str:
+def decompress_bytes(
+    bytes_to_decompress: bytes, codec: str = DEFAULT_COMPRESSION_CODEC, dictionary: bytes = None
+) -> bytes:
+    if not isinstance(bytes_to_decompress, bytes):
+        raise ValueError('"bytes_to_decompress" argument expects type "bytes"')
+    compression_codec = get_codec(codec)
+    try:
+        return _decompress(compression_codec, bytes_to_decompress, dictionary)
+    except compression_codec.errors:
+        raise DecompressionError("'bytes_to_decompress' could not be successfully decompressed")
+
+
+def decompress_string(
+    string_to_decompress: bytes, codec: str = DEFAULT_COMPRESSION_CODEC, dictionary: bytes = None
+) -> str:
     if not isinstance(string_to_decompress, bytes):
         raise ValueError('"string_to_decompress" argument expects type "bytes"')
+    compression_codec = get_codec(codec)
     try:
-        return gzip.decompress(string_to_decompress).decode("utf-8")
-    except OSError:
+        return _decompress(compression_codec, string_to_decompress, dictionary).decode("utf-8")
+    except compression_codec.errors:
         raise DecompressionError("'string_to_decompress' could not be successfully decompressed")
 
 
-def compress_and_encode_string(string_to_compress_and_encode: str) -> str:
-    if not isinstance(string_to_compress_and_encode, str):
-        raise ValueError('"string_to_compress_and_encode" argument expects type "str"')
+def compress_and_encode_string(
+    string_to_compress_and_encode: str,
+    codec: str = DEFAULT_COMPRESSION_CODEC,
+    level: int = None,
+    dictionary: bytes = None,
+    encoding: str = DEFAULT_INLINE_ENCODING,
+) -> str:
+    data = _encode_string(string_to_compress_and_encode, "string_to_compress_and_encode")
+    compression_codec = get_codec(codec)
+    encode, _ = _get_inline_encoding(encoding)
     try:
-        return base64.b64encode(gzip.compress(string_to_compress_and_encode.encode("utf-8"))).decode("utf-8")
-    except (OSError, TypeError, binascii.Error):
+        return encode(_compress(compression_codec, data, level, dictionary)).decode("utf-8")
+    except compression_codec.errors:
         raise CompressionError("'string_to_compress_and_encode' could not be successfully compressed and encoded")
 
 
-def decode_and_decompress_string(string_to_decode_and_decompress: str) -> str:
+def encode_bytes(bytes_to_encode: bytes, encoding: str = DEFAULT_INLINE_ENCODING) -> str:
+    if not isinstance(bytes_to_encode, bytes):
+        raise ValueError('"bytes_to_encode" argument expects type "bytes"')
+    encode, _ = _get_inline_encoding(encoding)
+    return encode(bytes_to_encode).decode("utf-8")
+
+
+def decode_string(string_to_decode: str, encoding: str = DEFAULT_INLINE_ENCODING) -> bytes:
+    if not isinstance(string_to_decode, str):
+        raise ValueError('"string_to_decode" argument expects type "str"')
+    _, decode = _get_inline_encoding(encoding)
+    try:
+        return decode(string_to_decode.encode("utf-8"))
+    except ValueError:
+        raise DecompressionError("'string_to_decode' could not be successfully decoded")
+
+
+def decode_and_decompress_string(
+    string_to_decode_and_decompress: str,
+    codec: str = DEFAULT_COMPRESSION_CODEC,
+    dictionary: bytes = None,
+    encoding: str = DEFAULT_INLINE_ENCODING,
+) -> str:
     if not isinstance(string_to_decode_and_decompress, str):
         raise ValueError('"string_to_decode_and_decompress" argument expects type "str"')
+    compression_codec = get_codec(codec)
+    _, decode = _get_inline_encoding(encoding)
     try:
-        return gzip.decompress(base64.b64decode(string_to_decode_and_decompress.encode("utf-8"))).decode("utf-8")
-    except (OSError, TypeError, binascii.Error):
+        return _decompress(
+            compression_codec, decode(string_to_decode_and_decompress.encode("utf-8")), dictionary
+        ).decode("utf-8")
+    except compression_codec.errors:
         raise DecompressionError("'string_to_decode_and_decompress' could not be successfully decoded and decompressed")
 
 
 def get_size_of_string_in_bytes(string: str) -> int:
     if isinstance(string, str):
+        if string.isascii():
+            return len(string)
         return len(string.encode("utf-8"))
     raise ValueError('"string" argument expects type "str"')
 
@@ -0,0 +1,109 @@
+import io
+import struct
+
+from boto3_large_message_utils.exceptions import DecompressionError
+from boto3_large_message_utils.utils.compression import compress_string, decompress_bytes
+from boto3_large_message_utils.utils.stream import iter_parts
+
+# A framed object is its frames followed by an index of their stored lengths, so the index of an object of known frame
+# count is read with a single suffix range request.
+_FRAME_LENGTH = struct.Struct(">I")
+MAX_FRAME_SIZE = 2 ** 31
+
+
+def get_frame_count(message_size: int, frame_size: int) -> int:
+    return -(-message_size // frame_size)
+
+
+def get_frame_index_size(frames: int) -> int:
+    return frames * _FRAME_LENGTH.size
+
+
+def encode_frames(chunks, frame_size: int, codec: str = None, level: int = None, dictionary: bytes = None):
+    frames = iter_parts(chunks, frame_size)
+    if codec is not None:
+        frames = (compress_string(frame, codec=codec, level=level, dictionary=dictionary) for frame in frames)
+    return pack_frames(frames)
+
+
+def pack_frames(frames):
+    frame_lengths = []
+    for frame in frames:
+        frame_lengths.append(len(frame))
+        yield frame
+    yield b"".join(_FRAME_LENGTH.pack(frame_length) for frame_length in frame_lengths)
+
+
+def read_frame_index(index: bytes) -> list:
+    if len(index) % _FRAME_LENGTH.size:
+        raise DecompressionError("Frame index is truncated")
+    offsets = [0]
+    for (frame_length,) in _FRAME_LENGTH.iter_unpack(index):
+        offsets.append(offsets[-1] + frame_length)
+    return offsets
+
+
+def split_frame_index(body: bytes, frames: int) -> (bytes, list):
+    index_size = get_frame_index_size(frames)
+    if len(body) < index_size:
+        raise DecompressionError("Frame index is truncated")
+    return body[:len(body) - index_size], read_frame_index(body[len(body) - index_size:])
+
+
+def decode_frames(body: bytes, offsets: list, codec: str = None, dictionary: bytes = None) -> bytes:
+    # The body starts at the first offset, so a range of frames is decoded like a whole object.
+    base = offsets[0]
+    return b"".join(
+        _decode_frame(body[start - base:end - base], codec, dictionary) for start, end in zip(offsets, offsets[1:])
+    )
+
+
+def _decode_frame(frame: bytes, codec: str = None, dictionary: bytes = None) -> bytes:
+    if codec is None:
+        return frame
+    return decompress_bytes(frame, codec, dictionary)
+
+
+def get_frame_span(frame_size: int, frames: int, start: int, end: int = None) -> (int, int):
+    first_frame = min(start // frame_size, frames)
+    stop_frame = frames if end is None else min(get_frame_count(end, frame_size), frames)
+    return first_frame, max(stop_frame, first_frame)
+
+
+class FramedReader(io.RawIOBase):
+    def __init__(self, stream, offsets: list, codec: str = None, dictionary: bytes = None):
+        self._stream = stream
+        self._frame_lengths = [end - start for start, end in zip(offsets, offsets[1:])]
+        self._codec = codec
+        self._dictionary = dictionary
+        self._next_frame = 0
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        # Frames are decoded one after another as the body is read, so closing the stream early skips the rest of it.
+        while not self._buffer and self._next_frame < len(self._frame_lengths):
+            frame = _read_frame(self._stream, self._frame_lengths[self._next_frame])
+            self._buffer = _decode_frame(frame, self._codec, self._dictionary)
+            self._next_frame += 1
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+
+def _read_frame(stream, frame_length: int) -> bytes:
+    frame = bytearray()
+    while len(frame) < frame_length:
+        chunk = stream.read(frame_length - len(frame))
+        if not chunk:
+            raise DecompressionError("Frame is truncated")
+        frame += chunk
+    return bytes(frame)
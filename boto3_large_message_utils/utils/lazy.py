@@ -0,0 +1,23 @@
+import threading
+
+
+class OptionalLoaders:
+    def __init__(self, loaders: dict, registry: dict):
+        self.loaders = loaders
+        self.registry = registry
+        self._lock = threading.Lock()
+
+    def load(self, name: str) -> bool:
+        with self._lock:
+            # Each package is only tried once, and an entry registered under the same name beforehand is kept.
+            load = self.loaders.pop(name, None)
+            if load is not None and name not in self.registry:
+                try:
+                    load()
+                except ImportError:
+                    pass
+            return name in self.registry
+
+    def load_all(self):
+        for name in list(self.loaders):
+            self.load(name)
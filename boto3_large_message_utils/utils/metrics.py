@@ -0,0 +1,112 @@
+import bisect
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from boto3_large_message_utils.constants import DEFAULT_TIMING_BUCKETS
+
+PASSTHROUGH = "passthrough"
+INLINE_COMPRESSED = "inline-compressed"
+S3_OFFLOADED = "s3-offloaded"
+S3_RETRIEVED = "s3-retrieved"
+CACHE_RETRIEVED = "cache-retrieved"
+
+
+class MessageMetrics:
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.path = PASSTHROUGH
+        self.message_size = None
+        self.compressed_size = None
+        self.durations = {}
+        self.duration = None
+        self.error = None
+        self.start_time = time.time_ns()
+        self._start = time.perf_counter()
+
+    @property
+    def compression_ratio(self) -> float:
+        if not self.message_size or self.compressed_size is None:
+            return None
+        return self.compressed_size / self.message_size
+
+    @contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0) + time.perf_counter() - start
+
+    def finish(self, error: Exception = None):
+        self.duration = time.perf_counter() - self._start
+        self.error = error
+
+    def to_dict(self) -> dict:
+        values = {
+            "operation": self.operation,
+            "path": self.path,
+            "message_size": self.message_size,
+            "compressed_size": self.compressed_size,
+            "compression_ratio": self.compression_ratio,
+            "duration": self.duration,
+        }
+        values.update({f"{name}_duration": duration for name, duration in self.durations.items()})
+        return {name: value for name, value in values.items() if value is not None}
+
+
+class MetricsCallback:
+    def message_finished(self, metrics: MessageMetrics):
+        pass
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class TimingHistogram(MetricsCallback):
+    def __init__(self, buckets=DEFAULT_TIMING_BUCKETS):
+        self.buckets = buckets
+        self.paths = Counter()
+        self.errors = Counter()
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def message_finished(self, metrics: MessageMetrics):
+        with self._lock:
+            self.paths[(metrics.operation, metrics.path)] += 1
+            if metrics.error is not None:
+                self.errors[metrics.operation] += 1
+            self._observe(metrics.operation, "total", metrics.duration)
+            for name, duration in metrics.durations.items():
+                self._observe(metrics.operation, name, duration)
+
+    def _observe(self, operation: str, name: str, duration: float):
+        if (operation, name) not in self.histograms:
+            self.histograms[(operation, name)] = Histogram(self.buckets)
+        self.histograms[(operation, name)].observe(duration)
+
+
+class SpanAdapter(MetricsCallback):
+    def __init__(self, tracer, prefix: str = "large_message"):
+        self.tracer = tracer
+        self.prefix = prefix
+
+    def message_finished(self, metrics: MessageMetrics):
+        # The span is created once the message is finished, from its recorded start time and duration.
+        span = self.tracer.start_span(f"{self.prefix}.{metrics.operation}", start_time=metrics.start_time)
+        for name, value in metrics.to_dict().items():
+            span.set_attribute(f"{self.prefix}.{name}", value)
+        if metrics.error is not None:
+            span.record_exception(metrics.error)
+        span.end(end_time=metrics.start_time + int(metrics.duration * 1e9))
@@ -0,0 +1,69 @@
+from collections import namedtuple
+
+from boto3_large_message_utils.constants import DEFAULT_COMPRESSION_BYTE_COST, DEFAULT_S3_REQUEST_COST
+
+DeliveryPlan = namedtuple("DeliveryPlan", ["compress", "offload_attributes", "offload_body"])
+
+_INLINE_PLANS = (
+    DeliveryPlan(False, False, False),
+    DeliveryPlan(True, False, False),
+    DeliveryPlan(False, True, False),
+    DeliveryPlan(True, True, False),
+)
+
+
+class CostModel:
+    def __init__(
+        self,
+        request_cost: float = DEFAULT_S3_REQUEST_COST,
+        byte_cost: float = 1,
+        compression_byte_cost: float = DEFAULT_COMPRESSION_BYTE_COST,
+    ):
+        for name, value in (
+            ("request_cost", request_cost),
+            ("byte_cost", byte_cost),
+            ("compression_byte_cost", compression_byte_cost),
+        ):
+            if not isinstance(value, (int, float)) or value < 0:
+                raise ValueError(f'"{name}" argument expects a non-negative number')
+
+        self.request_cost = request_cost
+        self.byte_cost = byte_cost
+        self.compression_byte_cost = compression_byte_cost
+
+    def estimate(
+        self,
+        plan: DeliveryPlan,
+        message_size: int,
+        attributes_object_size: int = 0,
+        compression_ratio: float = None,
+    ) -> float:
+        cost = 0
+        if plan.compress:
+            cost += message_size * self.compression_byte_cost
+        if plan.offload_attributes:
+            cost += self.request_cost + attributes_object_size * self.byte_cost
+        if plan.offload_body:
+            uploaded_size = message_size * (compression_ratio or 1) if plan.compress else message_size
+            cost += self.request_cost + uploaded_size * self.byte_cost
+        return cost
+
+
+def get_delivery_plans(
+    cost_model: CostModel,
+    message_size: int,
+    attributes_object_size: int = None,
+    compress: bool = False,
+    compression_ratio: float = None,
+    attributes_fit: bool = True,
+) -> list:
+    costs = {
+        plan: cost_model.estimate(plan, message_size, attributes_object_size or 0)
+        for plan in _INLINE_PLANS
+        if (compress or not plan.compress) and (attributes_object_size is not None or not plan.offload_attributes)
+    }
+    # Attributes too large to be sent at all are offloaded along with the body.
+    body_plan = DeliveryPlan(compress, not attributes_fit and attributes_object_size is not None, True)
+    body_cost = cost_model.estimate(body_plan, message_size, attributes_object_size or 0, compression_ratio)
+    # Storing the body in S3 always fits, so it ends the list and any plan costing more is never tried.
+    return sorted((plan for plan in costs if costs[plan] <= body_cost), key=costs.get) + [body_plan]
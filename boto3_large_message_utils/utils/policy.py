@@ -0,0 +1,92 @@
+import random
+import threading
+from collections import namedtuple
+
+from boto3_large_message_utils.constants import (
+    COMPRESSION_RATIO_SMOOTHING,
+    DEFAULT_COMPRESSION_SAMPLE_COUNT,
+    DEFAULT_COMPRESSION_SAMPLE_SIZE,
+    DEFAULT_FAST_COMPRESSION_LEVEL,
+    DEFAULT_FAST_COMPRESSION_RATIO,
+    DEFAULT_MAX_COMPRESSION_RATIO,
+)
+from boto3_large_message_utils.utils.compression import compress_string, get_codec
+
+CompressionDecision = namedtuple("CompressionDecision", ["compress", "codec", "level", "ratio"])
+CompressionDecision.__new__.__defaults__ = (None,)
+
+
+class CompressionPolicy:
+    def decide(self, message: bytes, codec: str, level: int = None) -> CompressionDecision:
+        return CompressionDecision(True, codec, level)
+
+    def observe(self, decision: CompressionDecision, message_size: int, compressed_size: int):
+        pass
+
+
+class AdaptiveCompressionPolicy(CompressionPolicy):
+    def __init__(
+        self,
+        sample_size: int = DEFAULT_COMPRESSION_SAMPLE_SIZE,
+        sample_count: int = DEFAULT_COMPRESSION_SAMPLE_COUNT,
+        max_ratio: float = DEFAULT_MAX_COMPRESSION_RATIO,
+        fast_ratio: float = DEFAULT_FAST_COMPRESSION_RATIO,
+        fast_level: int = DEFAULT_FAST_COMPRESSION_LEVEL,
+        fast_codec: str = None,
+        deterministic: bool = False,
+        seed: int = None,
+    ):
+        if not isinstance(sample_size, int) or sample_size < 0:
+            raise ValueError('"sample_size" argument expects a non-negative "int"')
+        if not isinstance(sample_count, int) or sample_count < 1:
+            raise ValueError('"sample_count" argument expects a positive "int"')
+
+        self.sample_size = sample_size
+        self.sample_count = sample_count
+        self.max_ratio = max_ratio
+        self.fast_ratio = fast_ratio
+        self.fast_level = fast_level
+        self.fast_codec = get_codec(fast_codec).name if fast_codec else None
+        self.deterministic = deterministic
+        self.compression_ratios = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def decide(self, message: bytes, codec: str, level: int = None) -> CompressionDecision:
+        ratio = self.estimate_compression_ratio(message, codec, level)
+        if ratio is None:
+            return CompressionDecision(True, codec, level)
+        if ratio > self.max_ratio:
+            return CompressionDecision(False, codec, level, ratio)
+        if ratio < self.fast_ratio:
+            return CompressionDecision(True, self.fast_codec or codec, self.fast_level, ratio)
+        return CompressionDecision(True, codec, level, ratio)
+
+    def observe(self, decision: CompressionDecision, message_size: int, compressed_size: int):
+        compression_ratio = compressed_size / max(message_size, 1)
+        with self._lock:
+            previous_ratio = self.compression_ratios.get(decision.codec)
+            if previous_ratio is not None:
+                compression_ratio = previous_ratio + COMPRESSION_RATIO_SMOOTHING * (compression_ratio - previous_ratio)
+            self.compression_ratios[decision.codec] = compression_ratio
+
+    def estimate_compression_ratio(self, message: bytes, codec: str, level: int = None) -> float:
+        if self.sample_size and len(message) > self.sample_size:
+            sample = self._get_sample(message)
+            return len(compress_string(sample, codec=codec, level=level)) / len(sample)
+        # Messages too small to sample fall back to the ratio observed for previous messages, which the deterministic
+        # mode ignores so a decision only ever depends on the message itself.
+        if self.deterministic:
+            return None
+        with self._lock:
+            return self.compression_ratios.get(codec)
+
+    def _get_sample(self, message: bytes) -> bytes:
+        slice_size = max(self.sample_size // self.sample_count, 1)
+        last_offset = len(message) - slice_size
+        if self.deterministic:
+            offsets = [last_offset * index // max(self.sample_count - 1, 1) for index in range(self.sample_count)]
+        else:
+            with self._lock:
+                offsets = sorted(self._random.randint(0, last_offset) for _ in range(self.sample_count))
+        return b"".join(message[offset:offset + slice_size] for offset in offsets)
@@ -0,0 +1,40 @@
+from collections import deque
+
+END = object()
+
+
+def prefetch(function, items, executor, depth: int, memory_budget: int = None, get_size=None):
+    items = iter(items)
+    pending = deque()
+    pending_size = 0
+    try:
+        item = next(items, END)
+        item_size = get_item_size(item, get_size)
+        while pending or item is not END:
+            while item is not END and has_prefetch_capacity(pending, pending_size + item_size, depth, memory_budget):
+                pending.append((item_size, executor.submit(function, item)))
+                pending_size += item_size
+                item = next(items, END)
+                item_size = get_item_size(item, get_size)
+            size, future = pending.popleft()
+            pending_size -= size
+            yield future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def has_prefetch_capacity(pending, pending_size: int, depth: int, memory_budget: int = None) -> bool:
+    # The next result is always requested, so an item larger than the whole budget is still processed.
+    if not pending:
+        return True
+    # One result is handed back while "depth" more are retrieved in the background.
+    if len(pending) > depth:
+        return False
+    return memory_budget is None or pending_size <= memory_budget
+
+
+def get_item_size(item, get_size=None) -> int:
+    if item is END or get_size is None:
+        return 0
+    return get_size(item)
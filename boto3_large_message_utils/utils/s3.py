@@ -1,4 +1,10 @@
+import hashlib
+import threading
 import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3_large_message_utils.utils.stream import iter_parts, prepend_chunk, read_head
 
 
 def generate_s3_object_key(prefix: str = None) -> str:
@@ -8,3 +14,103 @@ def generate_s3_object_key(prefix: str = None) -> str:
     if prefix and len(prefix) > 0:
         key = prefix.strip("/") + "/" + key
     return key
+
+
+def generate_content_s3_object_key(content: bytes, prefix: str = None, namespace: str = "") -> str:
+    if not isinstance(content, bytes):
+        raise ValueError('"content" argument expects type "bytes"')
+    digest = hashlib.sha256(namespace.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(content)
+    key = digest.hexdigest()
+    if prefix and len(prefix) > 0:
+        key = prefix.strip("/") + "/" + key
+    return key
+
+
+def is_missing_object_error(error: Exception) -> bool:
+    return _get_error_code(error) in ("404", "NoSuchKey", "NotFound")
+
+
+def is_invalid_range_error(error: Exception) -> bool:
+    return _get_error_code(error) in ("416", "InvalidRange")
+
+
+def _get_error_code(error: Exception) -> str:
+    # Checked through the botocore ClientError response rather than its type, to avoid importing botocore.
+    response = getattr(error, "response", None)
+    if not isinstance(response, dict):
+        return None
+    return response.get("Error", {}).get("Code")
+
+
+def s3_object_exists(s3, bucket: str, key: str) -> bool:
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+    except Exception as e:
+        if is_missing_object_error(e):
+            return False
+        raise
+    return True
+
+
+class S3ObjectKeyCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str):
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+
+def upload_chunks_to_s3(s3, bucket: str, key: str, chunks, multipart_threshold: int, part_size: int, max_workers: int):
+    head, chunks = read_head(chunks, multipart_threshold)
+    if chunks is None:
+        s3.put_object(Bucket=bucket, Body=head, Key=key)
+        return
+
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+    try:
+        parts = _upload_parts(
+            s3, bucket, key, upload_id, iter_parts(prepend_chunk(head, chunks), part_size), max_workers
+        )
+        s3.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+
+def _upload_parts(s3, bucket: str, key: str, upload_id: str, parts, max_workers: int) -> list:
+    def upload_part(part_number, body):
+        response = s3.upload_part(
+            Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body
+        )
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    uploaded_parts = []
+    pending_parts = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for part_number, body in enumerate(parts, 1):
+            # Wait for the oldest part before reading another, so at most max_workers parts are held in memory.
+            if len(pending_parts) >= max_workers:
+                uploaded_parts.append(pending_parts.popleft().result())
+            pending_parts.append(executor.submit(upload_part, part_number, body))
+        uploaded_parts.extend(pending_part.result() for pending_part in pending_parts)
+    return uploaded_parts
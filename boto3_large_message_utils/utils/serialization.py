@@ -0,0 +1,68 @@
+import json
+
+from boto3_large_message_utils.constants import AUTO_JSON_BACKENDS, DEFAULT_JSON_BACKEND
+from boto3_large_message_utils.utils.lazy import OptionalLoaders
+
+# The optional backend packages are imported when their backend is first requested.
+orjson = None
+
+
+class JsonBackend:
+    def __init__(self, name, dumps, loads):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+
+_JSON_BACKENDS = {}
+
+
+def register_json_backend(name: str, dumps, loads) -> JsonBackend:
+    if not isinstance(name, str):
+        raise ValueError('"name" argument expects type "str"')
+    json_backend = JsonBackend(name, dumps, loads)
+    _JSON_BACKENDS[name] = json_backend
+    return json_backend
+
+
+def get_json_backend(name: str = None) -> JsonBackend:
+    name = name or DEFAULT_JSON_BACKEND
+    if name == "auto":
+        name = next(backend for backend in AUTO_JSON_BACKENDS if _OPTIONAL_JSON_BACKENDS.load(backend))
+    elif isinstance(name, str):
+        _OPTIONAL_JSON_BACKENDS.load(name)
+    try:
+        return _JSON_BACKENDS[name]
+    except (KeyError, TypeError):
+        raise ValueError(
+            f'JSON backend "{name}" is not available. Available backends: {get_available_json_backends()}'
+        )
+
+
+def get_available_json_backends() -> list:
+    _OPTIONAL_JSON_BACKENDS.load_all()
+    return sorted(_JSON_BACKENDS)
+
+
+def _orjson_dumps(obj) -> str:
+    return orjson.dumps(obj).decode("utf-8")
+
+
+def _load_orjson():
+    global orjson
+    import orjson
+
+    register_json_backend("orjson", _orjson_dumps, orjson.loads)
+
+
+def _load_ujson():
+    import ujson
+
+    register_json_backend("ujson", ujson.dumps, ujson.loads)
+
+
+_OPTIONAL_JSON_BACKENDS = OptionalLoaders({"orjson": _load_orjson, "ujson": _load_ujson}, _JSON_BACKENDS)
+
+
+# Every backend loads str and bytes, so a payload downloaded from S3 can be parsed without decoding it first.
+register_json_backend("json", json.dumps, json.loads)
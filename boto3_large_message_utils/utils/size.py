@@ -1,51 +1,88 @@
-from boto3_large_message_utils.constants import RESERVED_ATTRIBUTE_NAME, MAX_ALLOWED_ATTRIBUTES
-from boto3_large_message_utils.utils.compression import is_base64
+from boto3_large_message_utils.constants import (
+    DEFAULT_ATTRIBUTE_SCHEMA_SIZE,
+    MAX_ALLOWED_ATTRIBUTES,
+    RESERVED_ATTRIBUTE_NAME,
+)
 
 
 def get_size_of_string_in_bytes(string: str) -> int:
     if isinstance(string, str):
+        if string.isascii():
+            return len(string)
         return len(string.encode("utf-8"))
     raise ValueError('"string" argument expects type "str"')
 
 
-def get_message_attributes_size_in_bytes(message_attributes, message_size_threshold):
-    if not isinstance(message_attributes, dict):
-        raise ValueError('"message_attributes" argument expects type "dict"')
+class AttributeSchema:
+    def __init__(self, max_cached_names: int = DEFAULT_ATTRIBUTE_SCHEMA_SIZE):
+        self.max_cached_names = max_cached_names
+        self._name_sizes = {}
 
-    message_attributes_size = 0
+    def get_size(self, message_attributes: dict, message_size_threshold: int) -> int:
+        if not isinstance(message_attributes, dict):
+            raise ValueError('"message_attributes" argument expects type "dict"')
 
-    for attribute_key, attribute_value in message_attributes.items():
-        message_attributes_size += get_attribute_size(attribute_key, attribute_value)
+        message_attributes_size = 0
+        for attribute_key, attribute_value in message_attributes.items():
+            message_attributes_size += self.get_attribute_size(attribute_key, attribute_value)
 
-    if message_attributes_size > message_size_threshold:
-        raise ValueError(
-            f"Total size of Message Attributes is {message_attributes_size} bytes which is larger than the "
-            f"threshold of {message_size_threshold} bytes. Consider including the payload in the Message "
-            f"Body instead of Message Attributes. "
+        if message_attributes_size > message_size_threshold:
+            raise ValueError(
+                f"Total size of Message Attributes is {message_attributes_size} bytes which is larger than the "
+                f"threshold of {message_size_threshold} bytes. Consider including the payload in the Message "
+                f"Body instead of Message Attributes. "
+            )
+        return message_attributes_size
+
+    def get_attribute_size(self, attribute_key: str, attribute_value: dict) -> int:
+        data_type = attribute_value.get("DataType")
+        # The same names and data types are sent with every message, so their sizes are only measured once.
+        name_size = self._name_sizes.get((attribute_key, data_type))
+        if name_size is None:
+            name_size = get_size_of_string_in_bytes(attribute_key)
+            if data_type:
+                name_size += get_size_of_string_in_bytes(data_type)
+            if len(self._name_sizes) >= self.max_cached_names:
+                self._name_sizes.clear()
+            self._name_sizes[(attribute_key, data_type)] = name_size
+        return (
+            name_size
+            + _get_value_size(attribute_value.get("StringValue"))
+            + _get_value_size(attribute_value.get("BinaryValue"))
         )
 
-    return message_attributes_size
+
+def _get_value_size(value) -> int:
+    if not value:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    # A base64 encoded binary value is ASCII, so its size is its length like any other string.
+    return get_size_of_string_in_bytes(value)
+
+
+_DEFAULT_ATTRIBUTE_SCHEMA = AttributeSchema()
+
+
+def get_message_attributes_size_in_bytes(message_attributes, message_size_threshold):
+    return _DEFAULT_ATTRIBUTE_SCHEMA.get_size(message_attributes, message_size_threshold)
 
 
 def get_attribute_size(attribute_key, attribute_value):
-    attribute_size = get_size_of_string_in_bytes(attribute_key)
-    if attribute_value.get("DataType"):
-        attribute_size += get_size_of_string_in_bytes(attribute_value.get("DataType"))
-    if attribute_value.get("StringValue"):
-        attribute_size += get_size_of_string_in_bytes(attribute_value.get("StringValue"))
-    if attribute_value.get("BinaryValue"):
-        if is_base64(attribute_value.get("BinaryValue")):
-            attribute_size += len(str.encode(attribute_value.get("BinaryValue")))
-        else:
-            binary_value = attribute_value.get("BinaryValue")
-            if isinstance(binary_value, bytes):
-                attribute_size += len(binary_value)
-            else:
-                attribute_size += get_size_of_string_in_bytes(binary_value)
-    return attribute_size
+    return _DEFAULT_ATTRIBUTE_SCHEMA.get_attribute_size(attribute_key, attribute_value)
 
 
 def append_message_size_attribute(message_attributes, message_size):
+    validate_message_size_attribute(message_attributes)
+    message_attributes[RESERVED_ATTRIBUTE_NAME] = {
+        "StringValue": str(message_size),
+        "DataType": "Number",
+    }
+
+    return message_attributes
+
+
+def validate_message_size_attribute(message_attributes):
     message_attributes_number = len(message_attributes)
     if message_attributes_number > MAX_ALLOWED_ATTRIBUTES:
         raise ValueError(
@@ -56,10 +93,3 @@ def append_message_size_attribute(message_attributes, message_size):
     if message_attributes.get(RESERVED_ATTRIBUTE_NAME):
         raise ValueError(f"Message Attribute name {RESERVED_ATTRIBUTE_NAME} is reserved for use by "
                          f"MessageDispatchHelper.")
-
-    message_attributes[RESERVED_ATTRIBUTE_NAME] = {
-        "StringValue": str(message_size),
-        "DataType": "Number",
-    }
-
-    return message_attributes
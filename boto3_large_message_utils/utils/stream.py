@@ -0,0 +1,137 @@
+import codecs
+import io
+
+from boto3_large_message_utils.constants import DEFAULT_READ_CHUNKSIZE
+
+
+def _encode_chunk(chunk) -> bytes:
+    if isinstance(chunk, (bytes, bytearray)):
+        return bytes(chunk)
+    if isinstance(chunk, str):
+        return chunk.encode("utf-8")
+    raise ValueError('"chunk" argument expects type "str" or "bytes"')
+
+
+def _split_chunk(chunk: bytes, chunk_size: int):
+    for offset in range(0, len(chunk), chunk_size):
+        yield chunk[offset:offset + chunk_size]
+
+
+def iter_chunks(source, chunk_size: int):
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError('"chunk_size" argument expects a positive "int"')
+    if isinstance(source, (str, bytes, bytearray)):
+        yield from _split_chunk(_encode_chunk(source), chunk_size)
+    elif hasattr(source, "read"):
+        chunk = source.read(chunk_size)
+        while chunk:
+            yield _encode_chunk(chunk)
+            chunk = source.read(chunk_size)
+    else:
+        for chunk in source:
+            yield _encode_chunk(chunk)
+
+
+def iter_parts(chunks, part_size: int):
+    part = bytearray()
+    for chunk in chunks:
+        part += chunk
+        while len(part) >= part_size:
+            yield bytes(part[:part_size])
+            del part[:part_size]
+    if part:
+        yield bytes(part)
+
+
+def read_head(chunks, size: int):
+    chunks = iter(chunks)
+    head = bytearray()
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= size:
+            return bytes(head), chunks
+    return bytes(head), None
+
+
+def prepend_chunk(head: bytes, chunks):
+    yield head
+    yield from chunks
+
+
+class CountingIterator:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.size = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.size += len(chunk)
+            yield chunk
+
+
+class TextCheckingIterator:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.is_text = True
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self._check(chunk)
+            yield chunk
+        self._check(b"", final=True)
+
+    def _check(self, chunk: bytes, final: bool = False):
+        if not self.is_text:
+            return
+        try:
+            self._decoder.decode(chunk, final)
+        except UnicodeDecodeError:
+            self.is_text = False
+
+
+def decode_text(message: bytes):
+    # A stream is only returned as a string when it is UTF-8, so binary streams are sent in a binary envelope.
+    try:
+        return message.decode("utf-8")
+    except UnicodeDecodeError:
+        return message
+
+
+class StreamReader(io.RawIOBase):
+    def __init__(self, stream, chunk_size: int = DEFAULT_READ_CHUNKSIZE):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = b""
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer and not self._eof:
+            chunk = self._stream.read(self._chunk_size)
+            if chunk:
+                self._buffer = self._transform(chunk)
+            else:
+                self._buffer = self._finish()
+                self._eof = True
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def _transform(self, chunk: bytes) -> bytes:
+        return chunk
+
+    def _finish(self) -> bytes:
+        return b""
+
+    def close(self):
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+
+def open_stream(stream, chunk_size: int = DEFAULT_READ_CHUNKSIZE) -> io.BufferedReader:
+    return io.BufferedReader(StreamReader(stream, chunk_size))
@@ -33,4 +33,11 @@ setup(
     long_description_content_type="text/markdown",
     include_package_data=True,
     install_requires=["boto3>=1.11.13"],
+    extras_require={
+        "zstd": ["zstandard"],
+        "lz4": ["lz4"],
+        "brotli": ["brotli"],
+        "orjson": ["orjson"],
+        "ujson": ["ujson"],
+    },
 )
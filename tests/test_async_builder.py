@@ -0,0 +1,271 @@
+import asyncio
+import gzip
+import io
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from boto3_large_message_utils.async_builder import AsyncLargeMessageBuilder
+from boto3_large_message_utils.utils.frames import decode_frames, split_frame_index
+from boto3_large_message_utils.utils.metrics import TimingHistogram
+from boto3_large_message_utils.utils.planner import CostModel
+
+
+class InMemoryAsyncS3:
+    def __init__(self):
+        self.objects = {}
+
+    async def put_object(self, Bucket, Key, Body):
+        await asyncio.sleep(0)
+        self.objects[(Bucket, Key)] = Body
+        return {}
+
+    async def create_multipart_upload(self, Bucket, Key):
+        self.parts = {}
+        self.aborted = False
+        return {"UploadId": "test-upload-id"}
+
+    async def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        await asyncio.sleep(0)
+        self.parts[PartNumber] = Body
+        return {"ETag": f'"{PartNumber}"'}
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        part_numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        self.objects[(Bucket, Key)] = b"".join(self.parts[part_number] for part_number in part_numbers)
+        return {}
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted = True
+        return {}
+
+
+@patch(
+    "boto3_large_message_utils.builder.generate_s3_object_key",
+    return_value="abcde-fghi-jklm-nopqrstuvwxyz",
+)
+class TestAsyncBuild(TestCase):
+    def setUp(self):
+        self.s3 = InMemoryAsyncS3()
+        self.base = AsyncLargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket", s3_client=self.s3
+        )
+
+    def test_original_message_is_returned_when_it_is_small_enough(self, mock_uuid):
+        actual = asyncio.run(self.base.build('{"hello": "world"}'))
+
+        self.assertEqual('{"hello": "world"}', actual)
+        self.assertEqual({}, self.s3.objects)
+
+    def test_compressed_message_is_returned_when_compress_is_true(self, mock_uuid):
+        self.base.message_size_threshold = 100
+        self.base.compress = True
+
+        actual = asyncio.run(self.base.build("a" * 200))
+
+        self.assertTrue(actual.startswith('{"compressedMessage": '))
+        self.assertEqual({}, self.s3.objects)
+
+    def test_message_is_stored_in_s3(self, mock_uuid):
+        self.base.message_size_threshold = 40
+        self.base.compress = True
+
+        actual = asyncio.run(
+            self.base.build("This is a really long string. 56 characters to be exact.")
+        )
+
+        self.assertEqual(
+            '{"bucket": "test-s3-bucket", "key": "abcde-fghi-jklm-nopqrstuvwxyz", "compressed": true}',
+            actual,
+        )
+        self.assertEqual(
+            b"This is a really long string. 56 characters to be exact.",
+            gzip.decompress(self.s3.objects[("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")]),
+        )
+
+    def test_message_with_message_attributes_is_stored_in_s3(self, mock_uuid):
+        self.base.message_size_threshold = 70
+        test_message_attributes = {"attr": {"StringValue": "value", "DataType": "String"}}
+
+        actual = asyncio.run(
+            self.base.build(
+                "This is a really long string. 56 characters to be exact.", test_message_attributes
+            )
+        )
+
+        self.assertEqual(
+            (
+                '{"bucket": "test-s3-bucket", "key": "abcde-fghi-jklm-nopqrstuvwxyz", "compressed": false}',
+                {
+                    "attr": {"StringValue": "value", "DataType": "String"},
+                    "ORIGINAL_MESSAGE_SIZE": {"StringValue": "56", "DataType": "Number"},
+                },
+            ),
+            actual,
+        )
+
+    def test_build_batch(self, mock_uuid):
+        self.base.message_size_threshold = 40
+
+        actual = asyncio.run(
+            self.base.build_batch(
+                ["small message", "This is a really long string. 56 characters to be exact."]
+            )
+        )
+
+        self.assertEqual({"Id": "0", "MessageBody": "small message"}, actual[0])
+        self.assertEqual(
+            b"This is a really long string. 56 characters to be exact.",
+            self.s3.objects[("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")],
+        )
+
+    def test_build_fanout(self, mock_uuid):
+        self.base.message_size_threshold = 40
+        test_message = "This is a really long string. 56 characters to be exact."
+
+        actual = asyncio.run(self.base.build_fanout(test_message, [None, None]))
+
+        self.assertEqual(actual[0], actual[1])
+        mock_uuid.assert_called_once()
+        self.assertEqual(
+            test_message.encode(), self.s3.objects[("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")]
+        )
+
+    def test_deduplicated_message_is_uploaded_once(self, mock_uuid):
+        self.base.message_size_threshold = 40
+        self.base.deduplicate = True
+        test_message = "This is a really long string. 56 characters to be exact."
+
+        first = asyncio.run(self.base.build(test_message))
+        self.s3.objects.clear()
+        second = asyncio.run(self.base.build(test_message))
+
+        self.assertEqual(first, second)
+        self.assertEqual({}, self.s3.objects)
+
+    def test_metrics_are_reported(self, mock_uuid):
+        self.base.message_size_threshold = 40
+        self.base.metrics = TimingHistogram()
+
+        asyncio.run(self.base.build_batch(["small message", "This is a really long string. 56 characters to be exact."]))
+
+        self.assertEqual(
+            {("build", "passthrough"): 1, ("build", "s3-offloaded"): 1}, dict(self.base.metrics.paths)
+        )
+
+    def test_large_attributes_are_offloaded(self, mock_uuid):
+        self.base.attributes_size_threshold = 150
+        message_attributes = {
+            "tenant": {"StringValue": "test", "DataType": "String"},
+            "trace": {"StringValue": "a" * 200, "DataType": "String"},
+        }
+
+        message, actual = asyncio.run(self.base.build("small message", message_attributes))
+        batch = asyncio.run(self.base.build_batch([("small message", message_attributes)]))
+
+        self.assertEqual("small message", message)
+        self.assertEqual({"tenant", "OFFLOADED_MESSAGE_ATTRIBUTES"}, set(actual))
+        self.assertEqual(actual, batch[0]["MessageAttributes"])
+        self.assertIn(b"a" * 200, self.s3.objects[("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")])
+
+    def test_cost_model_offloads_attributes_instead_of_the_body(self, mock_uuid):
+        self.base.message_size_threshold = 1000
+        self.base.cost_model = CostModel()
+        message_attributes = {"trace": {"StringValue": "a" * 200, "DataType": "String"}}
+
+        message, actual = asyncio.run(self.base.build("b" * 800, message_attributes))
+
+        self.assertEqual("b" * 800, message)
+        self.assertEqual({"OFFLOADED_MESSAGE_ATTRIBUTES"}, set(actual))
+        self.assertEqual([("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")], list(self.s3.objects))
+
+    def test_cost_model_uploads_attributes_offloaded_by_threshold(self, mock_uuid):
+        self.base.message_size_threshold = 2000
+        self.base.compress = True
+        self.base.cost_model = CostModel()
+        self.base.attributes_size_threshold = 200
+
+        message, actual = asyncio.run(
+            self.base.build("a" * 2500, {"big": {"StringValue": "x" * 300, "DataType": "String"}})
+        )
+
+        self.assertIn("compressedMessage", message)
+        self.assertIn("OFFLOADED_MESSAGE_ATTRIBUTES", actual)
+        self.assertIn(b"x" * 300, self.s3.objects[("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")])
+
+    def test_message_is_stored_in_frames(self, mock_uuid):
+        self.base.message_size_threshold = 40
+        self.base.compress = True
+        self.base.frame_size = 20
+        test_message = "This is a really long string. 56 characters to be exact."
+
+        actual = json.loads(asyncio.run(self.base.build(test_message)))
+        body = self.s3.objects[("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")]
+
+        self.assertEqual(3, actual["frames"])
+        self.assertEqual(test_message.encode(), decode_frames(*split_frame_index(body, 3), "gzip"))
+
+    def test_value_error_is_raised(self, mock_uuid):
+        with self.assertRaises(ValueError):
+            asyncio.run(self.base.build({"msg": "this method only supports strings"}))
+
+
+@patch(
+    "boto3_large_message_utils.async_builder.generate_s3_object_key",
+    return_value="abcde-fghi-jklm-nopqrstuvwxyz",
+)
+class TestAsyncBuildStream(TestCase):
+    def setUp(self):
+        self.s3 = InMemoryAsyncS3()
+        self.base = AsyncLargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket",
+            s3_client=self.s3,
+            message_size_threshold=100,
+            multipart_threshold=100,
+            multipart_chunksize=100,
+        )
+
+    def test_small_stream_is_built_as_a_message(self, mock_uuid):
+        actual = asyncio.run(self.base.build_stream(io.BytesIO(b"small message")))
+
+        self.assertEqual("small message", actual)
+        self.assertEqual({}, self.s3.objects)
+
+    def test_large_stream_is_uploaded_in_parts(self, mock_uuid):
+        actual = asyncio.run(self.base.build_stream(io.BytesIO(b"a" * 250)))
+
+        self.assertEqual(
+            '{"bucket": "test-s3-bucket", "key": "abcde-fghi-jklm-nopqrstuvwxyz", "compressed": false}', actual
+        )
+        self.assertEqual([100, 100, 50], [len(part) for part in self.s3.parts.values()])
+        self.assertEqual(b"a" * 250, self.s3.objects[("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")])
+
+    def test_large_binary_stream_is_marked_as_binary(self, mock_uuid):
+        actual = json.loads(asyncio.run(self.base.build_stream(io.BytesIO(b"\xff" * 150))))
+
+        self.assertTrue(actual["binary"])
+
+    def test_message_size_attribute_is_appended(self, mock_uuid):
+        test_message_attributes = {"attr": {"StringValue": "value", "DataType": "String"}}
+
+        _, actual = asyncio.run(self.base.build_stream(io.BytesIO(b"a" * 150), test_message_attributes))
+
+        self.assertEqual({"StringValue": "150", "DataType": "Number"}, actual["ORIGINAL_MESSAGE_SIZE"])
+
+    def test_large_message_is_uploaded_in_parts(self, mock_uuid):
+        with patch("boto3_large_message_utils.builder.generate_s3_object_key", return_value="large-message"):
+            asyncio.run(self.base.build("a" * 250))
+
+        self.assertEqual(3, len(self.s3.parts))
+        self.assertEqual(b"a" * 250, self.s3.objects[("test-s3-bucket", "large-message")])
+
+    def test_upload_is_aborted_when_a_part_fails(self, mock_uuid):
+        async def upload_part(**kwargs):
+            raise RuntimeError("upload failed")
+
+        self.s3.upload_part = upload_part
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.base.build_stream(io.BytesIO(b"a" * 250)))
+        self.assertTrue(self.s3.aborted)
+        self.assertEqual({}, self.s3.objects)
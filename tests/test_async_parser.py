@@ -0,0 +1,188 @@
+import asyncio
+import gzip
+import json
+from unittest import TestCase
+
+from botocore.exceptions import ClientError
+
+from boto3_large_message_utils.async_parser import AsyncLargeMessageParser
+from boto3_large_message_utils.utils.cache import PayloadCache
+from boto3_large_message_utils.utils.frames import encode_frames
+from boto3_large_message_utils.utils.metrics import TimingHistogram
+
+
+class InMemoryAsyncStreamingBody:
+    def __init__(self, body):
+        self.body = body
+
+    async def read(self):
+        await asyncio.sleep(0)
+        return self.body
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class InMemoryAsyncS3:
+    def __init__(self, objects=None):
+        self.objects = objects or {}
+
+    async def get_object(self, Bucket, Key, Range=None):
+        await asyncio.sleep(0)
+        if (Bucket, Key) not in self.objects:
+            raise NoSuchKey(Key)
+        body = self.objects[(Bucket, Key)]
+        if Range is not None:
+            start, end = Range[len("bytes="):].split("-")
+            if start and int(start) >= len(body):
+                raise ClientError({"Error": {"Code": "InvalidRange"}}, "GetObject")
+            body = body[-int(end):] if not start else body[int(start):int(end) + 1 if end else None]
+        return {"Body": InMemoryAsyncStreamingBody(body)}
+
+
+class TestAsyncParse(TestCase):
+    def setUp(self):
+        self.s3 = InMemoryAsyncS3(
+            {
+                ("test-s3-bucket", "plain"): b"this is a mock message",
+                ("test-s3-bucket", "compressed"): gzip.compress(b'{"hello": "world"}'),
+            }
+        )
+        self.parser = AsyncLargeMessageParser(s3_client=self.s3)
+
+    def test_plain_message_is_returned(self):
+        actual = asyncio.run(self.parser.parse("plain message"))
+
+        self.assertEqual("plain message", actual)
+
+    def test_compressed_message_is_decompressed(self):
+        actual = asyncio.run(
+            self.parser.parse('{"compressedMessage": "H4sIAK4TQF4C/yvJyCxWAKJEhZLU4hKF4pKizLx0ALXWhvwVAAAA"}')
+        )
+
+        self.assertEqual("this is a test string", actual)
+
+    def test_message_is_retrieved_from_s3(self):
+        actual = asyncio.run(
+            self.parser.parse('{"bucket": "test-s3-bucket", "key": "plain", "compressed": false}')
+        )
+
+        self.assertEqual("this is a mock message", actual)
+
+    def test_compressed_message_is_retrieved_from_s3_by_parse_json(self):
+        actual = asyncio.run(
+            self.parser.parse_json({"bucket": "test-s3-bucket", "key": "compressed", "compressed": True})
+        )
+
+        self.assertEqual({"hello": "world"}, actual)
+
+    def test_binary_message_is_retrieved_from_s3(self):
+        actual = asyncio.run(
+            self.parser.parse('{"bucket": "test-s3-bucket", "key": "plain", "compressed": false, "binary": true}')
+        )
+
+        self.assertEqual(b"this is a mock message", actual)
+
+    def test_parse_json_accepts_a_string(self):
+        actual = asyncio.run(
+            self.parser.parse_json('{"bucket": "test-s3-bucket", "key": "compressed", "compressed": true}')
+        )
+
+        self.assertEqual({"hello": "world"}, actual)
+        self.assertEqual('{"hello": 1}', asyncio.run(self.parser.parse('{"hello": 1}')))
+
+    def test_cached_message_is_not_retrieved_again(self):
+        parser = AsyncLargeMessageParser(s3_client=self.s3, cache=PayloadCache())
+        pointer = '{"bucket": "test-s3-bucket", "key": "plain", "compressed": false}'
+
+        self.assertEqual("this is a mock message", asyncio.run(parser.parse(pointer)))
+        del self.s3.objects[("test-s3-bucket", "plain")]
+        self.assertEqual("this is a mock message", asyncio.run(parser.parse(pointer)))
+
+    def test_metrics_are_reported(self):
+        metrics = TimingHistogram()
+        parser = AsyncLargeMessageParser(s3_client=self.s3, metrics=metrics)
+
+        asyncio.run(parser.parse('{"bucket": "test-s3-bucket", "key": "compressed", "compressed": true}'))
+
+        self.assertEqual({("parse", "s3-retrieved"): 1}, dict(metrics.paths))
+        self.assertEqual(1, metrics.histograms[("parse", "decompression")].count)
+
+    def test_parse_batch_reports_failures_per_message(self):
+        messages = [
+            {"MessageId": "1", "Body": '{"bucket": "test-s3-bucket", "key": "plain", "compressed": false}'},
+            {"MessageId": "2", "Body": '{"bucket": "test-s3-bucket", "key": "missing", "compressed": false}'},
+        ]
+
+        actual = asyncio.run(self.parser.parse_batch(messages))
+
+        self.assertEqual({"MessageId": "1", "Body": "this is a mock message"}, actual[0])
+        self.assertIsInstance(actual[1]["Error"], NoSuchKey)
+
+    def test_offloaded_attributes_are_restored(self):
+        self.s3.objects[("test-s3-bucket", "attributes")] = b'{"trace": {"StringValue": "abc", "DataType": "String"}}'
+        messages = [
+            {
+                "MessageId": "1",
+                "Body": "plain message",
+                "MessageAttributes": {
+                    "OFFLOADED_MESSAGE_ATTRIBUTES": {
+                        "StringValue": '{"bucket": "test-s3-bucket", "key": "attributes"}',
+                        "DataType": "String",
+                    }
+                },
+            }
+        ]
+
+        actual = asyncio.run(self.parser.parse_batch(messages))
+
+        self.assertEqual({"trace": {"StringValue": "abc", "DataType": "String"}}, actual[0]["MessageAttributes"])
+
+    def test_messages_are_prefetched_in_order(self):
+        async def parse_all():
+            messages = [
+                {"MessageId": "1", "Body": '{"bucket": "test-s3-bucket", "key": "plain", "compressed": false}'},
+                "plain message",
+                {"MessageId": "3", "Body": '{"bucket": "test-s3-bucket", "key": "compressed", "compressed": true}'},
+            ]
+            return [message async for message in self.parser.iter_parse(messages, prefetch_depth=1)]
+
+        actual = asyncio.run(parse_all())
+
+        self.assertEqual("this is a mock message", actual[0]["Body"])
+        self.assertEqual("plain message", actual[1])
+        self.assertEqual('{"hello": "world"}', actual[2]["Body"])
+
+    def test_framed_message_is_parsed(self):
+        message = b"".join(b"record %d\n" % index for index in range(100))
+        self.s3.objects[("test-s3-bucket", "framed")] = b"".join(encode_frames([message], 100, "gzip"))
+        pointer = json.dumps(
+            {"bucket": "test-s3-bucket", "key": "framed", "compressed": True, "frameSize": 100, "frames": 10}
+        )
+
+        self.assertEqual(message.decode(), asyncio.run(self.parser.parse(pointer)))
+        self.assertEqual(message[150:420], asyncio.run(self.parser.parse_range(pointer, 150, 420)))
+
+    def test_range_of_uncompressed_object_is_read(self):
+        pointer = '{"bucket": "test-s3-bucket", "key": "plain", "compressed": false}'
+
+        self.assertEqual(b"is a", asyncio.run(self.parser.parse_range(pointer, 5, 9)))
+
+    def test_range_past_the_end_of_uncompressed_object_is_empty(self):
+        pointer = '{"bucket": "test-s3-bucket", "key": "plain", "compressed": false}'
+
+        self.assertEqual(b"", asyncio.run(self.parser.parse_range(pointer, 100)))
+
+    def test_empty_range_is_not_retrieved(self):
+        pointer = '{"bucket": "test-s3-bucket", "key": "missing", "compressed": false}'
+
+        self.assertEqual(b"", asyncio.run(self.parser.parse_range(pointer, 5, 5)))
+
+    def test_type_error_is_raised_by_open(self):
+        with self.assertRaises(TypeError):
+            self.parser.open('{"bucket": "test-s3-bucket", "key": "plain", "compressed": false}')
+
+    def test_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(self.parser.parse({"msg": "this method only supports strings"}))
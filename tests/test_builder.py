@@ -1,29 +1,722 @@
-from unittest import TestCase
-from unittest.mock import patch, Mock
+import base64
+import gzip
+import io
+import json
+import zlib
+from unittest import TestCase, skipUnless
+from unittest.mock import ANY, patch, Mock
+
+from botocore.exceptions import ClientError
 
 from boto3_large_message_utils.exceptions import CompressionError
-from boto3_large_message_utils.builder import LargeMessageBuilder
+from boto3_large_message_utils.builder import LargeMessageBuilder, _MessageEntry
+from boto3_large_message_utils.parser import LargeMessageParser
+from boto3_large_message_utils.utils.metrics import MetricsCallback
+from boto3_large_message_utils.utils.planner import CostModel
+from boto3_large_message_utils.utils.policy import AdaptiveCompressionPolicy, CompressionDecision
+from boto3_large_message_utils.utils.serialization import get_available_json_backends
+from boto3_large_message_utils.utils.compression import (
+    _compress,
+    get_available_codecs,
+    get_compression_dictionary_id,
+    train_compression_dictionary,
+)
+
+
+class RecordingMetrics(MetricsCallback):
+    def __init__(self):
+        self.messages = []
+
+    def message_finished(self, metrics):
+        self.messages.append(metrics)
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.metrics = RecordingMetrics()
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket", message_size_threshold=100, metrics=self.metrics, s3_client=Mock()
+        )
+
+    def test_passthrough_is_reported(self):
+        self.base.build("small message")
+
+        self.assertEqual(1, len(self.metrics.messages))
+        self.assertEqual("passthrough", self.metrics.messages[0].path)
+        self.assertEqual(13, self.metrics.messages[0].message_size)
+        self.assertIsNotNone(self.metrics.messages[0].duration)
+
+    def test_inline_compressed_is_reported(self):
+        self.base.compress = True
+
+        self.base.build("a" * 200, {"attr": {"StringValue": "value", "DataType": "String"}})
+
+        actual = self.metrics.messages[0]
+        self.assertEqual("inline-compressed", actual.path)
+        self.assertEqual(200, actual.message_size)
+        self.assertLess(actual.compression_ratio, 1)
+        self.assertIn("compression", actual.durations)
+        self.assertIn("encoding", actual.durations)
+
+    def test_s3_offloaded_is_reported(self):
+        self.base.build("a" * 200)
+
+        self.assertEqual("s3-offloaded", self.metrics.messages[0].path)
+        self.assertIn("s3", self.metrics.messages[0].durations)
+
+    def test_batch_entries_are_reported(self):
+        self.base.build_batch(["small message", "a" * 200])
+
+        self.assertEqual(["passthrough", "s3-offloaded"], [metrics.path for metrics in self.metrics.messages])
+
+    def test_stream_is_reported(self):
+        self.base.s3.create_multipart_upload.return_value = {"UploadId": "upload-id"}
+
+        self.base.build_stream(io.BytesIO(b"a" * 200))
+
+        self.assertEqual("s3-offloaded", self.metrics.messages[0].path)
+        self.assertEqual(200, self.metrics.messages[0].message_size)
+
+    def test_error_is_reported(self):
+        self.base.s3.put_object.side_effect = RuntimeError("S3 is unavailable")
+
+        with self.assertRaises(RuntimeError):
+            self.base.build("a" * 200)
+
+        self.assertIs(self.base.s3.put_object.side_effect, self.metrics.messages[0].error)
+
+
+class TestS3Client(TestCase):
+    def test_s3_client_is_used(self):
+        s3 = Mock()
+
+        self.assertIs(s3, LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket", s3_client=s3).s3)
+
+    @patch("boto3_large_message_utils.builder.get_s3_client")
+    def test_shared_client_is_created_with_options(self, mock_get_s3_client):
+        session = Mock()
+
+        base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket", session=session, s3_client_options={"max_pool_connections": 20}
+        )
+
+        self.assertIs(mock_get_s3_client.return_value, base.s3)
+        mock_get_s3_client.assert_called_once_with(session, max_pool_connections=20)
 
 
 class TestGetCompressedMessageBody(TestCase):
     def setUp(self):
         self.base = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket")
 
-    @patch(
-        "boto3_large_message_utils.builder.compress_and_encode_string",
-        return_value="<Compressed and Encoded>",
-    )
-    def test_compressed_message_body_object_is_returned(self, mock_compress_and_encode):
-        expected = '{"compressedMessage": "<Compressed and Encoded>"}'
-        actual = self.base._get_compressed_message_body("this is a test message")
+    def test_compressed_message_body_object_is_returned(self):
+        expected = '{"compressedMessage": "PENvbXByZXNzZWQ+"}'
+        actual = self.base._get_compressed_message_body(b"<Compressed>")
+
+        self.assertEqual(expected, actual)
+
+    def test_codec_is_recorded_when_not_gzip(self):
+        self.base.codec = "zlib"
+
+        expected = '{"compressedMessage": "PENvbXByZXNzZWQ+", "codec": "zlib"}'
+        actual = self.base._get_compressed_message_body(b"<Compressed>")
 
-        mock_compress_and_encode.assert_called_once_with("this is a test message")
         self.assertEqual(expected, actual)
 
     def test_compression_error_is_raised(self):
         with self.assertRaises(CompressionError):
             self.base._get_compressed_message_body(
-                {"msg": "this method only supports strings"}
+                {"msg": "this method only supports bytes"}
+            )
+
+
+class TestCompressMessage(TestCase):
+    def setUp(self):
+        self.base = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket")
+
+    @patch(
+        "boto3_large_message_utils.builder.compress_string",
+        return_value=b"<Compressed>",
+    )
+    def test_compress_string_is_called_correctly(self, mock_compress_string):
+        self.base.codec = "zlib"
+        self.base.compression_level = 1
+
+        actual = self.base._compress_message(b"this is a test message")
+
+        mock_compress_string.assert_called_once_with(
+            b"this is a test message", codec="zlib", level=1, dictionary=None
+        )
+        self.assertEqual(b"<Compressed>", actual)
+
+    def test_compression_ratio_is_tracked(self):
+        self.base._observe_compression_ratio(100, 50)
+        self.assertEqual(0.5, self.base.compression_ratio)
+
+        self.base._observe_compression_ratio(100, 100)
+        self.assertAlmostEqual(0.6, self.base.compression_ratio)
+
+    def test_compression_error_is_raised(self):
+        with self.assertRaises(CompressionError):
+            self.base._compress_message({"msg": "this method only supports strings"})
+
+
+class TestCompressOnce(TestCase):
+    def setUp(self):
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket", compress=True, message_size_threshold=40, s3_client=Mock()
+        )
+
+    @patch("boto3_large_message_utils.builder.compress_string", return_value=b"x" * 100)
+    def test_message_is_compressed_once_when_stored_in_s3(self, mock_compress_string):
+        self.base._handle_message("This is a really long string. 56 characters to be exact.")
+
+        mock_compress_string.assert_called_once()
+        self.assertEqual(b"x" * 100, self.base.s3.put_object.call_args[1]["Body"])
+
+    @patch("boto3_large_message_utils.builder.compress_string", return_value=b"x" * 100)
+    def test_inline_attempt_is_skipped_when_predicted_too_large(self, mock_compress_string):
+        self.base.predict_compression = True
+        self.base.compression_ratio = 0.9
+
+        with patch.object(self.base, "_get_compressed_message_body") as mock_get_compressed_message_body:
+            self.base._handle_message("This is a really long string. 56 characters to be exact.")
+
+        mock_get_compressed_message_body.assert_not_called()
+        mock_compress_string.assert_called_once()
+        self.assertEqual(b"x" * 100, self.base.s3.put_object.call_args[1]["Body"])
+
+    def test_inline_attempt_is_made_when_prediction_fits(self):
+        self.base.predict_compression = True
+        self.base.message_size_threshold = 100
+        self.base.compression_ratio = 0.1
+
+        actual = self.base._handle_message("a" * 200)
+
+        self.assertTrue(actual.startswith('{"compressedMessage": '))
+
+
+class TestCompressionPolicy(TestCase):
+    def setUp(self):
+        self.policy = Mock()
+        self.policy.decide.return_value = CompressionDecision(True, "zlib", 1)
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket",
+            compress=True,
+            message_size_threshold=100,
+            compression_policy=self.policy,
+            s3_client=Mock(),
+        )
+
+    def test_inline_message_uses_the_decided_codec(self):
+        actual = json.loads(self.base.build("a" * 200))
+
+        self.assertEqual("zlib", actual["codec"])
+        self.assertEqual("a" * 200, zlib.decompress(base64.b64decode(actual["compressedMessage"])).decode())
+        self.policy.decide.assert_called_once_with(b"a" * 200, "gzip", None)
+        self.policy.observe.assert_called_once_with(self.policy.decide.return_value, 200, ANY)
+
+    def test_message_is_stored_uncompressed_when_compression_is_skipped(self):
+        self.policy.decide.return_value = CompressionDecision(False, "gzip", None, 1.0)
+        test_message = "This is a really long string. 56 characters to be exact." * 4
+
+        actual = json.loads(self.base.build(test_message))
+
+        self.assertFalse(actual["compressed"])
+        self.assertEqual(test_message.encode(), self.base.s3.put_object.call_args[1]["Body"])
+        self.policy.observe.assert_not_called()
+
+    def test_inline_attempt_is_skipped_when_estimated_too_large(self):
+        self.policy.decide.return_value = CompressionDecision(True, "gzip", None, 0.9)
+
+        with patch.object(self.base, "_get_compressed_message_body") as mock_get_compressed_message_body:
+            actual = json.loads(self.base.build("a" * 200))
+
+        mock_get_compressed_message_body.assert_not_called()
+        self.assertTrue(actual["compressed"])
+
+    def test_policy_is_not_consulted_without_compression(self):
+        self.base.compress = False
+
+        self.base.build("a" * 200)
+
+        self.policy.decide.assert_not_called()
+
+    def test_batch_entries_use_their_own_decision(self):
+        self.policy.decide.side_effect = [
+            CompressionDecision(True, "zlib", 1),
+            CompressionDecision(False, "gzip", None, 1.0),
+        ]
+
+        actual = self.base.build_batch(["a" * 200, "b" * 200])
+
+        self.assertEqual("zlib", json.loads(actual[0]["MessageBody"])["codec"])
+        self.assertFalse(json.loads(actual[1]["MessageBody"])["compressed"])
+        self.assertEqual(b"b" * 200, self.base.s3.put_object.call_args[1]["Body"])
+
+    def test_adaptive_policy_round_trips(self):
+        self.base.compression_policy = AdaptiveCompressionPolicy(sample_size=64, deterministic=True)
+        self.base.s3 = Mock()
+
+        actual = json.loads(self.base.build("a" * 200))
+
+        self.assertEqual("a" * 200, gzip.decompress(base64.b64decode(actual["compressedMessage"])).decode())
+
+
+@skipUnless("orjson" in get_available_json_backends(), "orjson is not installed")
+class TestJsonBackend(TestCase):
+    def test_envelopes_are_written_by_the_backend(self):
+        base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket", message_size_threshold=40, json_backend="orjson", s3_client=Mock()
+        )
+
+        actual = base.build("This is a really long string. 56 characters to be exact.")
+
+        parser = LargeMessageParser(s3_client=Mock())
+        parser.s3.get_object.return_value = {"Body": io.BytesIO(base.s3.put_object.call_args[1]["Body"])}
+
+        self.assertTrue(actual.startswith('{"bucket":"test-s3-bucket","key":'))
+        self.assertEqual("This is a really long string. 56 characters to be exact.", parser.parse(actual))
+
+    def test_stdlib_is_the_default(self):
+        base = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket")
+
+        self.assertEqual("json", base.json_backend.name)
+
+
+class TestBinaryMessage(TestCase):
+    def setUp(self):
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket", message_size_threshold=200, s3_client=Mock()
+        )
+        self.parser = LargeMessageParser(s3_client=self.base.s3)
+        self.test_message = bytes(range(100))
+
+    def test_small_binary_message_is_encoded(self):
+        actual = self.base.build(self.test_message)
+
+        self.assertEqual({"binaryMessage": base64.b64encode(self.test_message).decode()}, json.loads(actual))
+        self.assertEqual(self.test_message, self.parser.parse(actual))
+
+    def test_base85_encoding_is_recorded(self):
+        self.base.inline_encoding = "base85"
+
+        actual = json.loads(self.base.build(self.test_message))
+
+        self.assertEqual("base85", actual["encoding"])
+        self.assertEqual(self.test_message, base64.b85decode(actual["binaryMessage"]))
+
+    def test_binary_message_is_compressed(self):
+        self.base.compress = True
+        self.base.inline_encoding = "base85"
+        test_message = b"\x00\xff" * 200
+
+        actual = self.base.build(test_message, {"tenant": {"StringValue": "test", "DataType": "String"}})
+
+        self.assertEqual({"compressedMessage", "encoding", "binary"}, set(json.loads(actual[0])))
+        self.assertEqual("400", actual[1]["ORIGINAL_MESSAGE_SIZE"]["StringValue"])
+        self.assertEqual(test_message, self.parser.parse(actual[0]))
+
+    def test_large_binary_message_is_stored_in_s3(self):
+        test_message = bytes(range(256)) * 2
+
+        actual = json.loads(self.base.build(test_message))
+
+        self.assertTrue(actual["binary"])
+        self.assertEqual(test_message, self.base.s3.put_object.call_args[1]["Body"])
+
+    def test_binary_batch_entry_is_stored_in_s3(self):
+        actual = self.base.build_batch([self.test_message, bytes(range(256)) * 2])
+
+        self.assertIn("binaryMessage", json.loads(actual[0]["MessageBody"]))
+        self.assertTrue(json.loads(actual[1]["MessageBody"])["binary"])
+
+    def test_value_error_is_raised_for_unknown_encoding(self):
+        with self.assertRaises(ValueError):
+            LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket", inline_encoding="base32")
+
+
+class InMemoryS3:
+    def __init__(self):
+        self.objects = {}
+        self.ranges = []
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+        return {}
+
+    def get_object(self, Bucket, Key, Range=None):
+        body = self.objects[(Bucket, Key)]
+        if Range is not None:
+            self.ranges.append(Range)
+            start, end = Range[len("bytes="):].split("-")
+            body = body[-int(end):] if not start else body[int(start):int(end) + 1 if end else None]
+        return {"Body": io.BytesIO(body)}
+
+
+class TestOffloadMessageAttributes(TestCase):
+    def setUp(self):
+        self.s3 = InMemoryS3()
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket",
+            message_size_threshold=1000,
+            attributes_size_threshold=200,
+            s3_client=self.s3,
+        )
+        self.parser = LargeMessageParser(s3_client=self.s3)
+        self.message_attributes = {
+            "tenant": {"StringValue": "test", "DataType": "String"},
+            "trace": {"StringValue": "a" * 300, "DataType": "String"},
+            "payload": {"BinaryValue": b"\x00" * 150, "DataType": "Binary"},
+        }
+
+    def test_large_attributes_are_offloaded(self):
+        message, message_attributes = self.base.build("test", self.message_attributes)
+
+        self.assertEqual("test", message)
+        self.assertEqual({"tenant", "OFFLOADED_MESSAGE_ATTRIBUTES"}, set(message_attributes))
+        self.assertEqual(1, len(self.s3.objects))
+        self.assertEqual(self.message_attributes, self.parser.parse_attributes(message_attributes))
+
+    def test_only_as_many_attributes_as_needed_are_offloaded(self):
+        self.base.attributes_size_threshold = 400
+
+        _, message_attributes = self.base.build("test", self.message_attributes)
+
+        self.assertEqual({"tenant", "payload", "OFFLOADED_MESSAGE_ATTRIBUTES"}, set(message_attributes))
+
+    def test_inline_attributes_are_never_offloaded(self):
+        self.base.inline_attributes = frozenset(["trace"])
+        self.base.message_size_threshold = 2000
+
+        _, message_attributes = self.base.build("test", self.message_attributes)
+
+        self.assertEqual({"trace", "OFFLOADED_MESSAGE_ATTRIBUTES"}, set(message_attributes))
+
+    def test_small_attributes_are_not_offloaded(self):
+        message_attributes = {"tenant": {"StringValue": "test", "DataType": "String"}}
+
+        _, actual = self.base.build("test", message_attributes)
+
+        self.assertEqual(message_attributes, actual)
+        self.assertEqual({}, self.s3.objects)
+
+    def test_attributes_are_not_offloaded_by_default(self):
+        self.base.attributes_size_threshold = None
+
+        _, actual = self.base.build("test", self.message_attributes)
+
+        self.assertEqual(self.message_attributes, actual)
+
+    def test_value_error_is_raised_for_reserved_attribute_name(self):
+        self.message_attributes["OFFLOADED_MESSAGE_ATTRIBUTES"] = {"StringValue": "test", "DataType": "String"}
+
+        with self.assertRaises(ValueError):
+            self.base.build("test", self.message_attributes)
+
+    def test_batch_attributes_are_offloaded(self):
+        actual = self.base.build_batch([("a" * 2000, self.message_attributes), ("test", self.message_attributes)])
+
+        self.assertEqual(3, len(self.s3.objects))
+        parsed = self.parser.parse_batch(
+            [{"Body": entry["MessageBody"], "MessageAttributes": entry["MessageAttributes"]} for entry in actual]
+        )
+        self.assertEqual("a" * 2000, parsed[0]["Body"])
+        self.assertEqual("2000", parsed[0]["MessageAttributes"].pop("ORIGINAL_MESSAGE_SIZE")["StringValue"])
+        self.assertEqual(self.message_attributes, parsed[0]["MessageAttributes"])
+        self.assertEqual(self.message_attributes, parsed[1]["MessageAttributes"])
+
+
+class TestCostModelPlanner(TestCase):
+    def setUp(self):
+        self.s3 = InMemoryS3()
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket",
+            message_size_threshold=1000,
+            s3_client=self.s3,
+            cost_model=CostModel(),
+        )
+        self.parser = LargeMessageParser(s3_client=self.s3)
+        self.test_message = "a" * 800
+        self.message_attributes = {
+            "tenant": {"StringValue": "test", "DataType": "String"},
+            "trace": {"StringValue": "b" * 200, "DataType": "String"},
+        }
+
+    def test_small_message_is_returned(self):
+        self.assertEqual(("test", self.message_attributes), self.base.build("test", self.message_attributes))
+        self.assertEqual("test", self.base.build("test"))
+        self.assertEqual({}, self.s3.objects)
+
+    def test_attributes_are_offloaded_instead_of_the_body(self):
+        message, message_attributes = self.base.build(self.test_message, self.message_attributes)
+
+        self.assertEqual(self.test_message, message)
+        self.assertEqual({"tenant", "OFFLOADED_MESSAGE_ATTRIBUTES"}, set(message_attributes))
+        self.assertEqual(self.message_attributes, self.parser.parse_attributes(message_attributes))
+        self.assertEqual(1, len(self.s3.objects))
+
+    def test_message_is_compressed_inline_when_cheaper(self):
+        self.base.compress = True
+
+        message, message_attributes = self.base.build(self.test_message, self.message_attributes)
+
+        self.assertIn("compressedMessage", json.loads(message))
+        self.assertEqual("800", message_attributes["ORIGINAL_MESSAGE_SIZE"]["StringValue"])
+        self.assertEqual(self.test_message, self.parser.parse(message))
+        self.assertEqual({}, self.s3.objects)
+
+    def test_expensive_compression_is_avoided(self):
+        self.base.compress = True
+        self.base.cost_model = CostModel(request_cost=100, compression_byte_cost=1000)
+
+        message, message_attributes = self.base.build(self.test_message, self.message_attributes)
+
+        self.assertEqual(self.test_message, message)
+        self.assertIn("OFFLOADED_MESSAGE_ATTRIBUTES", message_attributes)
+
+    def test_body_is_offloaded_when_nothing_else_fits(self):
+        self.base.inline_attributes = frozenset(["trace"])
+
+        message, message_attributes = self.base.build(self.test_message, self.message_attributes)
+
+        self.assertEqual({"bucket", "key", "compressed"}, set(json.loads(message)))
+        self.assertEqual(self.test_message, self.parser.parse(message))
+        self.assertEqual("800", message_attributes.pop("ORIGINAL_MESSAGE_SIZE")["StringValue"])
+        self.assertEqual(self.message_attributes, message_attributes)
+
+    def test_attributes_larger_than_threshold_are_offloaded(self):
+        self.message_attributes["trace"]["StringValue"] = "b" * 1200
+
+        message, message_attributes = self.base.build("test", self.message_attributes)
+
+        self.assertEqual("test", message)
+        self.assertEqual({"tenant", "OFFLOADED_MESSAGE_ATTRIBUTES"}, set(message_attributes))
+        self.assertEqual(self.message_attributes, self.parser.parse_attributes(message_attributes))
+
+    def test_attributes_larger_than_threshold_are_offloaded_with_the_body(self):
+        self.message_attributes["trace"]["StringValue"] = "b" * 1200
+
+        message, message_attributes = self.base.build("a" * 1200, self.message_attributes)
+
+        self.assertEqual("a" * 1200, self.parser.parse(message))
+        parsed_attributes = self.parser.parse_attributes(message_attributes)
+        self.assertEqual("1200", parsed_attributes.pop("ORIGINAL_MESSAGE_SIZE")["StringValue"])
+        self.assertEqual(self.message_attributes, parsed_attributes)
+        self.assertEqual(2, len(self.s3.objects))
+
+    def test_value_error_is_raised_for_attributes_that_cannot_be_offloaded(self):
+        self.base.inline_attributes = frozenset(["trace"])
+        self.message_attributes["trace"]["StringValue"] = "b" * 1200
+
+        with self.assertRaises(ValueError):
+            self.base.build("test", self.message_attributes)
+
+    def test_size_attribute_is_not_required_for_message_sent_as_it_is(self):
+        for index in range(8):
+            self.message_attributes[f"attr{index}"] = {"StringValue": "c", "DataType": "String"}
+
+        message, message_attributes = self.base.build(self.test_message, self.message_attributes)
+
+        self.assertEqual(self.test_message, message)
+        self.assertNotIn("ORIGINAL_MESSAGE_SIZE", message_attributes)
+        self.assertEqual(self.message_attributes, self.parser.parse_attributes(message_attributes))
+
+    def test_binary_message_is_encoded_inline(self):
+        self.base.message_size_threshold = 200
+
+        actual = self.base.build(bytes(range(100)))
+
+        self.assertEqual(bytes(range(100)), self.parser.parse(actual))
+        self.assertEqual({}, self.s3.objects)
+
+    def test_attributes_offloaded_by_threshold_are_uploaded(self):
+        self.base.compress = True
+        self.base.attributes_size_threshold = 100
+
+        message, message_attributes = self.base.build("a" * 1200, self.message_attributes)
+
+        self.assertIn("compressedMessage", json.loads(message))
+        self.assertEqual(1, len(self.s3.objects))
+        parsed_attributes = self.parser.parse_attributes(message_attributes)
+        self.assertEqual("1200", parsed_attributes.pop("ORIGINAL_MESSAGE_SIZE")["StringValue"])
+        self.assertEqual(self.message_attributes, parsed_attributes)
+
+    def test_batch_attributes_offloaded_by_threshold_are_uploaded(self):
+        self.base.compress = True
+        self.base.attributes_size_threshold = 100
+
+        actual = self.base.build_batch([("a" * 1200, self.message_attributes)])
+        fanout = self.base.build_fanout("a" * 1200, [self.message_attributes, self.message_attributes])
+
+        self.assertEqual(3, len(self.s3.objects))
+        for message_attributes in [actual[0]["MessageAttributes"]] + [attributes for _, attributes in fanout]:
+            self.assertEqual(
+                self.message_attributes["trace"], self.parser.parse_attributes(message_attributes)["trace"]
+            )
+
+    def test_batch_entries_are_planned(self):
+        actual = self.base.build_batch([(self.test_message, self.message_attributes), "test"])
+
+        self.assertEqual(self.test_message, actual[0]["MessageBody"])
+        self.assertIn("OFFLOADED_MESSAGE_ATTRIBUTES", actual[0]["MessageAttributes"])
+        self.assertEqual(1, len(self.s3.objects))
+
+
+@patch(
+    "boto3_large_message_utils.builder.generate_s3_object_key",
+    return_value="abcde-fghi-jklm-nopqrstuvwxyz",
+)
+class TestFramedMessage(TestCase):
+    def setUp(self):
+        self.s3 = InMemoryS3()
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket",
+            message_size_threshold=100,
+            compress=True,
+            frame_size=1000,
+            s3_client=self.s3,
+        )
+        self.parser = LargeMessageParser(s3_client=self.s3)
+        self.test_message = "".join(f"record {index}\n" for index in range(1000))
+
+    def test_framed_message_is_parsed(self, mock_uuid):
+        actual = self.base.build(self.test_message)
+
+        self.assertEqual(
+            {
+                "bucket": "test-s3-bucket",
+                "key": "abcde-fghi-jklm-nopqrstuvwxyz",
+                "compressed": True,
+                "frameSize": 1000,
+                "frames": 11,
+            },
+            json.loads(actual),
+        )
+        self.assertEqual(self.test_message, self.parser.parse(actual))
+
+    def test_range_is_read_from_the_frames_it_covers(self, mock_uuid):
+        pointer = self.base.build(self.test_message)
+
+        actual = self.parser.parse_range(pointer, 2500, 3500)
+
+        self.assertEqual(self.test_message.encode()[2500:3500], actual)
+        self.assertEqual(["bytes=-44", "bytes=%d-%d" % self._get_frame_range(2, 4)], self.s3.ranges)
+
+    def test_first_records_are_streamed(self, mock_uuid):
+        pointer = self.base.build(self.test_message)
+
+        with self.parser.open(pointer) as stream:
+            actual = [stream.readline() for _ in range(3)]
+
+        self.assertEqual([b"record 0\n", b"record 1\n", b"record 2\n"], actual)
+        self.assertEqual(2, len(self.s3.ranges))
+
+    def test_whole_message_is_streamed_with_one_request(self, mock_uuid):
+        pointer = self.base.build(self.test_message)
+
+        with self.parser.open(pointer) as stream:
+            actual = stream.read()
+
+        self.assertEqual(self.test_message.encode(), actual)
+        self.assertEqual(["bytes=-44", "bytes=%d-%d" % self._get_frame_range(0, 11)], self.s3.ranges)
+
+    def test_uncompressed_frames(self, mock_uuid):
+        self.base.compress = False
+        pointer = self.base.build(self.test_message)
+
+        self.assertEqual(self.test_message, self.parser.parse(pointer))
+        self.assertEqual(self.test_message.encode()[10:20], self.parser.parse_range(pointer, 10, 20))
+
+    def test_stream_is_stored_in_frames(self, mock_uuid):
+        pointer = self.base.build_stream(io.BytesIO(self.test_message.encode()))
+
+        self.assertEqual(11, json.loads(pointer)["frames"])
+        self.assertEqual(self.test_message, self.parser.parse(pointer))
+        self.assertEqual(self.test_message.encode()[-5:], self.parser.parse_range(pointer, len(self.test_message) - 5))
+
+    def test_batch_entry_is_stored_in_frames(self, mock_uuid):
+        actual = self.base.build_batch([self.test_message])
+
+        self.assertEqual(self.test_message, self.parser.parse(actual[0]["MessageBody"]))
+
+    def test_each_frame_is_compressed_once(self, mock_uuid):
+        with patch("boto3_large_message_utils.utils.compression._compress", wraps=_compress) as mock_compress:
+            pointer = self.base.build(self.test_message)
+
+        self.assertEqual(11, mock_compress.call_count)
+        self.assertEqual(self.test_message, self.parser.parse(pointer))
+
+    def test_message_in_one_frame_is_compressed_once(self, mock_uuid):
+        message = self.test_message[:500]
+
+        with patch("boto3_large_message_utils.utils.compression._compress", wraps=_compress) as mock_compress:
+            pointer = self.base.build(message)
+
+        mock_compress.assert_called_once()
+        self.assertEqual(1, json.loads(pointer)["frames"])
+        self.assertEqual(message, self.parser.parse(pointer))
+
+    def test_frame_compression_is_recorded(self, mock_uuid):
+        self.base.metrics = RecordingMetrics()
+
+        self.base.build(self.test_message)
+
+        body = self.s3.objects[("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")]
+        actual = self.base.metrics.messages[0]
+        self.assertEqual(len(body) - 44, actual.compressed_size)
+        self.assertIn("compression", actual.durations)
+        self.assertIsNotNone(self.base.compression_ratio)
+
+    def test_message_in_several_frames_is_sent_inline_when_it_fits(self, mock_uuid):
+        self.base.message_size_threshold = 1000
+        message = "a" * 5000
+
+        actual = self.base.build(message)
+
+        self.assertIn("compressedMessage", json.loads(actual))
+        self.assertEqual(message, self.parser.parse(actual))
+
+    def test_value_error_is_raised_for_invalid_frame_size(self, mock_uuid):
+        with self.assertRaises(ValueError):
+            LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket", frame_size=0)
+
+    def _get_frame_range(self, first_frame: int, stop_frame: int) -> (int, int):
+        body = self.s3.objects[("test-s3-bucket", "abcde-fghi-jklm-nopqrstuvwxyz")]
+        index = body[-44:]
+        frame_lengths = [int.from_bytes(index[offset:offset + 4], "big") for offset in range(0, 44, 4)]
+        return sum(frame_lengths[:first_frame]), sum(frame_lengths[:stop_frame]) - 1
+
+
+@skipUnless("zstd" in get_available_codecs(), "zstandard is not installed")
+class TestCompressionDictionary(TestCase):
+    def setUp(self):
+        self.dictionary = train_compression_dictionary(
+            [json.dumps({"id": i, "status": "active", "name": f"name-{i}"}) for i in range(200)], size=4096
+        )
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket",
+            compress=True,
+            codec="zstd",
+            compression_dictionary=self.dictionary,
+        )
+
+    def test_dictionary_id_is_recorded_in_compressed_message_body(self):
+        actual = json.loads(self.base._get_compressed_message_body(b"<Compressed>"))
+
+        self.assertEqual("zstd", actual["codec"])
+        self.assertEqual(get_compression_dictionary_id(self.dictionary), actual["dictionary"])
+
+    def test_dictionary_id_is_recorded_in_cached_message_body(self):
+        self.base.s3 = Mock()
+
+        actual = json.loads(self.base._store_message_in_s3('{"id": 1, "status": "active"}'))
+
+        self.assertEqual(get_compression_dictionary_id(self.dictionary), actual["dictionary"])
+
+    def test_value_error_is_raised_for_codec_without_dictionary_support(self):
+        with self.assertRaises(ValueError):
+            LargeMessageBuilder(
+                s3_bucket_for_cache="test-s3-bucket", compression_dictionary=self.dictionary
             )
 
 
@@ -37,6 +730,18 @@ class TestGetCachedMessageBody(TestCase):
 
         self.assertEqual(expected, actual)
 
+    def test_cached_message_body_object_records_codec_when_not_gzip(self):
+        expected = '{"bucket": "test-s3-bucket", "key": "test-object-key", "compressed": true, "codec": "zlib"}'
+        actual = self.base._get_cached_message_body(
+            "test-s3-bucket", "test-object-key", compressed=True, codec="zlib"
+        )
+
+        self.assertEqual(expected, actual)
+
+    def test_value_error_is_raised_for_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket", codec="unknown")
+
     def test_value_error_is_raised_for_bucket_when_not_string(self):
         with self.assertRaises(ValueError) as context:
             self.base._get_cached_message_body(bucket=1, key="string")
@@ -116,6 +821,72 @@ class TestHandleMessage(TestCase):
 
     # TODO: Add some exception handling tests
 
+    @patch("boto3_large_message_utils.builder.LargeMessageBuilder._store_message_in_s3")
+    def test_message_is_encoded_once_for_s3(self, mock_store_in_s3):
+        self.base.message_size_threshold = 40
+
+        self.base._handle_message("Ünïcödé message that is longer than forty bytes")
+
+        mock_store_in_s3.assert_called_once()
+        self.assertEqual(
+            "Ünïcödé message that is longer than forty bytes".encode("utf-8"), mock_store_in_s3.call_args[0][0]
+        )
+
+    def test_multibyte_message_is_measured_in_bytes(self):
+        self.base.message_size_threshold = 100
+        self.base.compress = True
+        test_message = "é" * 60
+
+        actual = self.base._handle_message(test_message)
+
+        self.assertTrue(actual.startswith('{"compressedMessage": '))
+
+
+class TestMessageEntry(TestCase):
+    def test_ascii_message_is_measured_without_encoding(self):
+        entry = _MessageEntry(None, "this is a test message", None, 100)
+
+        self.assertEqual(22, entry.message_size)
+        self.assertIsNone(entry._message_bytes)
+
+    def test_obviously_small_message_is_not_encoded(self):
+        entry = _MessageEntry(None, "€" * 10, None, 100)
+
+        self.assertTrue(entry.is_smaller_than(100))
+        self.assertIsNone(entry._message_bytes)
+
+    def test_obviously_large_message_is_not_encoded(self):
+        entry = _MessageEntry(None, "€" * 100, None, 100)
+
+        self.assertFalse(entry.is_smaller_than(100))
+        self.assertIsNone(entry._message_bytes)
+
+    def test_ambiguous_message_is_encoded_once(self):
+        entry = _MessageEntry(None, "€" * 40, None, 100)
+
+        self.assertFalse(entry.is_smaller_than(100))
+        self.assertEqual(120, entry.message_size)
+        self.assertIs(entry.message_bytes, entry.message_bytes)
+
+    def test_message_body_is_measured_from_its_encoded_bytes(self):
+        entry = _MessageEntry(None, "€" * 40, None, 100)
+
+        with patch("boto3_large_message_utils.builder.get_size_of_string_in_bytes") as mock_get_size:
+            self.assertEqual(120, entry.size)
+            self.assertEqual(120, entry.size)
+
+        mock_get_size.assert_not_called()
+
+    def test_envelope_body_is_measured_once(self):
+        entry = _MessageEntry(None, "€" * 40, None, 100)
+        entry.body = '{"bucket": "test-s3-bucket", "key": "€"}'
+
+        with patch("boto3_large_message_utils.builder.get_size_of_string_in_bytes", return_value=42) as mock_get_size:
+            self.assertEqual(42, entry.size)
+            self.assertEqual(42, entry.size)
+
+        mock_get_size.assert_called_once()
+
 
 class TestHandleMessageWithMessageAttributes(TestCase):
     def setUp(self):
@@ -267,8 +1038,7 @@ class TestHandleMessageWithMessageAttributes(TestCase):
 )
 class TestStoreInS3(TestCase):
     def setUp(self):
-        self.base = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket")
-        self.base.s3 = Mock()
+        self.base = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket", s3_client=Mock())
 
     def test_put_object(self, mock_uuid):
         test_message = "this is a test message"
@@ -305,8 +1075,7 @@ class TestStoreInS3(TestCase):
 @patch("boto3_large_message_utils.builder.LargeMessageBuilder._handle_message")
 class TestSubmitMessage(TestCase):
     def setUp(self):
-        self.base = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket")
-        self.base.s3 = Mock()
+        self.base = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket", s3_client=Mock())
 
     def test_message_without_message_attributes(
         self, mock_handle_msg, mock_handle_msg_with_attrs
@@ -328,3 +1097,363 @@ class TestSubmitMessage(TestCase):
 
         mock_handle_msg.assert_not_called()
         mock_handle_msg_with_attrs.assert_called_with(test_message, test_attributes)
+
+
+@patch(
+    "boto3_large_message_utils.builder.generate_s3_object_key",
+    return_value="abcde-fghi-jklm-nopqrstuvwxyz",
+)
+class TestBuildFanout(TestCase):
+    def setUp(self):
+        self.base = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket", message_size_threshold=40, s3_client=Mock())
+
+    def test_message_is_stored_once_for_every_destination(self, mock_uuid):
+        test_message = "This is a really long string. 56 characters to be exact."
+        destinations = [
+            {"tenant": {"StringValue": "first", "DataType": "String"}},
+            {"tenant": {"StringValue": "second", "DataType": "String"}},
+            None,
+        ]
+
+        actual = self.base.build_fanout(test_message, destinations)
+
+        pointer = '{"bucket": "test-s3-bucket", "key": "abcde-fghi-jklm-nopqrstuvwxyz", "compressed": false}'
+        self.assertEqual(
+            [
+                (
+                    pointer,
+                    {
+                        "tenant": {"StringValue": "first", "DataType": "String"},
+                        "ORIGINAL_MESSAGE_SIZE": {"StringValue": "56", "DataType": "Number"},
+                    },
+                ),
+                (
+                    pointer,
+                    {
+                        "tenant": {"StringValue": "second", "DataType": "String"},
+                        "ORIGINAL_MESSAGE_SIZE": {"StringValue": "56", "DataType": "Number"},
+                    },
+                ),
+                (pointer, None),
+            ],
+            actual,
+        )
+        self.assertEqual({"tenant": {"StringValue": "first", "DataType": "String"}}, destinations[0])
+        mock_uuid.assert_called_once()
+        self.base.s3.put_object.assert_called_once_with(
+            Bucket="test-s3-bucket", Body=test_message.encode(), Key="abcde-fghi-jklm-nopqrstuvwxyz"
+        )
+
+    @patch(
+        "boto3_large_message_utils.builder.compress_string",
+        side_effect=lambda message, **kwargs: gzip.compress(message),
+    )
+    def test_message_is_compressed_once(self, mock_compress, mock_uuid):
+        self.base.compress = True
+        self.base.message_size_threshold = 100
+
+        actual = self.base.build_fanout("a" * 200, [None, {"attr": {"StringValue": "value", "DataType": "String"}}])
+
+        self.assertTrue(actual[0][0].startswith('{"compressedMessage": '))
+        self.assertEqual(actual[0][0], actual[1][0])
+        mock_compress.assert_called_once()
+        self.base.s3.put_object.assert_not_called()
+
+    def test_small_message_is_returned_inline(self, mock_uuid):
+        actual = self.base.build_fanout("small message", [None, None])
+
+        self.assertEqual([("small message", None), ("small message", None)], actual)
+        self.base.s3.put_object.assert_not_called()
+
+    def test_value_error_is_raised(self, mock_uuid):
+        with self.assertRaises(ValueError):
+            self.base.build_fanout("small message", None)
+        with self.assertRaises(ValueError):
+            self.base.build_fanout("small message", ["not attributes"])
+
+
+class TestDeduplicate(TestCase):
+    def setUp(self):
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket",
+            s3_object_prefix="my-test-prefix",
+            message_size_threshold=40,
+            deduplicate=True,
+            s3_client=Mock(),
+        )
+
+    def test_identical_messages_are_uploaded_once(self):
+        test_message = "This is a really long string. 56 characters to be exact."
+
+        first = self.base.build(test_message)
+        second = self.base.build(test_message)
+
+        self.assertEqual(first, second)
+        self.assertRegex(json.loads(first)["key"], r"^my-test-prefix/[0-9a-f]{64}$")
+        self.base.s3.put_object.assert_called_once()
+
+    def test_different_messages_have_different_keys(self):
+        first = self.base.build("This is a really long string. 56 characters to be exact.")
+        second = self.base.build("This is another long string. 57 characters to be exact.")
+
+        self.assertNotEqual(json.loads(first)["key"], json.loads(second)["key"])
+        self.assertEqual(2, self.base.s3.put_object.call_count)
+
+    def test_compressed_and_plain_copies_have_different_keys(self):
+        test_message = "This is a really long string. 56 characters to be exact."
+        compressed_base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket",
+            compress=True,
+            message_size_threshold=40,
+            deduplicate=True,
+            s3_client=Mock(),
+        )
+        plain_base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket", message_size_threshold=40, deduplicate=True, s3_client=Mock()
+        )
+
+        self.assertNotEqual(
+            json.loads(compressed_base.build(test_message))["key"], json.loads(plain_base.build(test_message))["key"]
+        )
+
+    def test_existing_object_is_not_uploaded(self):
+        self.base.check_existing_objects = True
+
+        self.base.build("This is a really long string. 56 characters to be exact.")
+
+        self.base.s3.head_object.assert_called_once()
+        self.base.s3.put_object.assert_not_called()
+
+    def test_missing_object_is_uploaded(self):
+        self.base.check_existing_objects = True
+        self.base.s3.head_object.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+        self.base.build("This is a really long string. 56 characters to be exact.")
+
+        self.base.s3.put_object.assert_called_once()
+
+    def test_identical_batch_entries_are_uploaded_once(self):
+        test_message = "This is a really long string. 56 characters to be exact."
+
+        actual = self.base.build_batch([test_message, test_message])
+
+        self.assertEqual(actual[0]["MessageBody"], actual[1]["MessageBody"])
+        self.base.s3.put_object.assert_called_once()
+
+
+@patch(
+    "boto3_large_message_utils.builder.generate_s3_object_key",
+    return_value="abcde-fghi-jklm-nopqrstuvwxyz",
+)
+class TestBuildBatch(TestCase):
+    def setUp(self):
+        self.base = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket", s3_client=Mock())
+
+    @patch("boto3_large_message_utils.builder.compress_string")
+    def test_reserved_attribute_is_rejected_before_compressing(self, mock_compress_string, mock_uuid):
+        self.base.compress = True
+        self.base.message_size_threshold = 100
+        message_attributes = {"ORIGINAL_MESSAGE_SIZE": {"StringValue": "1", "DataType": "Number"}}
+
+        with self.assertRaises(ValueError):
+            self.base.build_batch([("a" * 200, message_attributes)])
+
+        mock_compress_string.assert_not_called()
+
+    def test_attributes_are_measured_once_per_entry(self, mock_uuid):
+        self.base.attribute_schema = Mock(wraps=self.base.attribute_schema)
+        message_attributes = {"attr": {"StringValue": "value", "DataType": "String"}}
+
+        self.base.build_batch([("first message", message_attributes), ("second message", message_attributes)])
+
+        self.assertEqual(2, self.base.attribute_schema.get_size.call_count)
+
+    def test_small_entries_are_returned_inline(self, mock_uuid):
+        expected = [
+            {"Id": "0", "MessageBody": "first message"},
+            {
+                "Id": "1",
+                "MessageBody": "second message",
+                "MessageAttributes": {"attr": {"StringValue": "value", "DataType": "String"}},
+            },
+        ]
+        actual = self.base.build_batch(
+            [
+                "first message",
+                ("second message", {"attr": {"StringValue": "value", "DataType": "String"}}),
+            ]
+        )
+
+        self.assertEqual(expected, actual)
+        self.base.s3.put_object.assert_not_called()
+
+    def test_sns_entries_use_message_key(self, mock_uuid):
+        expected = [{"Id": "0", "Message": "first message"}]
+        actual = self.base.build_batch(["first message"], service="sns")
+
+        self.assertEqual(expected, actual)
+
+    def test_oversized_entries_are_stored_in_s3(self, mock_uuid):
+        self.base.message_size_threshold = 40
+
+        actual = self.base.build_batch(
+            ["small message", "This is a really long string. 56 characters to be exact."]
+        )
+
+        self.assertEqual({"Id": "0", "MessageBody": "small message"}, actual[0])
+        self.assertEqual(
+            {
+                "Id": "1",
+                "MessageBody": '{"bucket": "test-s3-bucket", "key": "abcde-fghi-jklm-nopqrstuvwxyz", '
+                '"compressed": false}',
+            },
+            actual[1],
+        )
+        self.base.s3.put_object.assert_called_once_with(
+            Bucket="test-s3-bucket",
+            Body=b"This is a really long string. 56 characters to be exact.",
+            Key="abcde-fghi-jklm-nopqrstuvwxyz",
+        )
+
+    def test_largest_entries_are_stored_in_s3_to_fit_batch_threshold(self, mock_uuid):
+        self.base.message_size_threshold = 100
+        self.base.batch_size_threshold = 170
+        messages = ["a" * 95, "b" * 70, "c" * 10]
+
+        actual = self.base.build_batch(messages)
+
+        self.assertTrue(actual[0]["MessageBody"].startswith('{"bucket": "test-s3-bucket"'))
+        self.assertEqual("b" * 70, actual[1]["MessageBody"])
+        self.assertEqual("c" * 10, actual[2]["MessageBody"])
+        self.base.s3.put_object.assert_called_once_with(
+            Bucket="test-s3-bucket", Body=b"a" * 95, Key="abcde-fghi-jklm-nopqrstuvwxyz"
+        )
+
+    def test_size_attribute_is_added_to_offloaded_entries(self, mock_uuid):
+        self.base.message_size_threshold = 60
+        test_message_attributes = {"attr": {"StringValue": "value", "DataType": "String"}}
+
+        actual = self.base.build_batch(
+            [("This is a really long string. 56 characters to be exact.", test_message_attributes)]
+        )
+
+        self.assertEqual(
+            {
+                "attr": {"StringValue": "value", "DataType": "String"},
+                "ORIGINAL_MESSAGE_SIZE": {"StringValue": "56", "DataType": "Number"},
+            },
+            actual[0]["MessageAttributes"],
+        )
+        self.assertEqual({"attr": {"StringValue": "value", "DataType": "String"}}, test_message_attributes)
+
+    def test_value_error_is_raised_for_too_many_entries(self, mock_uuid):
+        with self.assertRaises(ValueError):
+            self.base.build_batch(["message"] * 11)
+
+    def test_value_error_is_raised_for_unknown_service(self, mock_uuid):
+        with self.assertRaises(ValueError):
+            self.base.build_batch(["message"], service="kinesis")
+
+    def test_value_error_is_raised_when_batch_cannot_fit(self, mock_uuid):
+        self.base.message_size_threshold = 200
+        self.base.batch_size_threshold = 50
+        test_message_attributes = {"attr": {"StringValue": "v" * 60, "DataType": "String"}}
+
+        with self.assertRaises(ValueError):
+            self.base.build_batch([("message", test_message_attributes)])
+
+
+@patch(
+    "boto3_large_message_utils.builder.generate_s3_object_key",
+    return_value="abcde-fghi-jklm-nopqrstuvwxyz",
+)
+class TestBuildStream(TestCase):
+    def setUp(self):
+        self.base = LargeMessageBuilder(
+            s3_bucket_for_cache="test-s3-bucket",
+            message_size_threshold=40,
+            multipart_threshold=100,
+            multipart_chunksize=100,
+            s3_client=Mock(),
+        )
+        self.base.s3.create_multipart_upload.return_value = {"UploadId": "test-upload-id"}
+        self.base.s3.upload_part.side_effect = lambda **kwargs: {"ETag": f'"{kwargs["PartNumber"]}"'}
+
+    def test_small_stream_is_built_as_a_message(self, mock_uuid):
+        actual = self.base.build_stream(io.BytesIO(b'{"hello": "world"}'))
+
+        self.assertEqual('{"hello": "world"}', actual)
+        self.base.s3.put_object.assert_not_called()
+
+    def test_large_stream_is_stored_in_s3(self, mock_uuid):
+        actual = self.base.build_stream(iter(["This is a really long string. ", "56 characters to be exact."]))
+
+        self.assertEqual(
+            '{"bucket": "test-s3-bucket", "key": "abcde-fghi-jklm-nopqrstuvwxyz", "compressed": false}', actual
+        )
+        self.base.s3.put_object.assert_called_once_with(
+            Bucket="test-s3-bucket",
+            Body=b"This is a really long string. 56 characters to be exact.",
+            Key="abcde-fghi-jklm-nopqrstuvwxyz",
+        )
+
+    def test_small_binary_stream_is_built_as_a_binary_message(self, mock_uuid):
+        self.base.message_size_threshold = 100
+
+        actual = self.base.build_stream(io.BytesIO(b"\xff\xfe\x00"))
+
+        self.assertEqual({"binaryMessage": "//4A"}, json.loads(actual))
+
+    def test_large_binary_stream_is_marked_as_binary(self, mock_uuid):
+        test_message = b"\xff" * 50
+
+        actual = json.loads(self.base.build_stream(io.BytesIO(test_message)))
+
+        self.assertTrue(actual["binary"])
+        parser = LargeMessageParser(s3_client=Mock())
+        parser.s3.get_object.return_value = {"Body": io.BytesIO(self.base.s3.put_object.call_args[1]["Body"])}
+        self.assertEqual(test_message, parser.parse(json.dumps(actual)))
+
+    def test_multibyte_character_split_across_chunks_is_text(self, mock_uuid):
+        self.base.multipart_chunksize = 1
+
+        actual = json.loads(self.base.build_stream(io.BytesIO("é".encode() * 30)))
+
+        self.assertNotIn("binary", actual)
+
+    def test_very_large_stream_is_compressed_and_uploaded_in_parts(self, mock_uuid):
+        self.base.compress = True
+        test_message = "".join(str(i) for i in range(2000)).encode()
+
+        actual = self.base.build_stream(io.BytesIO(test_message), {"attr": {"StringValue": "v", "DataType": "String"}})
+
+        self.assertEqual(
+            (
+                '{"bucket": "test-s3-bucket", "key": "abcde-fghi-jklm-nopqrstuvwxyz", "compressed": true}',
+                {
+                    "attr": {"StringValue": "v", "DataType": "String"},
+                    "ORIGINAL_MESSAGE_SIZE": {"StringValue": str(len(test_message)), "DataType": "Number"},
+                },
+            ),
+            actual,
+        )
+        parts = sorted(
+            (call[1] for call in self.base.s3.upload_part.call_args_list), key=lambda part: part["PartNumber"]
+        )
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(test_message, gzip.decompress(b"".join(part["Body"] for part in parts)))
+        expected_parts = [
+            {"ETag": f'"{part["PartNumber"]}"', "PartNumber": part["PartNumber"]} for part in parts
+        ]
+        self.base.s3.complete_multipart_upload.assert_called_once_with(
+            Bucket="test-s3-bucket",
+            Key="abcde-fghi-jklm-nopqrstuvwxyz",
+            UploadId="test-upload-id",
+            MultipartUpload={"Parts": expected_parts},
+        )
+
+    def test_large_message_is_uploaded_in_parts(self, mock_uuid):
+        self.base._store_message_in_s3(b"x" * 250)
+
+        self.assertEqual(3, self.base.s3.upload_part.call_count)
+        self.base.s3.put_object.assert_not_called()
@@ -0,0 +1,28 @@
+import json
+import subprocess
+import sys
+from unittest import TestCase
+
+COLD_START_SCRIPT = """
+import json
+import sys
+
+from boto3_large_message_utils import LargeMessageBuilder, LargeMessageParser
+
+builder = LargeMessageBuilder(s3_bucket_for_cache="test-s3-bucket", compress=True)
+parser = LargeMessageParser()
+parser.parse(builder.build("a" * 300000))
+parser.parse(builder.build('{"hello": "world"}'))
+
+OPTIONAL_MODULES = ("boto3", "botocore", "asyncio", "zstandard", "lz4", "brotli", "orjson", "ujson")
+print(json.dumps(sorted(name for name in sys.modules if name.split(".")[0] in OPTIONAL_MODULES)))
+"""
+
+
+class TestColdStart(TestCase):
+    def test_optional_modules_are_not_imported_until_needed(self):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT], check=True, stdout=subprocess.PIPE
+        ).stdout
+
+        self.assertEqual([], json.loads(output))
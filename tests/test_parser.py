@@ -1,17 +1,30 @@
+import base64
 import gzip
 import io
-from unittest import TestCase
+import json
+import zlib
+from unittest import TestCase, skipUnless
 from unittest.mock import Mock
 
+from botocore.exceptions import ClientError
 from botocore.response import StreamingBody
 
-from boto3_large_message_utils.parser import LargeMessageParser
+from boto3_large_message_utils.exceptions import DecompressionError
+from boto3_large_message_utils.parser import LargeMessageParser, _get_prefetch_size, is_envelope
+from boto3_large_message_utils.utils.cache import PayloadCache
+from boto3_large_message_utils.utils.frames import encode_frames
+from boto3_large_message_utils.utils.metrics import TimingHistogram
+from boto3_large_message_utils.utils.serialization import get_available_json_backends
+from boto3_large_message_utils.utils.compression import (
+    compress_and_encode_string,
+    get_available_codecs,
+    train_compression_dictionary,
+)
 
 
 class TestRetrieveFromS3(TestCase):
     def setUp(self):
-        self.parser = LargeMessageParser()
-        self.parser.s3.get_object = Mock()
+        self.parser = LargeMessageParser(s3_client=Mock())
 
     def test_retrieve_message_from_s3(self):
         test_message = "this is a mock message"
@@ -41,6 +54,503 @@ class TestRetrieveFromS3(TestCase):
             Bucket="test-s3-bucket", Key="test-key"
         )
 
+    def test_retrieve_message_from_s3_with_codec(self):
+        test_message = "this is a mock message"
+        test_key = "test-key"
+
+        self.parser.s3.get_object.return_value = mock_s3_response(
+            zlib.compress(test_message.encode())
+        )
+
+        actual = self.parser._retrieve_message_from_s3("test-s3-bucket", test_key, True, "zlib")
+
+        self.assertEqual(test_message, actual)
+
+
+class TestParse(TestCase):
+    def setUp(self):
+        self.parser = LargeMessageParser(s3_client=Mock())
+
+    def test_gzip_compressed_message_without_codec_is_decompressed(self):
+        expected = "this is a test string"
+        actual = self.parser.parse(
+            '{"compressedMessage": "H4sIAK4TQF4C/yvJyCxWAKJEhZLU4hKF4pKizLx0ALXWhvwVAAAA"}'
+        )
+
+        self.assertEqual(expected, actual)
+
+    def test_compressed_message_with_codec_is_decompressed(self):
+        expected = "this is a test string"
+        actual = self.parser.parse(
+            '{"compressedMessage": "eJwrycgsVgCiRIWS1OISheKSosy8dABT6QfN", "codec": "zlib"}'
+        )
+
+        self.assertEqual(expected, actual)
+
+    def test_codec_is_passed_when_retrieving_from_s3(self):
+        self.parser.s3.get_object.return_value = mock_s3_response(zlib.compress(b"this is a mock message"))
+
+        expected = "this is a mock message"
+        actual = self.parser.parse(
+            '{"bucket": "test-s3-bucket", "key": "test-key", "compressed": true, "codec": "zlib"}'
+        )
+
+        self.assertEqual(expected, actual)
+
+
+class TestParseRange(TestCase):
+    def setUp(self):
+        self.parser = LargeMessageParser(s3_client=Mock())
+
+    def test_range_of_inline_message_is_returned(self):
+        actual = self.parser.parse_range(
+            '{"compressedMessage": "H4sIAK4TQF4C/yvJyCxWAKJEhZLU4hKF4pKizLx0ALXWhvwVAAAA"}', 10, 14
+        )
+
+        self.assertEqual(b"test", actual)
+        self.parser.s3.get_object.assert_not_called()
+
+    def test_range_of_uncompressed_object_is_requested(self):
+        self.parser.s3.get_object.return_value = mock_s3_response(b"mock")
+
+        actual = self.parser.parse_range('{"bucket": "test-s3-bucket", "key": "test-key", "compressed": false}', 10)
+
+        self.assertEqual(b"mock", actual)
+        self.parser.s3.get_object.assert_called_once_with(Bucket="test-s3-bucket", Key="test-key", Range="bytes=10-")
+
+    def test_compressed_object_is_retrieved_in_full(self):
+        self.parser.s3.get_object.return_value = mock_s3_response(gzip.compress(b"this is a mock message"))
+
+        actual = self.parser.parse_range('{"bucket": "test-s3-bucket", "key": "test-key", "compressed": true}', 0, 4)
+
+        self.assertEqual(b"this", actual)
+        self.parser.s3.get_object.assert_called_once_with(Bucket="test-s3-bucket", Key="test-key")
+
+    def test_empty_range_is_not_retrieved(self):
+        actual = self.parser.parse_range('{"bucket": "test-s3-bucket", "key": "test-key", "compressed": false}', 10, 10)
+
+        self.assertEqual(b"", actual)
+        self.parser.s3.get_object.assert_not_called()
+
+    def test_range_past_the_end_of_plain_message_is_empty(self):
+        self.assert_range_past_the_end_is_empty("this is a mock message")
+
+    def test_range_past_the_end_of_inline_message_is_empty(self):
+        self.assert_range_past_the_end_is_empty(
+            json.dumps({"compressedMessage": compress_and_encode_string("this is a mock message")})
+        )
+
+    def test_range_past_the_end_of_binary_message_is_empty(self):
+        self.assert_range_past_the_end_is_empty(
+            json.dumps({"binaryMessage": base64.b85encode(b"this is a mock message").decode(), "encoding": "base85"})
+        )
+
+    def test_range_past_the_end_of_uncompressed_object_is_empty(self):
+        self.assert_range_past_the_end_is_empty(
+            '{"bucket": "test-s3-bucket", "key": "test-key", "compressed": false}', b"this is a mock message"
+        )
+
+    def test_range_past_the_end_of_compressed_object_is_empty(self):
+        self.assert_range_past_the_end_is_empty(
+            '{"bucket": "test-s3-bucket", "key": "test-key", "compressed": true}',
+            gzip.compress(b"this is a mock message"),
+        )
+
+    def test_range_past_the_end_of_framed_object_is_empty(self):
+        self.assert_range_past_the_end_is_empty(
+            '{"bucket": "test-s3-bucket", "key": "test-key", "compressed": true, "frameSize": 8, "frames": 3}',
+            b"".join(encode_frames([b"this is a mock message"], 8, "gzip")),
+        )
+
+    def assert_range_past_the_end_is_empty(self, message, body=b""):
+        self.parser.s3.get_object.side_effect = mock_s3_object(body)
+
+        self.assertEqual(b"", self.parser.parse_range(message, 22))
+        self.assertEqual(b"", self.parser.parse_range(message, 100, 200))
+
+    def test_value_error_is_raised_for_invalid_range(self):
+        with self.assertRaises(ValueError):
+            self.parser.parse_range("plain message", -1)
+        with self.assertRaises(ValueError):
+            self.parser.parse_range("plain message", 5, 4)
+
+
+class TestEnvelopeDetection(TestCase):
+    def setUp(self):
+        self.parser = LargeMessageParser(s3_client=Mock())
+
+    def test_envelopes_are_recognised(self):
+        self.assertTrue(is_envelope('{"compressedMessage": "H4sI"}'))
+        self.assertTrue(is_envelope(' {\n  "bucket" : "test-s3-bucket", "key": "test-key"}'))
+        self.assertTrue(is_envelope(b'{"binaryMessage": "AAAA"}'))
+        self.assertFalse(is_envelope('{"content": "this is a test message", "bucket": "test-s3-bucket"}'))
+        self.assertFalse(is_envelope('["compressedMessage"]'))
+        self.assertFalse(is_envelope("this is a test message"))
+        self.assertFalse(is_envelope(b"\xff\xfe"))
+
+    def test_plain_json_message_is_not_parsed(self):
+        self.parser.json_backend = Mock()
+        test_message = json.dumps({"content": "a" * 1000})
+
+        self.assertEqual(test_message, self.parser.parse(test_message))
+        self.parser.json_backend.loads.assert_not_called()
+
+    def test_json_message_that_is_not_an_envelope_is_returned_unchanged(self):
+        test_message = '{"bucket": "my-bucket", "region": "eu-west-1"}'
+
+        self.assertEqual(test_message, self.parser.parse(test_message))
+        self.assertEqual("[1, 2, 3]", self.parser.parse("[1, 2, 3]"))
+
+    def test_parse_json_accepts_a_string(self):
+        test_message = json.dumps({"content": "this is a test message"})
+
+        self.assertEqual({"content": "this is a test message"}, self.parser.parse_json(test_message))
+        self.assertEqual(
+            {"content": "this is a test message"},
+            self.parser.parse_json(json.dumps({"compressedMessage": compress_and_encode_string(test_message)})),
+        )
+
+    def test_parse_json_parses_the_message_once(self):
+        self.parser.json_backend = Mock(loads=Mock(wraps=json.loads))
+
+        self.parser.parse_json(json.dumps({"content": "this is a test message"}))
+
+        self.parser.json_backend.loads.assert_called_once()
+
+
+@skipUnless("orjson" in get_available_json_backends(), "orjson is not installed")
+class TestParseWithJsonBackend(TestCase):
+    def setUp(self):
+        self.parser = LargeMessageParser(json_backend="orjson", cache=PayloadCache(), s3_client=Mock())
+
+    def test_payload_is_parsed_from_bytes(self):
+        self.parser.s3.get_object.return_value = mock_s3_response(b'{"hello": "world"}')
+        pointer = '{"bucket":"test-s3-bucket","key":"test-key","compressed":false}'
+
+        self.assertEqual({"hello": "world"}, self.parser.parse_json(pointer))
+        self.assertEqual('{"hello": "world"}', self.parser.parse(pointer))
+
+    def test_compressed_message_is_parsed(self):
+        actual = self.parser.parse_json({"compressedMessage": compress_and_encode_string('{"hello": "world"}')})
+
+        self.assertEqual({"hello": "world"}, actual)
+
+
+class TestParseBinary(TestCase):
+    def setUp(self):
+        self.parser = LargeMessageParser(s3_client=Mock())
+        self.test_message = bytes(range(256))
+
+    def test_binary_message_is_decoded(self):
+        actual = self.parser.parse(
+            json.dumps({"binaryMessage": base64.b85encode(self.test_message).decode(), "encoding": "base85"})
+        )
+
+        self.assertEqual(self.test_message, actual)
+
+    def test_compressed_binary_message_is_decompressed(self):
+        actual = self.parser.parse(
+            json.dumps(
+                {
+                    "compressedMessage": base64.b85encode(gzip.compress(self.test_message)).decode(),
+                    "encoding": "base85",
+                    "binary": True,
+                }
+            )
+        )
+
+        self.assertEqual(self.test_message, actual)
+
+    def test_binary_message_is_retrieved_from_s3(self):
+        self.parser.s3.get_object.return_value = mock_s3_response(gzip.compress(self.test_message))
+
+        actual = self.parser.parse(
+            '{"bucket": "test-s3-bucket", "key": "test-key", "compressed": true, "binary": true}'
+        )
+
+        self.assertEqual(self.test_message, actual)
+
+    def test_bytes_message_is_parsed(self):
+        actual = self.parser.parse(b'{"compressedMessage": "H4sIAK4TQF4C/yvJyCxWAKJEhZLU4hKF4pKizLx0ALXWhvwVAAAA"}')
+
+        self.assertEqual("this is a test string", actual)
+        self.assertEqual(self.test_message, self.parser.parse(self.test_message))
+
+    def test_binary_message_is_opened(self):
+        message = json.dumps({"binaryMessage": base64.b64encode(self.test_message).decode()})
+
+        with self.parser.open(message) as f:
+            self.assertEqual(self.test_message, f.read())
+
+
+@skipUnless("zstd" in get_available_codecs(), "zstandard is not installed")
+class TestParseWithCompressionDictionary(TestCase):
+    def setUp(self):
+        self.dictionary = train_compression_dictionary(
+            [json.dumps({"id": i, "status": "active", "name": f"name-{i}"}) for i in range(200)], size=4096
+        )
+        self.parser = LargeMessageParser(compression_dictionaries=[self.dictionary])
+
+    def test_message_compressed_with_dictionary_is_decompressed(self):
+        dictionary_id = list(self.parser.compression_dictionaries)[0]
+        test_message = json.dumps(
+            {
+                "compressedMessage": compress_and_encode_string(
+                    "this is a test string", codec="zstd", dictionary=self.dictionary
+                ),
+                "codec": "zstd",
+                "dictionary": dictionary_id,
+            }
+        )
+
+        self.assertEqual("this is a test string", self.parser.parse(test_message))
+
+    def test_decompression_error_is_raised_for_unknown_dictionary(self):
+        test_message = json.dumps(
+            {
+                "compressedMessage": compress_and_encode_string(
+                    "this is a test string", codec="zstd", dictionary=self.dictionary
+                ),
+                "codec": "zstd",
+                "dictionary": 1,
+            }
+        )
+
+        with self.assertRaises(DecompressionError):
+            self.parser.parse(test_message)
+
 
 def mock_s3_response(body):
     return {"Body": StreamingBody(io.BytesIO(body), len(body))}
+
+
+def mock_s3_object(body):
+    def get_object(Bucket, Key, Range=None):
+        if Range is None:
+            return mock_s3_response(body)
+        start, end = Range[len("bytes="):].split("-")
+        if not start:
+            return mock_s3_response(body[-int(end):])
+        if int(start) >= len(body):
+            raise ClientError({"Error": {"Code": "InvalidRange"}}, "GetObject")
+        return mock_s3_response(body[int(start):int(end) + 1 if end else None])
+
+    return get_object
+
+
+class TestParseWithCache(TestCase):
+    def setUp(self):
+        self.cache = PayloadCache()
+        self.parser = LargeMessageParser(cache=self.cache, s3_client=Mock())
+
+    def test_payload_is_downloaded_once(self):
+        test_message = '{"content": "this is a test message"}'
+        self.parser.s3.get_object.side_effect = lambda **kwargs: mock_s3_response(gzip.compress(test_message.encode()))
+        pointer = json.dumps({"bucket": "test-s3-bucket", "key": "test-key", "compressed": True})
+
+        self.assertEqual(test_message, self.parser.parse(pointer))
+        self.assertEqual(test_message, self.parser.parse(pointer))
+
+        self.parser.s3.get_object.assert_called_once_with(Bucket="test-s3-bucket", Key="test-key")
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+
+class TestParseMetrics(TestCase):
+    def setUp(self):
+        self.metrics = TimingHistogram()
+        self.parser = LargeMessageParser(metrics=self.metrics, cache=PayloadCache(), s3_client=Mock())
+
+    def test_paths_are_reported(self):
+        test_message = '{"content": "this is a test message"}'
+        self.parser.s3.get_object.return_value = mock_s3_response(gzip.compress(test_message.encode()))
+        pointer = json.dumps({"bucket": "test-s3-bucket", "key": "test-key", "compressed": True})
+
+        self.parser.parse("plain message")
+        self.parser.parse(json.dumps({"compressedMessage": compress_and_encode_string(test_message)}))
+        self.parser.parse(pointer)
+        self.parser.parse_json(json.loads(pointer))
+
+        self.assertEqual(
+            {
+                ("parse", "passthrough"): 1,
+                ("parse", "inline-compressed"): 1,
+                ("parse", "s3-retrieved"): 1,
+                ("parse", "cache-retrieved"): 1,
+            },
+            dict(self.metrics.paths),
+        )
+        self.assertEqual(1, self.metrics.histograms[("parse", "s3")].count)
+        self.assertEqual(2, self.metrics.histograms[("parse", "decompression")].count)
+
+    def test_s3_error_is_logged_and_reported(self):
+        self.parser.s3.get_object.side_effect = RuntimeError("S3 is unavailable")
+
+        with self.assertLogs("boto3_large_message_utils.parser", level="ERROR"):
+            with self.assertRaises(RuntimeError):
+                self.parser.parse(json.dumps({"bucket": "test-s3-bucket", "key": "test-key", "compressed": False}))
+
+        self.assertEqual(1, self.metrics.errors["parse"])
+
+
+class TestOpen(TestCase):
+    def setUp(self):
+        self.parser = LargeMessageParser(s3_client=Mock())
+
+    def test_message_in_s3_is_streamed(self):
+        test_message = '{"content": "this is a test message"}' * 100
+        self.parser.s3.get_object.return_value = mock_s3_response(test_message.encode())
+
+        with self.parser.open(json.dumps({"bucket": "test-s3-bucket", "key": "test-key", "compressed": False})) as f:
+            self.assertEqual(test_message.encode()[:10], f.read(10))
+            self.assertEqual(test_message.encode()[10:], f.read())
+
+        self.parser.s3.get_object.assert_called_with(Bucket="test-s3-bucket", Key="test-key")
+
+    def test_compressed_message_in_s3_is_decompressed_on_the_fly(self):
+        test_message = '{"content": "this is a test message"}' * 100
+        self.parser.s3.get_object.return_value = mock_s3_response(zlib.compress(test_message.encode()))
+
+        with self.parser.open(
+            json.dumps({"bucket": "test-s3-bucket", "key": "test-key", "compressed": True, "codec": "zlib"})
+        ) as f:
+            self.assertEqual(test_message.encode(), f.read())
+
+    def test_inline_compressed_message_is_opened(self):
+        test_message = '{"content": "this is a test message"}'
+
+        with self.parser.open(json.dumps({"compressedMessage": compress_and_encode_string(test_message)})) as f:
+            self.assertEqual(test_message.encode(), f.read())
+
+        self.parser.s3.get_object.assert_not_called()
+
+    def test_plain_message_is_opened(self):
+        for test_message in ["this is a plain message", '{"content": "this is a test message"}']:
+            with self.parser.open(test_message) as f:
+                self.assertEqual(test_message.encode(), f.read())
+
+    def test_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            self.parser.open(1)
+
+
+class TestParseBatch(TestCase):
+    def setUp(self):
+        self.parser = LargeMessageParser(s3_client=Mock())
+
+    def test_messages_are_parsed_in_order(self):
+        self.parser.s3.get_object.side_effect = lambda Bucket, Key: mock_s3_response(
+            f"message from {Key}".encode()
+        )
+        messages = [
+            {"MessageId": "1", "Body": '{"bucket": "test-s3-bucket", "key": "first", "compressed": false}'},
+            {"MessageId": "2", "Body": "plain message"},
+            {"MessageId": "3", "Body": '{"bucket": "test-s3-bucket", "key": "third", "compressed": false}'},
+        ]
+
+        expected = [
+            {"MessageId": "1", "Body": "message from first"},
+            {"MessageId": "2", "Body": "plain message"},
+            {"MessageId": "3", "Body": "message from third"},
+        ]
+        actual = self.parser.parse_batch(messages)
+
+        self.assertEqual(expected, actual)
+        self.assertEqual(
+            '{"bucket": "test-s3-bucket", "key": "first", "compressed": false}', messages[0]["Body"]
+        )
+
+    def test_failures_are_reported_per_message(self):
+        error = Exception("S3 is unavailable")
+        self.parser.s3.get_object.side_effect = error
+        messages = [
+            {"MessageId": "1", "Body": '{"bucket": "test-s3-bucket", "key": "first", "compressed": false}'},
+            {"MessageId": "2", "Body": "plain message"},
+        ]
+
+        actual = self.parser.parse_batch(messages)
+
+        self.assertIs(error, actual[0]["Error"])
+        self.assertEqual(messages[0]["Body"], actual[0]["Body"])
+        self.assertEqual({"MessageId": "2", "Body": "plain message"}, actual[1])
+
+    def test_offloaded_attributes_are_restored(self):
+        self.parser.s3.get_object.return_value = mock_s3_response(
+            b'{"trace": {"StringValue": "abc", "DataType": "String"}}'
+        )
+        reference = {"StringValue": '{"bucket": "test-s3-bucket", "key": "attributes"}', "DataType": "String"}
+        messages = [
+            {
+                "MessageId": "1",
+                "Body": "plain message",
+                "MessageAttributes": {
+                    "tenant": {"StringValue": "test", "DataType": "String"},
+                    "OFFLOADED_MESSAGE_ATTRIBUTES": reference,
+                },
+            }
+        ]
+
+        actual = self.parser.parse_batch(messages)
+
+        self.assertEqual(
+            {
+                "tenant": {"StringValue": "test", "DataType": "String"},
+                "trace": {"StringValue": "abc", "DataType": "String"},
+            },
+            actual[0]["MessageAttributes"],
+        )
+        self.parser.s3.get_object.assert_called_once_with(Bucket="test-s3-bucket", Key="attributes")
+        self.assertIn("OFFLOADED_MESSAGE_ATTRIBUTES", messages[0]["MessageAttributes"])
+
+    def test_attributes_without_a_reference_are_returned(self):
+        message_attributes = {"tenant": {"StringValue": "test", "DataType": "String"}}
+
+        self.assertIs(message_attributes, self.parser.parse_attributes(message_attributes))
+        self.parser.s3.get_object.assert_not_called()
+
+    def test_empty_batch(self):
+        self.assertEqual([], self.parser.parse_batch([]))
+
+    def test_messages_are_prefetched_in_order(self):
+        self.parser.s3.get_object.side_effect = lambda Bucket, Key: mock_s3_response(
+            f"message from {Key}".encode()
+        )
+        messages = (
+            {"MessageId": str(index), "Body": f'{{"bucket": "test-s3-bucket", "key": "{index}", "compressed": false}}'}
+            for index in range(10)
+        )
+
+        actual = [message["Body"] for message in self.parser.iter_parse(messages, prefetch_depth=3)]
+
+        self.assertEqual([f"message from {index}" for index in range(10)], actual)
+
+    def test_prefetched_bodies_are_parsed(self):
+        self.parser.s3.get_object.return_value = mock_s3_response(b"this is a mock message")
+
+        actual = list(
+            self.parser.iter_parse(
+                ["plain message", '{"bucket": "test-s3-bucket", "key": "first", "compressed": false}']
+            )
+        )
+
+        self.assertEqual(["plain message", "this is a mock message"], actual)
+
+    def test_prefetch_size_is_read_from_the_original_message_size(self):
+        message = {
+            "Body": '{"bucket": "test-s3-bucket", "key": "first", "compressed": false}',
+            "MessageAttributes": {"ORIGINAL_MESSAGE_SIZE": {"StringValue": "1048576", "DataType": "Number"}},
+        }
+
+        self.assertEqual(1048576, _get_prefetch_size(message))
+        self.assertEqual(13, _get_prefetch_size({"Body": "plain message"}))
+        self.assertEqual(13, _get_prefetch_size("plain message"))
+
+    def test_value_error_is_raised_for_invalid_prefetch_arguments(self):
+        with self.assertRaises(ValueError):
+            self.parser.iter_parse([], prefetch_depth=-1)
+        with self.assertRaises(ValueError):
+            self.parser.iter_parse([], prefetch_memory="64MiB")
+
+    def test_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            self.parser.parse_batch(["this method only supports message dicts"])
@@ -0,0 +1,46 @@
+import json
+from unittest import TestCase
+
+from boto3_large_message_utils.utils.attributes import (
+    decode_message_attributes,
+    encode_message_attributes,
+    get_offloaded_attributes_reference,
+    read_offloaded_attributes_reference,
+)
+
+
+class TestEncodeMessageAttributes(TestCase):
+    def test_attributes_are_restored(self):
+        message_attributes = {
+            "tenant": {"StringValue": "test", "DataType": "String"},
+            "payload": {"BinaryValue": b"\x00\xff", "DataType": "Binary"},
+        }
+
+        actual = decode_message_attributes(encode_message_attributes(message_attributes))
+
+        self.assertEqual(message_attributes, actual)
+
+    def test_string_binary_value_is_restored_as_bytes(self):
+        actual = decode_message_attributes(
+            encode_message_attributes({"payload": {"BinaryValue": "abc", "DataType": "Binary"}})
+        )
+
+        self.assertEqual(b"abc", actual["payload"]["BinaryValue"])
+
+    def test_value_error_is_raised_if_attributes_are_not_a_dict(self):
+        with self.assertRaises(ValueError):
+            encode_message_attributes("test")
+
+
+class TestOffloadedAttributesReference(TestCase):
+    def test_reference_is_read(self):
+        reference = get_offloaded_attributes_reference("test-s3-bucket", "test-key")
+
+        actual = read_offloaded_attributes_reference({"OFFLOADED_MESSAGE_ATTRIBUTES": reference})
+
+        self.assertEqual("String", reference["DataType"])
+        self.assertEqual({"bucket": "test-s3-bucket", "key": "test-key"}, json.loads(reference["StringValue"]))
+        self.assertEqual(("test-s3-bucket", "test-key"), actual)
+
+    def test_none_is_returned_without_a_reference(self):
+        self.assertIsNone(read_offloaded_attributes_reference({"tenant": {"StringValue": "a", "DataType": "String"}}))
@@ -0,0 +1,89 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from boto3_large_message_utils.utils.cache import PayloadCache
+
+
+class TestPayloadCache(TestCase):
+    def test_payload_is_returned_on_hit(self):
+        cache = PayloadCache()
+        cache.put("test-s3-bucket", "test-key", "this is a test message")
+
+        self.assertEqual("this is a test message", cache.get("test-s3-bucket", "test-key"))
+        self.assertIsNone(cache.get("test-s3-bucket", "other-key"))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_least_recently_used_payload_is_evicted(self):
+        cache = PayloadCache(max_size=10)
+        cache.put("test-s3-bucket", "first", "aaaa")
+        cache.put("test-s3-bucket", "second", "bbbb")
+        cache.get("test-s3-bucket", "first")
+        cache.put("test-s3-bucket", "third", "cccc")
+
+        self.assertEqual("aaaa", cache.get("test-s3-bucket", "first"))
+        self.assertIsNone(cache.get("test-s3-bucket", "second"))
+        self.assertEqual(1, cache.evictions)
+        self.assertEqual(8, cache.size)
+
+    def test_payload_larger_than_cache_is_not_stored(self):
+        cache = PayloadCache(max_size=4)
+        cache.put("test-s3-bucket", "test-key", "this is a test message")
+
+        self.assertIsNone(cache.get("test-s3-bucket", "test-key"))
+        self.assertEqual(0, cache.size)
+
+    def test_evicted_payload_is_spilled_to_disk(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = PayloadCache(max_size=4, directory=directory)
+            cache.put("test-s3-bucket", "first", "aaaa")
+            cache.put("test-s3-bucket", "second", "bbbb")
+
+            self.assertEqual(1, len(os.listdir(directory)))
+            self.assertEqual("aaaa", cache.get("test-s3-bucket", "first"))
+            self.assertEqual(2, len(cache))
+
+            cache.clear()
+
+            self.assertEqual([], os.listdir(directory))
+            self.assertIsNone(cache.get("test-s3-bucket", "first"))
+
+    def test_disk_size_is_bounded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = PayloadCache(max_size=0, directory=directory, max_disk_size=8)
+            for key in ["first", "second", "third"]:
+                cache.put("test-s3-bucket", key, "abcd")
+
+            self.assertIsNone(cache.get("test-s3-bucket", "first"))
+            self.assertEqual("abcd", cache.get("test-s3-bucket", "third"))
+            self.assertEqual(8, cache.disk_size)
+            self.assertEqual(1, cache.evictions)
+
+    def test_binary_payload_is_returned_as_bytes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = PayloadCache(max_size=4, directory=directory)
+            cache.put("test-s3-bucket", "first", b"\xff\xfe\x00\x01")
+            cache.put("test-s3-bucket", "second", "bbbb")
+            cache.put("test-s3-bucket", "third", b"cccc")
+
+            self.assertEqual(b"\xff\xfe\x00\x01", cache.get("test-s3-bucket", "first"))
+            self.assertEqual("bbbb", cache.get("test-s3-bucket", "second"))
+            self.assertEqual(b"cccc", cache.get("test-s3-bucket", "third"))
+
+    def test_failed_spill_is_counted_as_an_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = PayloadCache(max_size=4, directory=directory)
+            cache.put("test-s3-bucket", "first", "aaaa")
+            with patch("builtins.open", side_effect=OSError("No space left on device")):
+                cache.put("test-s3-bucket", "second", "bbbb")
+
+            self.assertIsNone(cache.get("test-s3-bucket", "first"))
+            self.assertEqual("bbbb", cache.get("test-s3-bucket", "second"))
+            self.assertEqual(1, cache.evictions)
+            self.assertEqual(0, cache.disk_size)
+
+    def test_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            PayloadCache(max_size="64MB")
@@ -0,0 +1,74 @@
+import gc
+from unittest import TestCase
+from unittest.mock import Mock
+
+from boto3_large_message_utils.utils import client
+from boto3_large_message_utils.utils.client import clear_s3_clients, create_s3_client_config, get_s3_client
+
+
+class TestCreateS3ClientConfig(TestCase):
+    def test_tunables_are_applied(self):
+        config = create_s3_client_config(
+            max_pool_connections=100,
+            retry_mode="adaptive",
+            max_attempts=5,
+            connect_timeout=2,
+            read_timeout=10,
+            tcp_keepalive=True,
+        )
+
+        self.assertEqual(100, config.max_pool_connections)
+        self.assertEqual({"mode": "adaptive", "max_attempts": 5}, config.retries)
+        self.assertEqual(2, config.connect_timeout)
+        self.assertEqual(10, config.read_timeout)
+        self.assertTrue(config.tcp_keepalive)
+
+    def test_unset_tunables_keep_botocore_defaults(self):
+        config = create_s3_client_config()
+
+        self.assertEqual(50, config.max_pool_connections)
+        self.assertIsNone(config.retries)
+
+    def test_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            create_s3_client_config(max_pool_connections=0)
+
+
+class TestGetS3Client(TestCase):
+    def setUp(self):
+        self.session = Mock()
+        self.session.client.side_effect = lambda *args, **kwargs: Mock()
+
+    def tearDown(self):
+        clear_s3_clients()
+
+    def test_client_is_shared(self):
+        client = get_s3_client(self.session, max_pool_connections=20)
+
+        self.assertIs(client, get_s3_client(self.session, max_pool_connections=20))
+        self.session.client.assert_called_once()
+        self.assertEqual("s3", self.session.client.call_args[0][0])
+        self.assertEqual(20, self.session.client.call_args[1]["config"].max_pool_connections)
+
+    def test_different_options_use_different_clients(self):
+        self.assertIsNot(get_s3_client(self.session), get_s3_client(self.session, read_timeout=5))
+
+    def test_clients_are_released_with_their_session(self):
+        get_s3_client(self.session)
+
+        del self.session
+        gc.collect()
+
+        self.assertEqual(0, len(client._S3_CLIENTS))
+
+    def test_least_recently_used_client_is_evicted(self):
+        first = get_s3_client(self.session, read_timeout=0)
+        for read_timeout in range(1, client.MAX_SHARED_S3_CLIENTS + 1):
+            get_s3_client(self.session, read_timeout=read_timeout)
+
+        self.assertIsNot(first, get_s3_client(self.session, read_timeout=0))
+        self.assertEqual(client.MAX_SHARED_S3_CLIENTS, len(client._S3_CLIENTS[self.session]))
+
+    def test_value_error_is_raised_for_unknown_option(self):
+        with self.assertRaises(ValueError):
+            get_s3_client(self.session, pool_size=20)
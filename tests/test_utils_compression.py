@@ -1,11 +1,26 @@
-from unittest import TestCase
-from unittest.mock import patch
+from unittest import TestCase, skipUnless
+from unittest.mock import Mock, patch
 
+import io
+import json
+
+from boto3_large_message_utils.exceptions import CompressionError, DecompressionError
+from boto3_large_message_utils.utils import compression
 from boto3_large_message_utils.utils.compression import (
     compress_and_encode_string,
+    compress_chunks,
     compress_string,
     decode_and_decompress_string,
+    decode_string,
+    decompress_bytes,
     decompress_string,
+    encode_bytes,
+    get_available_codecs,
+    get_codec,
+    get_compression_dictionary_id,
+    open_decompressing_stream,
+    register_codec,
+    train_compression_dictionary,
 )
 
 
@@ -18,6 +33,12 @@ class TestCompressString(TestCase):
             "this is a test message".encode("utf-8")
         )
 
+    @patch("boto3_large_message_utils.utils.compression.gzip.compress")
+    def test_bytes_are_compressed_without_encoding(self, mock_gzip_compress):
+        compress_string(b"this is a test message")
+
+        mock_gzip_compress.assert_called_once_with(b"this is a test message")
+
     def test_value_error_is_raised(self):
         with self.assertRaises(ValueError):
             compress_string({"msg": "this method only supports strings"})
@@ -66,3 +87,246 @@ class TestDecodeAndDecompressString(TestCase):
     def test_value_error_is_raised(self):
         with self.assertRaises(ValueError):
             compress_string({"msg": "this method only supports strings"})
+
+
+class TestInlineEncodings(TestCase):
+    def test_base85_round_trips(self):
+        data = bytes(range(256)) * 4
+
+        encoded = encode_bytes(data, "base85")
+
+        self.assertLess(len(encoded), len(encode_bytes(data)))
+        self.assertEqual(data, decode_string(encoded, "base85"))
+        self.assertEqual(json.dumps(encoded)[1:-1], encoded)
+
+    def test_compressed_string_round_trips_with_base85(self):
+        encoded = compress_and_encode_string("this is a test string", encoding="base85")
+
+        self.assertEqual("this is a test string", decode_and_decompress_string(encoded, encoding="base85"))
+
+    def test_decompress_bytes_returns_bytes(self):
+        data = bytes(range(256))
+
+        self.assertEqual(data, decompress_bytes(compress_string(data)))
+
+    def test_invalid_encoded_string_raises_decompression_error(self):
+        with self.assertRaises(DecompressionError):
+            decode_string("not base64!", "base64")
+
+    def test_value_error_is_raised_for_unknown_encoding(self):
+        with self.assertRaises(ValueError):
+            encode_bytes(b"data", "base32")
+
+
+class TestCodecs(TestCase):
+    def test_builtin_codecs_are_available(self):
+        self.assertIn("gzip", get_available_codecs())
+        self.assertIn("zlib", get_available_codecs())
+
+    def test_value_error_is_raised_for_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec("unknown")
+
+    def test_registered_codec_is_used(self):
+        register_codec("reverse", lambda data, level: data[::-1], lambda data: data[::-1])
+
+        self.assertEqual(b"egassem", compress_string("message", codec="reverse"))
+        self.assertEqual("message", decompress_string(b"egassem", codec="reverse"))
+
+    def test_optional_codec_is_loaded_on_first_use(self):
+        load = Mock(side_effect=lambda: register_codec("optional", lambda data, level: data, lambda data: data))
+
+        with patch.dict(compression._OPTIONAL_CODECS.loaders, {"optional": load}):
+            load.assert_not_called()
+            self.assertEqual("optional", get_codec("optional").name)
+            get_codec("optional")
+
+        load.assert_called_once()
+
+    def test_value_error_is_raised_for_optional_codec_that_is_not_installed(self):
+        with patch.dict(compression._OPTIONAL_CODECS.loaders, {"missing": Mock(side_effect=ImportError)}):
+            with self.assertRaises(ValueError):
+                get_codec("missing")
+
+    @patch("boto3_large_message_utils.utils.compression.gzip.compress")
+    def test_compression_level_is_passed_to_codec(self, mock_gzip_compress):
+        compress_string("this is a test message", level=1)
+
+        mock_gzip_compress.assert_called_once_with(b"this is a test message", compresslevel=1)
+
+    def test_decompression_error_is_raised_for_wrong_codec(self):
+        with self.assertRaises(DecompressionError):
+            decompress_string(compress_string("this is a test message", codec="zlib"), codec="gzip")
+
+    def test_zlib_round_trip(self):
+        self.assert_round_trip("zlib")
+
+    @skipUnless("zstd" in get_available_codecs(), "zstandard is not installed")
+    def test_zstd_round_trip(self):
+        self.assert_round_trip("zstd")
+
+    @skipUnless("zstd" in get_available_codecs(), "zstandard is not installed")
+    def test_decompression_error_is_raised_for_truncated_zstd_frame(self):
+        compressed = compress_string("this is a test message" * 100, codec="zstd")
+
+        with self.assertRaises(DecompressionError):
+            decompress_string(compressed[:-4], codec="zstd")
+
+    @skipUnless("lz4" in get_available_codecs(), "lz4 is not installed")
+    def test_lz4_round_trip(self):
+        self.assert_round_trip("lz4")
+
+    @skipUnless("brotli" in get_available_codecs(), "brotli is not installed")
+    def test_brotli_round_trip(self):
+        self.assert_round_trip("brotli")
+
+    def test_gzip_chunks_round_trip(self):
+        self.assert_chunks_round_trip("gzip")
+
+    def test_zlib_chunks_round_trip(self):
+        self.assert_chunks_round_trip("zlib")
+
+    @skipUnless("zstd" in get_available_codecs(), "zstandard is not installed")
+    def test_zstd_chunks_round_trip(self):
+        self.assert_chunks_round_trip("zstd")
+
+    @skipUnless("lz4" in get_available_codecs(), "lz4 is not installed")
+    def test_lz4_chunks_round_trip(self):
+        self.assert_chunks_round_trip("lz4")
+
+    @skipUnless("brotli" in get_available_codecs(), "brotli is not installed")
+    def test_brotli_chunks_round_trip(self):
+        self.assert_chunks_round_trip("brotli")
+
+    def test_value_error_is_raised_for_codec_without_streaming(self):
+        register_codec("reverse", lambda data, level: data[::-1], lambda data: data[::-1])
+
+        with self.assertRaises(ValueError):
+            list(compress_chunks([b"message"], codec="reverse"))
+        with self.assertRaises(ValueError):
+            open_decompressing_stream(io.BytesIO(b"egassem"), codec="reverse")
+
+    def test_gzip_stream_round_trip(self):
+        self.assert_stream_round_trip("gzip")
+
+    def test_zlib_stream_round_trip(self):
+        self.assert_stream_round_trip("zlib")
+
+    @skipUnless("zstd" in get_available_codecs(), "zstandard is not installed")
+    def test_zstd_stream_round_trip(self):
+        self.assert_stream_round_trip("zstd")
+
+    @skipUnless("lz4" in get_available_codecs(), "lz4 is not installed")
+    def test_lz4_stream_round_trip(self):
+        self.assert_stream_round_trip("lz4")
+
+    @skipUnless("brotli" in get_available_codecs(), "brotli is not installed")
+    def test_brotli_stream_round_trip(self):
+        self.assert_stream_round_trip("brotli")
+
+    def test_decompression_error_is_raised_for_corrupt_stream(self):
+        stream = open_decompressing_stream(io.BytesIO(b"not compressed"), codec="gzip")
+
+        with self.assertRaises(DecompressionError):
+            stream.read()
+
+    def test_decompression_error_is_raised_for_truncated_gzip_stream(self):
+        self.assert_truncated_stream_is_rejected("gzip")
+
+    def test_decompression_error_is_raised_for_truncated_zlib_stream(self):
+        self.assert_truncated_stream_is_rejected("zlib")
+
+    @skipUnless("zstd" in get_available_codecs(), "zstandard is not installed")
+    def test_decompression_error_is_raised_for_truncated_zstd_stream(self):
+        self.assert_truncated_stream_is_rejected("zstd")
+
+    @skipUnless("lz4" in get_available_codecs(), "lz4 is not installed")
+    def test_decompression_error_is_raised_for_truncated_lz4_stream(self):
+        self.assert_truncated_stream_is_rejected("lz4")
+
+    @skipUnless("brotli" in get_available_codecs(), "brotli is not installed")
+    def test_decompression_error_is_raised_for_truncated_brotli_stream(self):
+        self.assert_truncated_stream_is_rejected("brotli")
+
+    def assert_truncated_stream_is_rejected(self, codec):
+        compressed = compress_string(b"this is a test message" * 100, codec=codec)
+
+        with self.assertRaises(DecompressionError):
+            open_decompressing_stream(io.BytesIO(compressed[:-4]), codec=codec).read()
+
+    def assert_stream_round_trip(self, codec):
+        lines = [f'{{"content": "this is test message {i}"}}\n'.encode() for i in range(1000)]
+        compressed = compress_string(b"".join(lines), codec=codec)
+
+        with open_decompressing_stream(io.BytesIO(compressed), codec=codec, chunk_size=64) as stream:
+            self.assertEqual(lines[0], stream.readline())
+            self.assertEqual(lines[1][:10], stream.read(10))
+            self.assertEqual(b"".join(lines)[len(lines[0]) + 10:], stream.read())
+
+    def assert_chunks_round_trip(self, codec):
+        chunks = [f'{{"content": "this is test message {i}"}}'.encode() for i in range(100)]
+
+        actual = decompress_string(b"".join(compress_chunks(iter(chunks), codec=codec)), codec=codec)
+
+        self.assertEqual(b"".join(chunks).decode(), actual)
+
+    def assert_round_trip(self, codec):
+        test_message = '{"content": "this is a test message"}' * 10
+
+        self.assertEqual(
+            test_message, decompress_string(compress_string(test_message, codec=codec), codec=codec)
+        )
+        self.assertEqual(
+            test_message,
+            decode_and_decompress_string(compress_and_encode_string(test_message, codec=codec), codec=codec),
+        )
+
+
+def sample_messages(count=200):
+    return [
+        json.dumps({"id": i, "customer": {"name": f"name-{i}", "email": f"user{i}@example.com"}, "status": "active"})
+        for i in range(count)
+    ]
+
+
+@skipUnless("zstd" in get_available_codecs(), "zstandard is not installed")
+class TestCompressionDictionary(TestCase):
+    def setUp(self):
+        self.dictionary = train_compression_dictionary(sample_messages(), size=4096)
+
+    def test_trained_dictionary_improves_compression(self):
+        test_message = sample_messages()[7]
+
+        self.assertLess(
+            len(compress_string(test_message, codec="zstd", dictionary=self.dictionary)),
+            len(compress_string(test_message, codec="zstd")),
+        )
+
+    def test_dictionary_round_trip(self):
+        test_message = sample_messages()[7]
+
+        actual = decode_and_decompress_string(
+            compress_and_encode_string(test_message, codec="zstd", dictionary=self.dictionary),
+            codec="zstd",
+            dictionary=self.dictionary,
+        )
+
+        self.assertEqual(test_message, actual)
+
+    def test_dictionary_id_is_returned(self):
+        self.assertIsInstance(get_compression_dictionary_id(self.dictionary), int)
+
+    def test_value_error_is_raised_for_codec_without_dictionary_support(self):
+        with self.assertRaises(ValueError):
+            get_compression_dictionary_id(self.dictionary, codec="gzip")
+
+    def test_dictionary_stream_round_trip(self):
+        test_message = sample_messages()[7]
+        compressed = compress_string(test_message, codec="zstd", dictionary=self.dictionary)
+
+        with open_decompressing_stream(io.BytesIO(compressed), codec="zstd", dictionary=self.dictionary) as stream:
+            self.assertEqual(test_message.encode(), stream.read())
+
+    def test_compression_error_is_raised_for_too_few_samples(self):
+        with self.assertRaises(CompressionError):
+            train_compression_dictionary(sample_messages(3), size=4096)
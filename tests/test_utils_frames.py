@@ -0,0 +1,76 @@
+import io
+import os
+from unittest import TestCase
+
+from boto3_large_message_utils.exceptions import DecompressionError
+from boto3_large_message_utils.utils.frames import (
+    FramedReader,
+    decode_frames,
+    encode_frames,
+    get_frame_count,
+    get_frame_span,
+    split_frame_index,
+)
+
+
+class TestFrames(TestCase):
+    def setUp(self):
+        self.message = os.urandom(1000).hex().encode()
+
+    def test_frames_are_restored(self):
+        for codec in (None, "gzip"):
+            body = b"".join(encode_frames([self.message], 300, codec))
+
+            frames_body, offsets = split_frame_index(body, get_frame_count(len(self.message), 300))
+
+            self.assertEqual(7, len(offsets) - 1)
+            self.assertEqual(self.message, decode_frames(frames_body, offsets, codec))
+
+    def test_range_of_frames_is_decoded(self):
+        body = b"".join(encode_frames([self.message], 300, "gzip"))
+        _, offsets = split_frame_index(body, 7)
+
+        actual = decode_frames(body[offsets[2]:offsets[4]], offsets[2:5], "gzip")
+
+        self.assertEqual(self.message[600:1200], actual)
+
+    def test_chunks_are_split_into_frames(self):
+        body = b"".join(encode_frames([b"abc", b"defg", b"h"], 3))
+
+        self.assertEqual(b"abcdefgh" + b"\x00\x00\x00\x03\x00\x00\x00\x03\x00\x00\x00\x02", body)
+
+    def test_empty_message_has_no_frames(self):
+        body = b"".join(encode_frames([], 300))
+
+        self.assertEqual(b"", body)
+        self.assertEqual((b"", [0]), split_frame_index(body, 0))
+
+    def test_truncated_index_raises(self):
+        with self.assertRaises(DecompressionError):
+            split_frame_index(b"abc", 1)
+
+    def test_frame_span(self):
+        self.assertEqual((0, 1), get_frame_span(300, 7, 0, 10))
+        self.assertEqual((1, 3), get_frame_span(300, 7, 300, 900))
+        self.assertEqual((2, 7), get_frame_span(300, 7, 600))
+        self.assertEqual((7, 7), get_frame_span(300, 7, 5000, 6000))
+
+
+class TestFramedReader(TestCase):
+    def test_frames_are_read_when_needed(self):
+        message = os.urandom(1000).hex().encode()
+        body, offsets = split_frame_index(b"".join(encode_frames([message], 300, "gzip")), 7)
+        source = io.BytesIO(body)
+
+        stream = io.BufferedReader(FramedReader(source, offsets, "gzip"), buffer_size=100)
+
+        self.assertEqual(message[:400], stream.read(400))
+        self.assertEqual(offsets[2], source.tell())
+        self.assertEqual(message[400:], stream.read())
+        self.assertEqual(len(body), source.tell())
+
+    def test_decompression_error_is_raised_for_truncated_frame(self):
+        body, offsets = split_frame_index(b"".join(encode_frames([b"a" * 1000], 300, "gzip")), 4)
+
+        with self.assertRaises(DecompressionError):
+            io.BufferedReader(FramedReader(io.BytesIO(body[:-5]), offsets, "gzip")).read()
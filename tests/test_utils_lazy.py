@@ -0,0 +1,35 @@
+from unittest import TestCase
+from unittest.mock import Mock
+
+from boto3_large_message_utils.utils.lazy import OptionalLoaders
+
+
+class TestOptionalLoaders(TestCase):
+    def setUp(self):
+        self.registry = {}
+        self.load = Mock(side_effect=lambda: self.registry.update(optional=object()))
+        self.loaders = OptionalLoaders({"optional": self.load, "missing": Mock(side_effect=ImportError)}, self.registry)
+
+    def test_package_is_only_loaded_once(self):
+        self.assertTrue(self.loaders.load("optional"))
+        self.assertTrue(self.loaders.load("optional"))
+
+        self.load.assert_called_once()
+
+    def test_missing_package_is_not_available(self):
+        self.assertFalse(self.loaders.load("missing"))
+        self.assertFalse(self.loaders.load("missing"))
+
+    def test_entry_registered_beforehand_is_kept(self):
+        self.registry["optional"] = "registered"
+
+        self.assertTrue(self.loaders.load("optional"))
+
+        self.load.assert_not_called()
+        self.assertEqual("registered", self.registry["optional"])
+
+    def test_every_package_is_loaded(self):
+        self.loaders.load_all()
+
+        self.assertEqual(["optional"], sorted(self.registry))
+        self.assertEqual({}, self.loaders.loaders)
@@ -0,0 +1,103 @@
+from unittest import TestCase
+
+from boto3_large_message_utils.utils.metrics import (
+    INLINE_COMPRESSED,
+    MessageMetrics,
+    SpanAdapter,
+    TimingHistogram,
+)
+
+
+class RecordingSpan:
+    def __init__(self, name, start_time):
+        self.name = name
+        self.start_time = start_time
+        self.attributes = {}
+        self.exceptions = []
+        self.end_time = None
+
+    def set_attribute(self, name, value):
+        self.attributes[name] = value
+
+    def record_exception(self, exception):
+        self.exceptions.append(exception)
+
+    def end(self, end_time=None):
+        self.end_time = end_time
+
+
+class RecordingTracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, start_time=None):
+        self.spans.append(RecordingSpan(name, start_time))
+        return self.spans[-1]
+
+
+def finished_metrics(error=None):
+    metrics = MessageMetrics("build")
+    metrics.path = INLINE_COMPRESSED
+    metrics.message_size = 1000
+    metrics.compressed_size = 250
+    with metrics.measure("compression"):
+        pass
+    metrics.finish(error)
+    return metrics
+
+
+class TestMessageMetrics(TestCase):
+    def test_compression_ratio(self):
+        self.assertEqual(0.25, finished_metrics().compression_ratio)
+        self.assertIsNone(MessageMetrics("build").compression_ratio)
+
+    def test_durations_are_accumulated(self):
+        metrics = MessageMetrics("build")
+        with metrics.measure("s3"):
+            pass
+        first = metrics.durations["s3"]
+        with metrics.measure("s3"):
+            pass
+
+        self.assertGreaterEqual(metrics.durations["s3"], first)
+
+    def test_to_dict_skips_missing_values(self):
+        actual = MessageMetrics("parse").to_dict()
+
+        self.assertEqual({"operation": "parse", "path": "passthrough"}, actual)
+
+    def test_to_dict(self):
+        actual = finished_metrics().to_dict()
+
+        self.assertEqual("inline-compressed", actual["path"])
+        self.assertEqual(0.25, actual["compression_ratio"])
+        self.assertIn("compression_duration", actual)
+        self.assertIn("duration", actual)
+
+
+class TestTimingHistogram(TestCase):
+    def test_paths_and_durations_are_recorded(self):
+        histogram = TimingHistogram(buckets=(0.5, 1))
+        histogram.message_finished(finished_metrics())
+        histogram.message_finished(finished_metrics(ValueError("failed")))
+
+        self.assertEqual(2, histogram.paths[("build", "inline-compressed")])
+        self.assertEqual(1, histogram.errors["build"])
+        self.assertEqual(2, histogram.histograms[("build", "total")].count)
+        self.assertEqual([2, 0, 0], histogram.histograms[("build", "compression")].bucket_counts)
+
+
+class TestSpanAdapter(TestCase):
+    def test_span_is_recorded(self):
+        tracer = RecordingTracer()
+        metrics = finished_metrics(ValueError("failed"))
+
+        SpanAdapter(tracer).message_finished(metrics)
+
+        span = tracer.spans[0]
+        self.assertEqual("large_message.build", span.name)
+        self.assertEqual(metrics.start_time, span.start_time)
+        self.assertGreaterEqual(span.end_time, span.start_time)
+        self.assertEqual("inline-compressed", span.attributes["large_message.path"])
+        self.assertEqual(1000, span.attributes["large_message.message_size"])
+        self.assertEqual([metrics.error], span.exceptions)
@@ -0,0 +1,57 @@
+from unittest import TestCase
+
+from boto3_large_message_utils.utils.planner import CostModel, DeliveryPlan, get_delivery_plans
+
+
+class TestCostModel(TestCase):
+    def test_cost_is_estimated(self):
+        cost_model = CostModel(request_cost=100, byte_cost=1, compression_byte_cost=2)
+
+        self.assertEqual(0, cost_model.estimate(DeliveryPlan(False, False, False), 1000))
+        self.assertEqual(2000, cost_model.estimate(DeliveryPlan(True, False, False), 1000))
+        self.assertEqual(150, cost_model.estimate(DeliveryPlan(False, True, False), 1000, 50))
+        self.assertEqual(1100, cost_model.estimate(DeliveryPlan(False, False, True), 1000))
+        self.assertEqual(2350, cost_model.estimate(DeliveryPlan(True, False, True), 1000, compression_ratio=0.25))
+
+    def test_value_error_is_raised_for_negative_cost(self):
+        with self.assertRaises(ValueError):
+            CostModel(request_cost=-1)
+        with self.assertRaises(ValueError):
+            CostModel(byte_cost="1")
+
+
+class TestGetDeliveryPlans(TestCase):
+    def test_plans_are_ordered_by_cost(self):
+        actual = get_delivery_plans(CostModel(request_cost=100), 1000, 50, compress=True)
+
+        self.assertEqual(
+            [
+                DeliveryPlan(False, False, False),
+                DeliveryPlan(False, True, False),
+                DeliveryPlan(True, False, False),
+                DeliveryPlan(True, True, False),
+                DeliveryPlan(True, False, True),
+            ],
+            actual,
+        )
+
+    def test_plans_costing_more_than_offloading_the_body_are_dropped(self):
+        actual = get_delivery_plans(CostModel(request_cost=100), 1000, 2000)
+
+        self.assertEqual([DeliveryPlan(False, False, False), DeliveryPlan(False, False, True)], actual)
+
+    def test_attribute_plans_require_attributes(self):
+        actual = get_delivery_plans(CostModel(), 1000, compress=True)
+
+        self.assertEqual(
+            [DeliveryPlan(False, False, False), DeliveryPlan(True, False, False), DeliveryPlan(True, False, True)],
+            actual,
+        )
+
+    def test_attributes_that_do_not_fit_are_offloaded_with_the_body(self):
+        actual = get_delivery_plans(CostModel(request_cost=100), 1000, 2000, attributes_fit=False)
+
+        self.assertEqual(
+            [DeliveryPlan(False, False, False), DeliveryPlan(False, True, False), DeliveryPlan(False, True, True)],
+            actual,
+        )
@@ -0,0 +1,91 @@
+import os
+from unittest import TestCase
+
+from boto3_large_message_utils.utils.policy import (
+    AdaptiveCompressionPolicy,
+    CompressionDecision,
+    CompressionPolicy,
+)
+
+
+class TestCompressionPolicy(TestCase):
+    def test_message_is_always_compressed(self):
+        actual = CompressionPolicy().decide(os.urandom(1024), "gzip", 6)
+
+        self.assertEqual(CompressionDecision(True, "gzip", 6, None), actual)
+
+
+class TestAdaptiveCompressionPolicy(TestCase):
+    def test_incompressible_message_is_not_compressed(self):
+        policy = AdaptiveCompressionPolicy(sample_size=1024, deterministic=True)
+
+        actual = policy.decide(os.urandom(65536), "gzip")
+
+        self.assertFalse(actual.compress)
+        self.assertGreater(actual.ratio, policy.max_ratio)
+
+    def test_highly_compressible_message_uses_the_fast_level(self):
+        policy = AdaptiveCompressionPolicy(sample_size=1024, fast_codec="zlib", deterministic=True)
+
+        actual = policy.decide(b"a" * 65536, "gzip", 9)
+
+        self.assertEqual((True, "zlib", 1), actual[:3])
+        self.assertLess(actual.ratio, policy.fast_ratio)
+
+    def test_compressible_message_uses_the_requested_codec(self):
+        policy = AdaptiveCompressionPolicy(sample_size=1024, deterministic=True)
+        message = b"".join(os.urandom(8).hex().encode() for _ in range(8192))
+
+        actual = policy.decide(message, "gzip", 9)
+
+        self.assertEqual((True, "gzip", 9), actual[:3])
+
+    def test_deterministic_mode_samples_the_same_slices(self):
+        message = os.urandom(65536) + b"a" * 65536
+        policy = AdaptiveCompressionPolicy(sample_size=1024, sample_count=8, deterministic=True)
+
+        sample = policy._get_sample(message)
+
+        self.assertEqual(policy.decide(message, "gzip"), policy.decide(message, "gzip"))
+        self.assertEqual(message[:128], sample[:128])
+        self.assertEqual(message[-128:], sample[-128:])
+
+    def test_seeded_samples_are_reproducible(self):
+        message = os.urandom(65536)
+
+        first = AdaptiveCompressionPolicy(sample_size=1024, seed=1)._get_sample(message)
+        second = AdaptiveCompressionPolicy(sample_size=1024, seed=1)._get_sample(message)
+
+        self.assertEqual(first, second)
+        self.assertEqual(1024, len(first))
+
+    def test_small_message_uses_the_observed_ratio(self):
+        policy = AdaptiveCompressionPolicy(sample_size=1024)
+        self.assertEqual(CompressionDecision(True, "gzip", None, None), policy.decide(b"a" * 100, "gzip"))
+
+        policy.observe(CompressionDecision(True, "gzip", None), 1000, 990)
+        actual = policy.decide(b"a" * 100, "gzip")
+
+        self.assertFalse(actual.compress)
+        self.assertEqual(0.99, actual.ratio)
+
+    def test_observed_ratio_is_smoothed(self):
+        policy = AdaptiveCompressionPolicy()
+        policy.observe(CompressionDecision(True, "gzip", None), 100, 50)
+        policy.observe(CompressionDecision(True, "gzip", None), 100, 100)
+
+        self.assertAlmostEqual(0.6, policy.compression_ratios["gzip"])
+
+    def test_deterministic_mode_ignores_the_observed_ratio(self):
+        policy = AdaptiveCompressionPolicy(sample_size=0, deterministic=True)
+        policy.observe(CompressionDecision(True, "gzip", None), 1000, 990)
+
+        self.assertTrue(policy.decide(b"a" * 100, "gzip").compress)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            AdaptiveCompressionPolicy(sample_size=-1)
+        with self.assertRaises(ValueError):
+            AdaptiveCompressionPolicy(sample_count=0)
+        with self.assertRaises(ValueError):
+            AdaptiveCompressionPolicy(fast_codec="unknown")
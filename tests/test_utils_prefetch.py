@@ -0,0 +1,59 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import TestCase
+
+from boto3_large_message_utils.utils.prefetch import prefetch
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, function, item):
+        self.submitted.append(item)
+        future = Future()
+        future.set_result(function(item))
+        return future
+
+
+class TestPrefetch(TestCase):
+    def test_results_are_returned_in_order(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            actual = list(prefetch(str.upper, ["a", "b", "c", "d", "e"], executor, 2))
+
+        self.assertEqual(["A", "B", "C", "D", "E"], actual)
+
+    def test_items_are_retrieved_up_to_the_depth(self):
+        executor = RecordingExecutor()
+        results = prefetch(str.upper, ["a", "b", "c", "d", "e"], executor, 2)
+
+        self.assertEqual([], executor.submitted)
+        self.assertEqual("A", next(results))
+        self.assertEqual(["a", "b", "c"], executor.submitted)
+        self.assertEqual("B", next(results))
+        self.assertEqual(["a", "b", "c", "d"], executor.submitted)
+
+    def test_items_are_retrieved_within_the_memory_budget(self):
+        executor = RecordingExecutor()
+        results = prefetch(str.upper, ["aaa", "b", "c", "d"], executor, 10, memory_budget=2, get_size=len)
+
+        self.assertEqual("AAA", next(results))
+        self.assertEqual(["aaa"], executor.submitted)
+        self.assertEqual("B", next(results))
+        self.assertEqual(["aaa", "b", "c"], executor.submitted)
+
+    def test_pending_items_are_cancelled_when_closed(self):
+        futures = []
+
+        class PendingExecutor:
+            def submit(self, function, item):
+                future = Future()
+                if not futures:
+                    future.set_result(item)
+                futures.append(future)
+                return future
+
+        results = prefetch(str.upper, ["a", "b", "c"], PendingExecutor(), 2)
+        self.assertEqual("a", next(results))
+        results.close()
+
+        self.assertTrue(all(future.cancelled() for future in futures[1:]))
@@ -1,7 +1,75 @@
+import threading
 from unittest import TestCase
 from unittest.mock import patch
 
-from boto3_large_message_utils.utils.s3 import generate_s3_object_key
+from unittest.mock import Mock
+
+from botocore.exceptions import ClientError
+
+from boto3_large_message_utils.utils.s3 import (
+    S3ObjectKeyCache,
+    generate_content_s3_object_key,
+    generate_s3_object_key,
+    s3_object_exists,
+    upload_chunks_to_s3,
+)
+
+
+class TestGenerateContentS3ObjectKey(TestCase):
+    def test_identical_content_has_the_same_key(self):
+        self.assertEqual(
+            generate_content_s3_object_key(b"this is a test message", prefix="/my-test-prefix/"),
+            generate_content_s3_object_key(b"this is a test message", prefix="my-test-prefix"),
+        )
+
+    def test_key_is_a_hash_under_the_prefix(self):
+        actual = generate_content_s3_object_key(b"this is a test message", prefix="my-test-prefix")
+
+        self.assertRegex(actual, r"^my-test-prefix/[0-9a-f]{64}$")
+
+    def test_namespace_changes_the_key(self):
+        self.assertNotEqual(
+            generate_content_s3_object_key(b"this is a test message"),
+            generate_content_s3_object_key(b"this is a test message", namespace="zstd:None"),
+        )
+
+    def test_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            generate_content_s3_object_key("this is a test message")
+
+
+class TestS3ObjectExists(TestCase):
+    def test_existing_object(self):
+        s3 = Mock()
+
+        self.assertTrue(s3_object_exists(s3, "test-s3-bucket", "test-key"))
+        s3.head_object.assert_called_once_with(Bucket="test-s3-bucket", Key="test-key")
+
+    def test_missing_object(self):
+        s3 = Mock()
+        s3.head_object.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+        self.assertFalse(s3_object_exists(s3, "test-s3-bucket", "test-key"))
+
+    def test_other_errors_are_raised(self):
+        s3 = Mock()
+        s3.head_object.side_effect = ClientError({"Error": {"Code": "403"}}, "HeadObject")
+
+        with self.assertRaises(ClientError):
+            s3_object_exists(s3, "test-s3-bucket", "test-key")
+
+
+class TestS3ObjectKeyCache(TestCase):
+    def test_least_recently_used_key_is_dropped(self):
+        keys = S3ObjectKeyCache(max_size=2)
+        keys.add("first")
+        keys.add("second")
+        self.assertIn("first", keys)
+        keys.add("third")
+
+        self.assertIn("first", keys)
+        self.assertNotIn("second", keys)
+        self.assertEqual(2, len(keys))
 
 
 class TestGenerateS3ObjectKey(TestCase):
@@ -44,3 +112,67 @@ class TestGenerateS3ObjectKey(TestCase):
         actual = generate_s3_object_key(prefix="")
 
         self.assertEqual(expected, actual)
+
+
+class InMemoryS3:
+    def __init__(self, fail_on_part=None):
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+        self.fail_on_part = fail_on_part
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+        return {"ETag": '"etag"'}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_on_part:
+            raise Exception("part upload failed")
+        with self.lock:
+            self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f'"etag-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b"".join(
+            parts[part["PartNumber"]] for part in sorted(MultipartUpload["Parts"], key=lambda part: part["PartNumber"])
+        )
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(UploadId)
+
+
+class TestUploadChunksToS3(TestCase):
+    def setUp(self):
+        self.s3 = InMemoryS3()
+
+    def test_small_body_is_uploaded_with_put_object(self):
+        upload_chunks_to_s3(self.s3, "test-s3-bucket", "test-key", [b"small ", b"body"], 100, 10, 2)
+
+        self.assertEqual({("test-s3-bucket", "test-key"): b"small body"}, self.s3.objects)
+
+    def test_large_body_is_uploaded_in_parts(self):
+        chunks = [bytes([i]) * 7 for i in range(10)]
+
+        with patch.object(self.s3, "upload_part", wraps=self.s3.upload_part) as mock_upload_part:
+            upload_chunks_to_s3(self.s3, "test-s3-bucket", "test-key", iter(chunks), 20, 20, 2)
+
+        self.assertEqual(b"".join(chunks), self.s3.objects[("test-s3-bucket", "test-key")])
+        self.assertEqual(4, mock_upload_part.call_count)
+        self.assertEqual({}, self.s3.uploads)
+
+    def test_upload_is_aborted_when_a_part_fails(self):
+        self.s3.fail_on_part = 2
+
+        with self.assertRaises(Exception):
+            upload_chunks_to_s3(self.s3, "test-s3-bucket", "test-key", [b"x" * 100], 20, 20, 2)
+
+        self.assertEqual(["upload-0"], self.s3.aborted)
+        self.assertEqual({}, self.s3.objects)
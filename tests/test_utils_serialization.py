@@ -0,0 +1,48 @@
+from unittest import TestCase, skipUnless
+from unittest.mock import Mock, patch
+
+from boto3_large_message_utils.utils import serialization
+from boto3_large_message_utils.utils.serialization import (
+    get_available_json_backends,
+    get_json_backend,
+    register_json_backend,
+)
+
+
+class TestJsonBackends(TestCase):
+    def test_stdlib_is_the_default(self):
+        json_backend = get_json_backend()
+
+        self.assertEqual("json", json_backend.name)
+        self.assertEqual('{"bucket": "test-s3-bucket"}', json_backend.dumps({"bucket": "test-s3-bucket"}))
+
+    def test_every_backend_loads_str_and_bytes(self):
+        for name in get_available_json_backends():
+            json_backend = get_json_backend(name)
+
+            self.assertEqual({"hello": "world"}, json_backend.loads('{"hello": "world"}'))
+            self.assertEqual({"hello": "world"}, json_backend.loads(b'{"hello": "world"}'))
+            self.assertIsInstance(json_backend.dumps({"hello": "world"}), str)
+
+    @skipUnless("orjson" in get_available_json_backends(), "orjson is not installed")
+    def test_auto_prefers_orjson(self):
+        self.assertEqual("orjson", get_json_backend("auto").name)
+
+    def test_registered_backend_is_used(self):
+        register_json_backend("constant", lambda obj: "{}", lambda data: {})
+
+        self.assertEqual({}, get_json_backend("constant").loads('{"hello": "world"}'))
+
+    def test_optional_backend_is_loaded_on_first_use(self):
+        load = Mock(side_effect=lambda: register_json_backend("optional", lambda obj: "{}", lambda data: {}))
+
+        with patch.dict(serialization._OPTIONAL_JSON_BACKENDS.loaders, {"optional": load}):
+            load.assert_not_called()
+            self.assertEqual("optional", get_json_backend("optional").name)
+            get_json_backend("optional")
+
+        load.assert_called_once()
+
+    def test_value_error_is_raised_for_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_json_backend("unknown")
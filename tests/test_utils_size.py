@@ -2,7 +2,10 @@ from unittest import TestCase
 from unittest.mock import patch
 
 from boto3_large_message_utils.utils.size import (
-    get_size_of_string_in_bytes
+    AttributeSchema,
+    append_message_size_attribute,
+    get_message_attributes_size_in_bytes,
+    get_size_of_string_in_bytes,
 )
 
 
@@ -13,6 +16,68 @@ class TestGetSizeOfStringInBytes(TestCase):
 
         self.assertEqual(expected, actual)
 
+    def test_multibyte_characters_are_counted_in_bytes(self):
+        expected = 9
+        actual = get_size_of_string_in_bytes("héllo€")
+
+        self.assertEqual(expected, actual)
+
+    def test_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            get_size_of_string_in_bytes({"msg": "this method only supports strings"})
+
+
+class TestAttributeSchema(TestCase):
+    def setUp(self):
+        self.schema = AttributeSchema()
+        self.message_attributes = {
+            "tenant": {"StringValue": "tenant-1234", "DataType": "String"},
+            "signature": {"BinaryValue": b"\x00\xff" * 32, "DataType": "Binary"},
+            "encoded": {"BinaryValue": "AP8A/w==", "DataType": "Binary"},
+            "unicode": {"StringValue": "€", "DataType": "String"},
+        }
+
+    def test_attributes_are_measured_in_bytes(self):
+        expected = (6 + 6 + 11) + (9 + 6 + 64) + (7 + 6 + 8) + (7 + 6 + 3)
+
+        self.assertEqual(expected, self.schema.get_size(self.message_attributes, 1000))
+        self.assertEqual(expected, get_message_attributes_size_in_bytes(self.message_attributes, 1000))
+
+    @patch("boto3_large_message_utils.utils.size.get_size_of_string_in_bytes", wraps=get_size_of_string_in_bytes)
+    def test_names_and_data_types_are_measured_once(self, mock_get_size):
+        self.schema.get_size({"tenant": {"StringValue": "a", "DataType": "String"}}, 1000)
+        self.schema.get_size({"tenant": {"StringValue": "b", "DataType": "String"}}, 1000)
+
+        self.assertEqual(4, mock_get_size.call_count)
+
+    def test_cached_names_are_bounded(self):
+        schema = AttributeSchema(max_cached_names=2)
+        for name in ["first", "second", "third"]:
+            schema.get_attribute_size(name, {"StringValue": "a", "DataType": "String"})
+
+        self.assertEqual(1, len(schema._name_sizes))
+
+    def test_value_error_is_raised_when_attributes_are_too_large(self):
+        with self.assertRaises(ValueError):
+            self.schema.get_size(self.message_attributes, 100)
+
     def test_value_error_is_raised(self):
         with self.assertRaises(ValueError):
-            get_size_of_string_in_bytes({"msg": "this method only supports strings"})
\ No newline at end of file
+            self.schema.get_size(["this method only supports dicts"], 1000)
+
+
+class TestAppendMessageSizeAttribute(TestCase):
+    def test_size_attribute_is_appended(self):
+        actual = append_message_size_attribute({}, 1024)
+
+        self.assertEqual({"ORIGINAL_MESSAGE_SIZE": {"StringValue": "1024", "DataType": "Number"}}, actual)
+
+    def test_reserved_name_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            append_message_size_attribute({"ORIGINAL_MESSAGE_SIZE": {"StringValue": "1", "DataType": "Number"}}, 1)
+
+    def test_too_many_attributes_raise_value_error(self):
+        message_attributes = {f"name-{i}": {"StringValue": "a", "DataType": "String"} for i in range(10)}
+
+        with self.assertRaises(ValueError):
+            append_message_size_attribute(message_attributes, 1)
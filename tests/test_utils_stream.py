@@ -0,0 +1,113 @@
+import io
+from unittest import TestCase
+
+from boto3_large_message_utils.utils.stream import (
+    CountingIterator,
+    TextCheckingIterator,
+    decode_text,
+    iter_chunks,
+    iter_parts,
+    open_stream,
+    read_head,
+)
+
+
+class TestIterChunks(TestCase):
+    def test_string_is_encoded_and_split(self):
+        expected = [b"abc", b"def", b"g"]
+        actual = list(iter_chunks("abcdefg", 3))
+
+        self.assertEqual(expected, actual)
+
+    def test_file_like_object_is_read_in_chunks(self):
+        expected = [b"abc", b"def", b"g"]
+        actual = list(iter_chunks(io.BytesIO(b"abcdefg"), 3))
+
+        self.assertEqual(expected, actual)
+
+    def test_text_file_like_object_is_encoded(self):
+        expected = [b"ab\xc3\xa9"]
+        actual = list(iter_chunks(io.StringIO("abé"), 3))
+
+        self.assertEqual(expected, actual)
+
+    def test_iterator_of_chunks_is_encoded(self):
+        expected = [b"abc", b"de"]
+        actual = list(iter_chunks(iter(["abc", b"de"]), 3))
+
+        self.assertEqual(expected, actual)
+
+    def test_value_error_is_raised(self):
+        with self.assertRaises(ValueError):
+            list(iter_chunks([{"msg": "this method only supports strings"}], 3))
+
+
+class TestIterParts(TestCase):
+    def test_chunks_are_regrouped_into_parts(self):
+        expected = [b"abcd", b"efgh", b"i"]
+        actual = list(iter_parts([b"ab", b"cdefg", b"hi"], 4))
+
+        self.assertEqual(expected, actual)
+
+
+class TestReadHead(TestCase):
+    def test_complete_stream_is_returned_when_smaller_than_size(self):
+        head, chunks = read_head(iter([b"ab", b"cd"]), 10)
+
+        self.assertEqual(b"abcd", head)
+        self.assertIsNone(chunks)
+
+    def test_remaining_chunks_are_returned_when_size_is_reached(self):
+        head, chunks = read_head(iter([b"ab", b"cd", b"ef"]), 3)
+
+        self.assertEqual(b"abcd", head)
+        self.assertEqual([b"ef"], list(chunks))
+
+
+class TestCountingIterator(TestCase):
+    def test_bytes_are_counted(self):
+        counter = CountingIterator([b"ab", b"cde"])
+
+        self.assertEqual([b"ab", b"cde"], list(counter))
+        self.assertEqual(5, counter.size)
+
+
+class TestTextCheckingIterator(TestCase):
+    def test_utf8_split_across_chunks_is_text(self):
+        chunks = TextCheckingIterator([b"\xc3", b"\xa9"])
+
+        self.assertEqual([b"\xc3", b"\xa9"], list(chunks))
+        self.assertTrue(chunks.is_text)
+
+    def test_invalid_utf8_is_not_text(self):
+        chunks = TextCheckingIterator([b"abc", b"\xff"])
+
+        self.assertEqual([b"abc", b"\xff"], list(chunks))
+        self.assertFalse(chunks.is_text)
+
+    def test_truncated_utf8_is_not_text(self):
+        chunks = TextCheckingIterator([b"abc\xc3"])
+        list(chunks)
+
+        self.assertFalse(chunks.is_text)
+
+    def test_decode_text(self):
+        self.assertEqual("é", decode_text("é".encode()))
+        self.assertEqual(b"\xff", decode_text(b"\xff"))
+
+
+class TestOpenStream(TestCase):
+    def test_stream_is_readable_in_lines_and_chunks(self):
+        stream = open_stream(io.BytesIO(b"first\nsecond\nthird"), chunk_size=4)
+
+        self.assertEqual(b"first\n", stream.readline())
+        self.assertEqual(b"sec", stream.read(3))
+        self.assertEqual(b"ond\nthird", stream.read())
+
+    def test_underlying_stream_is_closed(self):
+        source = io.BytesIO(b"message")
+
+        with open_stream(source):
+            pass
+
+        self.assertTrue(source.closed)